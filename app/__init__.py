@@ -1,28 +1,55 @@
 import os
 import subprocess
 
-from bokeh.resources import CDN
+import click
 from config import Config
 from flask import Flask
 from flask_assets import Environment
 from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
 from flask_sslify import SSLify
 from sqlalchemy.engine.url import make_url
-from webassets.loaders import YAMLLoader
 
 from config import config, SSLStatus
+from .admission import AdmissionControl
+from .bokeh_util import BokehServer
+from .bundles import bundles_command, BUNDLES_FILE, load_bundles, register_bundles, StaticBundles
+from .cache import PlotCache
+from .compression import Compression
+from .db_pool import read_pool_statistics, SQLAlchemy
+from .error_reports import ErrorReports
+from .export import Exports
+from .memory import memory_report
+from .metrics import Metrics
+from .offload import Offload
+from .precompute import Precomputer
+from .query_cache import QueryCache
+from .sessions import ServerSideSessions
+from .templating import TemplateCache
+from .users import PasswordVerifier, UserCache
 
 
 assets = Environment()
+bokeh_server = BokehServer()
 bootstrap = Bootstrap()
+compression = Compression()
 db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.session_protection = 'strong'
 login_manager.login_view = 'auth.login'
-migrate = Migrate()
+metrics = Metrics()
+admission = AdmissionControl(metrics)
+offload = Offload(metrics)
+password_verifier = PasswordVerifier()
+error_reports = ErrorReports(metrics)
+exports = Exports()
+plot_cache = PlotCache()
+precompute = Precomputer()
+query_cache = QueryCache()
+sessions = ServerSideSessions()
+static_bundles = StaticBundles()
+template_cache = TemplateCache()
+user_cache = UserCache()
 
 
 def create_app(config_name):
@@ -32,17 +59,37 @@ def create_app(config_name):
 
     app.config['ASSETS_DEBUG'] = app.config['DEBUG']
 
+    # bundles are built when the site is deployed, so there is no need to check for changes on every request
+    app.config['ASSETS_AUTO_BUILD'] = app.config['DEBUG']
+
+    # the metrics should be initialised first, so that the request timer is started before any other request handling
+    metrics.init_app(app)
+    admission.init_app(app)
     assets.init_app(app)
+    bokeh_server.init_app(app)
     bootstrap.init_app(app)
+    compression.init_app(app)
     db.init_app(app)
+    error_reports.init_app(app)
+    exports.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
-
-    assets_config = os.path.join(os.path.dirname(__file__), os.pardir, 'webassets.yaml')
-    assets._named_bundles = {}  # avoid duplicate registration in unit tests
-    assets_loader = YAMLLoader(assets_config)
-    bundles = assets_loader.load_bundles(assets)
-    assets.register(bundles)
+    offload.init_app(app)
+    password_verifier.init_app(app)
+    plot_cache.init_app(app)
+    precompute.init_app(app)
+    query_cache.init_app(app)
+    sessions.init_app(app)
+    static_bundles.init_app(app)
+    template_cache.init_app(app)
+    user_cache.init_app(app)
+
+    # Flask-Migrate imports Alembic, which takes a long time, so it is only used if it is the migration tool
+    if Config.settings(config_name)['migration_tool'] == 'Flask-Migrate':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # the bundles are parsed only once per process (unless the file changes), and bundles registered already are kept
+    register_bundles(assets, load_bundles(BUNDLES_FILE, env=assets))
 
     if not app.debug and not app.testing and app.config['SSL_STATUS'] == SSLStatus.ENABLED:
         sslify = SSLify(app)
@@ -53,8 +100,13 @@ def create_app(config_name):
     from .auth import auth as auth_blueprint
     app.register_blueprint(auth_blueprint)
 
+    from .internal import internal as internal_blueprint
+    app.register_blueprint(internal_blueprint)
+
     @app.context_processor
     def bokeh_resources():
+        # importing Bokeh takes a long time, so it is only done when the first template is rendered
+        from bokeh.resources import CDN
         return dict(bokeh_resources=CDN)
 
     @app.cli.command()
@@ -79,4 +131,41 @@ def create_app(config_name):
 
         return subprocess.call(args)
 
+    @app.cli.command('db-pool')
+    def db_pool():
+        """Show the database connection pool statistics of all server processes."""
+
+        columns = ['pid', 'pool_size', 'checked_out', 'overflow', 'checkouts', 'timeouts', 'invalidations',
+                   'max_checked_out', 'max_overflow', 'max_wait_time']
+        print(' '.join('{0:>15}'.format(column) for column in columns))
+        for statistics in read_pool_statistics(app.config['DATABASE_POOL_STATS_DIR']):
+            print(' '.join('{0:>15}'.format(round(statistics[column], 4)) for column in columns))
+
+    @app.cli.command('memory')
+    def memory():
+        """Show the shared and private memory of the uWSGI master and worker processes of the site."""
+
+        columns = ['rss', 'pss', 'shared', 'private', 'swap']
+        row = '{pid:>8} {role:>8} ' + ' '.join('{' + column + ':>15}' for column in columns)
+        print(row.format(pid='pid', role='role', **dict((column, column + ' (MiB)') for column in columns)))
+        report = memory_report(os.path.join(app.root_path, os.pardir))
+        for usage in report:
+            mebibytes = dict((column, round(usage[column] / 1024 / 1024, 1)) for column in columns)
+            print(row.format(pid=usage['pid'], role=usage['role'], **mebibytes))
+        print('{0:>17} {1:>15.1f} MiB'.format('total PSS', sum(usage['pss'] for usage in report) / 1024 / 1024))
+
+    @app.cli.command('precompute')
+    @click.option('--once', is_flag=True, help='Refresh the datasets once and exit.')
+    @click.option('--workers', type=int, default=None, help='Maximum number of datasets refreshed at the same time.')
+    @click.argument('names', nargs=-1)
+    def precompute_datasets(once, workers, names):
+        """Refresh the precomputed datasets whenever they are due."""
+
+        precompute.run(app,
+                       names=names,
+                       workers=workers or app.config['PRECOMPUTE_WORKERS'],
+                       once=once)
+
+    app.cli.add_command(bundles_command)
+
     return app
@@ -0,0 +1,242 @@
+import threading
+import time
+
+from werkzeug.exceptions import HTTPException
+
+# path prefixes of the requests which are never rejected
+EXEMPT_PATHS = ('/static/', '/health')
+
+# weight of the latest request in the moving average of the latency
+LATENCY_WEIGHT = 0.2
+
+# reasons for rejecting a request
+QUEUE_TIME = 'queue_time'
+IN_FLIGHT = 'in_flight'
+LATENCY = 'latency'
+
+
+class AdmissionMiddleware:
+    """WSGI middleware rejecting requests when the server is overloaded.
+
+    A request is rejected immediately with a short plain text 503 response and a `Retry-After` header, without
+    passing it on to the app, if
+
+    * it has waited longer than `max_queue_time` seconds before reaching the app. This requires the web server to pass
+      the time when it received the request in the `X-Request-Start` header (such as `t=1476349200.123`).
+    * `max_in_flight` requests are being handled by the process already.
+    * the moving average of the latency of its endpoint exceeds `max_latency` seconds and another request for the
+      endpoint is in progress. As a single request at a time is still let through, the average recovers once the
+      endpoint is fast again.
+
+    A limit of 0 disables the respective check. Requests whose path starts with one of the `exempt_paths` are never
+    rejected. The latency is the time until the app returns the response (i.e. excluding the time for streaming the
+    body).
+
+    Params:
+    -------
+    wsgi_app: function
+        WSGI app.
+    url_map: Map
+        URL map for finding the endpoint of a request.
+    max_queue_time: float
+        Maximum number of seconds a request may have waited.
+    max_in_flight: int
+        Maximum number of requests handled at the same time.
+    max_latency: float
+        Maximum moving average of the latency of an endpoint, in seconds.
+    retry_after: int
+        Number of seconds after which a client should try again.
+    exempt_paths: iterable of str
+        Path prefixes of requests which are never rejected.
+    on_reject: function
+        Function called with the endpoint (or None) and the reason (`QUEUE_TIME`, `IN_FLIGHT` or `LATENCY`) when a
+        request is rejected.
+    """
+
+    def __init__(self, wsgi_app, url_map=None, max_queue_time=0, max_in_flight=0, max_latency=0, retry_after=5,
+                 exempt_paths=EXEMPT_PATHS, on_reject=None):
+        self.wsgi_app = wsgi_app
+        self.url_map = url_map
+        self.max_queue_time = max_queue_time
+        self.max_in_flight = max_in_flight
+        self.max_latency = max_latency
+        self.retry_after = retry_after
+        self.exempt_paths = tuple(exempt_paths)
+        self.on_reject = on_reject
+        self.in_flight = 0
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(self.exempt_paths):
+            return self.wsgi_app(environ, start_response)
+
+        endpoint = self.endpoint(environ)
+        reason = self.admit(endpoint, _queue_time(environ))
+        if reason is not None:
+            if self.on_reject is not None:
+                self.on_reject(endpoint, reason)
+            return self.reject(start_response)
+
+        start = time.monotonic()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            self.release(endpoint, time.monotonic() - start)
+
+    def endpoint(self, environ):
+        """Get the endpoint of a request, or None if no endpoint matches its URL."""
+
+        if self.url_map is None:
+            return None
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+            return endpoint
+        except HTTPException:
+            return None
+
+    def admit(self, endpoint, queue_time=None):
+        """Decide whether to handle a request, and record it as in progress if so.
+
+        Params:
+        -------
+        endpoint: str
+            Endpoint of the request.
+        queue_time: float
+            Number of seconds the request has waited, or None if unknown.
+
+        Returns:
+        --------
+        str
+            The reason for rejecting the request, or None if it is admitted.
+        """
+
+        if self.max_queue_time and queue_time is not None and queue_time > self.max_queue_time:
+            return QUEUE_TIME
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return IN_FLIGHT
+            statistics = self.endpoints.setdefault(endpoint, _EndpointStatistics())
+            if self.max_latency and statistics.latency > self.max_latency and statistics.in_flight > 0:
+                return LATENCY
+            self.in_flight += 1
+            statistics.in_flight += 1
+        return None
+
+    def release(self, endpoint, latency):
+        """Record that an admitted request has been handled.
+
+        Params:
+        -------
+        endpoint: str
+            Endpoint of the request.
+        latency: float
+            Number of seconds taken by the request.
+        """
+
+        with self._lock:
+            self.in_flight -= 1
+            statistics = self.endpoints[endpoint]
+            statistics.in_flight -= 1
+            if statistics.latency:
+                statistics.latency += LATENCY_WEIGHT * (latency - statistics.latency)
+            else:
+                statistics.latency = latency
+
+    def reject(self, start_response):
+        """Send the response for a rejected request."""
+
+        body = b'The server is overloaded. Please try again later.\n'
+        start_response('503 Service Unavailable', [('Content-Type', 'text/plain; charset=utf-8'),
+                                                   ('Content-Length', str(len(body))),
+                                                   ('Retry-After', str(self.retry_after)),
+                                                   ('Cache-Control', 'no-store')])
+        return [body]
+
+
+class AdmissionControl:
+    """Flask extension rejecting requests when the server is overloaded.
+
+    The app's WSGI app is wrapped in an `AdmissionMiddleware`. The limits are read from the app configuration
+    variables `ADMISSION_MAX_QUEUE_TIME`, `ADMISSION_MAX_IN_FLIGHT` and `ADMISSION_MAX_LATENCY`, the value of the
+    `Retry-After` header from `ADMISSION_RETRY_AFTER`, and the exempt path prefixes from `ADMISSION_EXEMPT_PATHS`.
+    Admission control is disabled if all limits are 0.
+
+    If metrics are enabled, rejected requests are counted as the metric `app_admission_rejected_total`, by endpoint and
+    reason.
+
+    Params:
+    -------
+    metrics: Metrics
+        Metrics extension for recording the rejected requests.
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, metrics=None, app=None):
+        if metrics is not None:
+            metrics.describe('app_admission_rejected_total', 'counter',
+                             'Total number of requests rejected by the admission control, by endpoint and reason.')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        max_queue_time = app.config.get('ADMISSION_MAX_QUEUE_TIME', 0)
+        max_in_flight = app.config.get('ADMISSION_MAX_IN_FLIGHT', 0)
+        max_latency = app.config.get('ADMISSION_MAX_LATENCY', 0)
+        if not (max_queue_time or max_in_flight or max_latency):
+            app.extensions['admission'] = None
+            return
+
+        def count_rejection(endpoint, reason):
+            store = app.extensions.get('metrics')
+            if store is not None:
+                store.increment('app_admission_rejected_total', dict(endpoint=endpoint or 'none', reason=reason))
+
+        middleware = AdmissionMiddleware(app.wsgi_app,
+                                         url_map=app.url_map,
+                                         max_queue_time=max_queue_time,
+                                         max_in_flight=max_in_flight,
+                                         max_latency=max_latency,
+                                         retry_after=app.config.get('ADMISSION_RETRY_AFTER', 5),
+                                         exempt_paths=app.config.get('ADMISSION_EXEMPT_PATHS', EXEMPT_PATHS),
+                                         on_reject=count_rejection)
+        app.wsgi_app = middleware
+        app.extensions['admission'] = middleware
+
+
+class _EndpointStatistics:
+    """Number of requests in progress and moving average of the latency for an endpoint."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latency = 0.0
+
+
+def _queue_time(environ):
+    """Get the number of seconds since the web server has received a request, or None if unknown.
+
+    The time is read from the `X-Request-Start` header, which may be in seconds (as set by nginx with
+    `t=${msec}`), milliseconds or microseconds since the epoch.
+    """
+
+    value = environ.get('HTTP_X_REQUEST_START')
+    if not value:
+        return None
+    try:
+        start = float(value.strip().lstrip('t='))
+    except ValueError:
+        return None
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    return max(time.time() - start, 0)
@@ -1,8 +1,9 @@
 from flask import flash, redirect, render_template, request, url_for
-from flask_login import login_user, logout_user, UserMixin
+from flask_login import current_user, login_user, logout_user, UserMixin
 
 from . import auth
-from .. import login_manager
+from .. import login_manager, password_verifier, user_cache
+from ..users import VerificationBusyError
 from .forms import LoginForm
 
 
@@ -51,10 +52,12 @@ class DummyUser(UserMixin):
 
 
 @login_manager.user_loader
+@user_cache.cached
 def load__user(id):
     """Load a user.
 
-    The loaded user is the DummyUser with the given id as its username.
+    The loaded user is the DummyUser with the given id as its username. Loaded users are cached, so that the user
+    needn't be loaded again for every request.
 
     Params:
     -------
@@ -75,12 +78,21 @@ def login():
 
     If a valid username and password are supplied, the corresponding user is logged in. Otherwise the login form is
     displayed. In case of an invalid or missing username or password, an error message is included with the form.
+
+    The password is verified in a bounded thread pool. If too many verifications are in progress already, the form is
+    displayed with an error message and a 503 status.
     """
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = DummyUser(form.username.data)
-        if user is not None and user.verify_password(form.password.data):
+        # the user is looked up with the (cached) user loader, as the user is loaded by it for every later request
+        user = load__user(form.username.data)
+        try:
+            valid = user is not None and password_verifier.verify(user.verify_password, form.password.data)
+        except VerificationBusyError:
+            flash('The server is busy. Please try again in a moment.')
+            return render_template('auth/login.html', form=form), 503
+        if valid:
             login_user(user, form.remember_me.data)
             return redirect(request.args.get('next') or url_for('main.index'))
         flash('Incorrect username or password')
@@ -94,6 +106,9 @@ def logout():
     After logging the user out, the home page is requested.
     """
 
+    # the user is removed from the cache, so that the user data is loaded afresh after logging in again
+    if current_user.is_authenticated:
+        user_cache.invalidate(current_user.get_id())
     logout_user()
     flash('You have been logged out.')
     return redirect(url_for('main.index'))
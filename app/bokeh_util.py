@@ -0,0 +1,299 @@
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from collections import deque
+from urllib.parse import urlencode, urlsplit
+
+from flask import current_app, request
+
+from .cache import LRUCache
+
+# string used in cached scripts in place of the session id
+SESSION_ID_PLACEHOLDER = 'bokeh-util-session-id-placeholder'
+
+
+class BokehServer:
+    """Flask extension for embedding plots served by the Bokeh server.
+
+    The `autoload_script` method returns the script tag for a Bokeh server app, such as
+
+    ```python
+    @main.route('/downtime')
+    def downtime():
+        script = bokeh_server.autoload_script('/telescope_downtime')
+        return render_template('plot.html', script=script)
+    ```
+
+    The URL of the Bokeh server is read from the app configuration variable `BOKEH_SERVER_URL`. If this is None, the
+    URL is derived from the request, using the request's scheme and host name with the port given by the app
+    configuration variable `BOKEH_SERVER_PORT`. Generating a script tag involves importing Bokeh and rendering a
+    template, so the script tags are cached per app path and Bokeh server URL. Every script tag refers to a session id
+    (a new one, unless a prewarmed session is available), so that nginx can send all requests for a session to the
+    same Bokeh server process.
+
+    When a browser loads a script tag, the Bokeh server creates a new session, which means running the app's code. This
+    may take a while. The extension can therefore prewarm sessions: it keeps a pool of `BOKEH_SESSION_POOL_SIZE`
+    sessions per app path, which are created in a background thread by requesting the app's autoload script from the
+    Bokeh server at the URL `BOKEH_SERVER_INTERNAL_URL`. A script tag returned by `autoload_script` then refers to one
+    of these sessions, and the browser doesn't have to wait for the session to be created. As the Bokeh server discards
+    sessions which haven't been connected to, prewarmed sessions are only used for `BOKEH_SESSION_MAX_AGE` seconds. The
+    app paths are added to the pool when their script tag is first requested, but they can also be added explicitly
+    with the `prewarm` method. Prewarming is disabled if the pool size is 0.
+
+    The session pools and the background thread are local to the process, and the thread is started when it is first
+    needed in a process, so that the app can be created before a server forks its worker processes.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        port = app.config.get('BOKEH_SERVER_PORT', 5100)
+        internal_url = app.config.get('BOKEH_SERVER_INTERNAL_URL') or 'http://127.0.0.1:{port}'.format(port=port)
+        app.extensions['bokeh_server'] = dict(
+            scripts=LRUCache(max_size=256),
+            sessions=_SessionPools(internal_url,
+                                   size=app.config.get('BOKEH_SESSION_POOL_SIZE', 0),
+                                   max_age=app.config.get('BOKEH_SESSION_MAX_AGE', 10))
+        )
+
+    def server_url(self):
+        """Get the (public) URL of the Bokeh server.
+
+        Returns:
+        --------
+        str
+            The URL, without a trailing slash.
+        """
+
+        url = current_app.config.get('BOKEH_SERVER_URL')
+        if url:
+            return url.rstrip('/')
+
+        hostname = urlsplit('//' + request.host).hostname
+        if ':' in hostname:
+            hostname = '[{hostname}]'.format(hostname=hostname)
+        return '{scheme}://{hostname}:{port}'.format(scheme=request.scheme,
+                                                     hostname=hostname,
+                                                     port=current_app.config.get('BOKEH_SERVER_PORT', 5100))
+
+    def autoload_script(self, app_path):
+        """Get the script tag for embedding a Bokeh server app.
+
+        The script tag contains a fixed element id, so an app must not be embedded more than once on a page.
+
+        Params:
+        -------
+        app_path: str
+            Path of the app on the Bokeh server, such as '/telescope_downtime'.
+
+        Returns:
+        --------
+        str
+            The script tag.
+        """
+
+        url = self.server_url()
+        extension = current_app.extensions['bokeh_server']
+        # the script always refers to a session id, so that nginx can send all requests for the session to the same
+        # Bokeh server process
+        session_id = extension['sessions'].take(app_path, url) or _generate_session_id()
+
+        key = (app_path, url)
+        script = extension['scripts'].get(key)
+        if script is None:
+            script = _autoload_script(app_path, url, SESSION_ID_PLACEHOLDER)
+            extension['scripts'].set(key, script)
+        return script.replace(SESSION_ID_PLACEHOLDER, session_id)
+
+    def prewarm(self, app_path, url=None):
+        """Keep a pool of prewarmed sessions for a Bokeh server app.
+
+        Params:
+        -------
+        app_path: str
+            Path of the app on the Bokeh server, such as '/telescope_downtime'.
+        url: str
+            Public URL of the Bokeh server. The URL returned by `server_url` is used if this is None, and in this case
+            this method must be called within a request unless the app configuration variable `BOKEH_SERVER_URL` is
+            set.
+        """
+
+        current_app.extensions['bokeh_server']['sessions'].add(app_path, url or self.server_url())
+
+    def clear(self):
+        """Remove all cached script tags and prewarmed sessions of the current process."""
+
+        extension = current_app.extensions['bokeh_server']
+        extension['scripts'].clear()
+        extension['sessions'].clear()
+
+
+class _SessionPools:
+    """Pools of prewarmed Bokeh server sessions, keyed by app path and public Bokeh server URL.
+
+    Params:
+    -------
+    internal_url: str
+        URL under which the Bokeh server can be reached from the web server.
+    size: int
+        Number of sessions per pool.
+    max_age: float
+        Number of seconds after which a prewarmed session isn't used any longer.
+    timeout: float
+        Timeout in seconds for the requests to the Bokeh server.
+    """
+
+    def __init__(self, internal_url, size, max_age, timeout=10):
+        self.internal_url = internal_url.rstrip('/')
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._pid = None
+
+    def add(self, app_path, url):
+        """Add a pool for an app path and public Bokeh server URL, unless prewarming is disabled."""
+
+        if not self.size:
+            return
+        with self._lock:
+            self._pools.setdefault((app_path, url), deque())
+        self._start_prewarmer()
+        self._wanted.set()
+
+    def take(self, app_path, url):
+        """Take a prewarmed session id from a pool.
+
+        The pool is created if it doesn't exist yet. None is returned if there is no prewarmed session which is young
+        enough.
+        """
+
+        if not self.size:
+            return None
+        session_id = None
+        with self._lock:
+            pool = self._pools.get((app_path, url))
+            if pool is not None:
+                while pool and session_id is None:
+                    created, candidate = pool.popleft()
+                    if time.monotonic() - created < self.max_age:
+                        session_id = candidate
+        if pool is None:
+            self.add(app_path, url)
+        else:
+            self._start_prewarmer()
+            self._wanted.set()
+        return session_id
+
+    def clear(self):
+        """Remove all pools."""
+
+        with self._lock:
+            self._pools.clear()
+
+    def _start_prewarmer(self):
+        """Start the background thread for prewarming sessions, unless it has been started in the current process."""
+
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            prewarmer = threading.Thread(target=self._run, name='BokehSessionPrewarmer')
+            prewarmer.daemon = True
+            prewarmer.start()
+            self._pid = pid
+
+    def _run(self):
+        """Refill the pools whenever sessions have been taken or have become too old."""
+
+        while True:
+            self._wanted.wait(self.max_age / 2)
+            self._wanted.clear()
+            self._refill()
+
+    def _refill(self):
+        """Remove sessions which are too old and create new sessions until all pools are full."""
+
+        with self._lock:
+            keys = list(self._pools)
+        for app_path, url in keys:
+            while True:
+                with self._lock:
+                    pool = self._pools.get((app_path, url))
+                    if pool is None:
+                        break
+                    while pool and time.monotonic() - pool[0][0] >= self.max_age:
+                        pool.popleft()
+                    if len(pool) >= self.size:
+                        break
+                session_id = self._create_session(app_path, url)
+                if session_id is None:
+                    # the Bokeh server isn't available; try again later
+                    break
+                with self._lock:
+                    pool = self._pools.get((app_path, url))
+                    if pool is not None:
+                        pool.append((time.monotonic(), session_id))
+
+    def _create_session(self, app_path, url):
+        """Let the Bokeh server create a session and return its id, or None if the session couldn't be created."""
+
+        session_id = _generate_session_id()
+        query = urlencode({'bokeh-autoload-element': 'prewarm', 'bokeh-session-id': session_id})
+        autoload_url = '{url}{app_path}/autoload.js?{query}'.format(url=self.internal_url,
+                                                                    app_path=app_path,
+                                                                    query=query)
+        # the Host header must be one of the hosts allowed by the Bokeh server
+        headers = {'Host': urlsplit(url).netloc, 'Bokeh-Session-Id': session_id}
+        try:
+            with urllib.request.urlopen(urllib.request.Request(autoload_url, headers=headers),
+                                        timeout=self.timeout) as response:
+                response.read()
+        except (urllib.error.URLError, OSError):
+            return None
+        return session_id
+
+
+def _autoload_script(app_path, url, session_id):
+    """Generate the script tag for a session of a Bokeh server app."""
+
+    try:
+        from bokeh.embed import autoload_server
+    except ImportError:
+        # autoload_server has been replaced in Bokeh 0.12.7
+        from bokeh.embed import server_session
+        return server_session(session_id=session_id, url=url + app_path)
+    return autoload_server(model=None, app_path=app_path, session_id=session_id, url=url)
+
+
+def _generate_session_id():
+    """Generate a new Bokeh session id."""
+
+    try:
+        from bokeh.util.session_id import generate_session_id
+    except ImportError:
+        # the module has been renamed in Bokeh 2.0
+        from bokeh.util.token import generate_session_id
+    return generate_session_id()
@@ -0,0 +1,435 @@
+import functools
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from webassets.version import JsonManifest
+
+# file defining the bundles
+BUNDLES_FILE = os.path.join(os.path.dirname(__file__), os.pardir, 'webassets.yaml')
+
+# folder (relative to the static folder) containing the versioned bundles, as defined in webassets.yaml
+BUNDLE_FOLDER = 'cache'
+
+# file extensions of bundles for which compressed variants are created
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.xml')
+
+# lifetime (in seconds) of versioned bundles in browser caches
+MAX_AGE = 365 * 24 * 3600
+
+# bundles loaded by load_bundles, as pairs of modification time and bundles keyed by the path of the bundle file
+_loaded_bundles = {}
+_loaded_bundles_lock = threading.Lock()
+
+
+def compress(path):
+    """Create gzip and Brotli compressed variants of a file.
+
+    The variants are saved alongside the file, with the extensions '.gz' and '.br' appended, so that nginx can serve
+    them with its `gzip_static` (and, if the Brotli module is installed, `brotli_static`) directive. Variants which
+    wouldn't be smaller than the file aren't created. The Brotli variant is only created if the brotli module is
+    installed.
+
+    The gzip variant has no timestamp, so that the output only depends on the file content.
+
+    Params:
+    -------
+    path: str
+        Path of the file.
+
+    Returns:
+    --------
+    dict
+        The sizes of the created variants, keyed by their extension ('gz' or 'br').
+    """
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    variants = {}
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename='', mode='wb', fileobj=buffer, compresslevel=9, mtime=0) as g:
+        g.write(content)
+    variants['gz'] = buffer.getvalue()
+    try:
+        import brotli
+        variants['br'] = brotli.compress(content)
+    except ImportError:
+        pass
+
+    sizes = {}
+    for extension, compressed in variants.items():
+        variant_path = '{path}.{extension}'.format(path=path, extension=extension)
+        if len(compressed) >= len(content):
+            if os.path.exists(variant_path):
+                os.remove(variant_path)
+            continue
+        tmp_path = variant_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, variant_path)
+        sizes[extension] = len(compressed)
+    return sizes
+
+
+class BundleManifest(JsonManifest):
+    """Manifest of the bundle versions which also creates compressed variants of the bundles.
+
+    Like webassets' JSON manifest, this manifest stores the version of every bundle, so that the versions needn't be
+    calculated in every server process. Whenever a bundle is built (for example by running `flask assets build`),
+    gzip and Brotli compressed variants of its output file are created (see the `compress` function), and the path,
+    SHA-256 hash and size of the output file and the sizes of its variants are recorded alongside the version.
+
+    The manifest is used by setting the Flask-Assets configuration variable `ASSETS_MANIFEST` to 'bundles:' followed by
+    the manifest path relative to the static folder, as in 'bundles:cache/manifest.json'.
+    """
+
+    id = 'bundles'
+
+    def remember(self, bundle, ctx, version):
+        self.manifest[bundle.output] = _manifest_entry(bundle, ctx, version)
+        self._save_manifest()
+
+    def query(self, bundle, ctx):
+        if ctx.auto_build:
+            self._load_manifest()
+        entry = self.manifest.get(bundle.output)
+        return entry['version'] if entry else None
+
+    def _save_manifest(self):
+        # write to a temporary file first, so that other processes never read an incomplete manifest
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+        os.replace(self.filename + '.tmp', self.filename)
+
+
+def build_bundles(config_name, env, names=None, force=False, workers=None):
+    """Build the bundles whose input has changed since they were last built.
+
+    A hash of the bundle definition and the content of all its input files is stored in the bundle manifest (see
+    `BundleManifest`) whenever a bundle is built. A bundle is only built if this hash has changed or its output file
+    doesn't exist. Bundles are built in parallel in separate processes, and the manifest (including the build time of
+    every built bundle) is written once all of them have been built.
+
+    The bundles must have an output file, and the Flask-Assets manifest must be a `BundleManifest`.
+
+    Params:
+    -------
+    config_name: str
+        Configuration name, which is used for creating the app in the build processes.
+    env: webassets.Environment
+        Environment containing the bundles.
+    names: list of str
+        Names of the bundles to consider. All bundles defined in `BUNDLES_FILE` are considered if this is None.
+    force: bool
+        Whether to build the bundles even if their input hasn't changed.
+    workers: int
+        Maximum number of build processes. The number of CPUs is used if this is None.
+
+    Returns:
+    --------
+    dict
+        The manifest entries of the bundles, keyed by the bundle name. Built bundles have a key 'built' with the value
+        True.
+    """
+
+    from webassets.bundle import wrap
+    from webassets.version import get_manifest
+
+    manifest = get_manifest(env.config['manifest'], env=env)
+    if not isinstance(manifest, BundleManifest):
+        raise ValueError('The assets manifest must be a bundle manifest (bundles:<path>).')
+    # the manifest object may have been created (and loaded) earlier
+    manifest._load_manifest()
+
+    entries = {}
+    input_hashes = {}
+    for name in names or _bundle_names(env):
+        bundle = env[name]
+        input_hash = _input_hash(bundle, wrap(env, bundle))
+        entry = manifest.manifest.get(bundle.output)
+        if not force and entry and entry.get('input_hash') == input_hash and \
+                os.path.exists(os.path.join(env.directory, entry['path'])):
+            entries[name] = dict(entry, built=False)
+        else:
+            input_hashes[name] = input_hash
+
+    if input_hashes:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            names_to_build = sorted(input_hashes)
+            for name, entry in zip(names_to_build, executor.map(_build_bundle,
+                                                                [config_name] * len(names_to_build),
+                                                                names_to_build)):
+                entry['input_hash'] = input_hashes[name]
+                manifest.manifest[env[name].output] = entry
+                entries[name] = dict(entry, built=True)
+        manifest._save_manifest()
+
+    return entries
+
+
+def load_bundles(path, env=None):
+    """Load the bundles defined in a YAML file (such as `webassets.yaml`).
+
+    The bundles are only loaded the first time this function is called for a file, and whenever the file has been
+    modified since. Otherwise the bundles loaded before are returned. Use `register_bundles` for registering them, so
+    that an app can be created more than once in the same process, even if the file has been modified in between.
+
+    Params:
+    -------
+    path: str
+        Path of the YAML file.
+    env: webassets.Environment
+        Environment used for resolving references to other bundles in the file.
+
+    Returns:
+    --------
+    dict
+        The bundles, keyed by their name.
+    """
+
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _loaded_bundles_lock:
+        loaded = _loaded_bundles.get(path)
+        if loaded is None or loaded[0] != mtime:
+            # importing the YAML loader takes a while
+            from webassets.loaders import YAMLLoader
+            loaded = mtime, YAMLLoader(path).load_bundles(env)
+            _loaded_bundles[path] = loaded
+    return loaded[1]
+
+
+def register_bundles(env, bundles):
+    """Register bundles with an environment, skipping names which are registered already.
+
+    webassets refuses to register a different bundle under an existing name, which would be the case if the bundle
+    file has been modified and loaded again since an app was created in the same process. The bundles registered first
+    are kept, so that modified bundle definitions take effect in new processes.
+
+    Params:
+    -------
+    env: webassets.Environment
+        Environment.
+    bundles: dict
+        The bundles, keyed by their name.
+    """
+
+    for name, bundle in bundles.items():
+        if name not in env:
+            env.register(name, bundle)
+
+
+def read_manifest(env):
+    """Read the bundle manifest.
+
+    Params:
+    -------
+    env: webassets.Environment
+        Environment containing the bundles.
+
+    Returns:
+    --------
+    dict
+        The manifest entries of the bundles defined in `BUNDLES_FILE`, keyed by the bundle name. Bundles which aren't
+        in the manifest are omitted.
+    """
+
+    from webassets.version import get_manifest
+
+    manifest = get_manifest(env.config['manifest'], env=env)
+    if not isinstance(manifest, BundleManifest):
+        return {}
+    manifest._load_manifest()
+    entries = {}
+    for name in _bundle_names(env):
+        entry = manifest.manifest.get(env[name].output)
+        if entry:
+            entries[name] = entry
+    return entries
+
+
+@click.group('bundles', cls=AppGroup)
+def bundles_command():
+    """Build and inspect the webassets bundles."""
+
+
+@bundles_command.command('build')
+@click.option('--force', is_flag=True, help='Build all bundles, even if their input hasn\'t changed.')
+@click.option('--workers', type=int, default=None, help='Maximum number of build processes.')
+@click.argument('names', nargs=-1)
+def build_command(force, workers, names):
+    """Build the bundles whose input has changed."""
+
+    env = current_app.jinja_env.assets_environment
+    entries = build_bundles(os.environ.get('FLASK_CONFIG', 'development'), env, names=names, force=force,
+                            workers=workers)
+    for name, entry in sorted(entries.items()):
+        if entry['built']:
+            message = '{name}: built {path} in {time:.2f} s'
+            print(message.format(name=name, path=entry['path'], time=entry['build_time']))
+        else:
+            print('{name}: {path} is up to date'.format(name=name, path=entry['path']))
+
+
+@bundles_command.command('report')
+def report_command():
+    """Show the size and last build time of every bundle."""
+
+    columns = ['bundle', 'path', 'size', 'gz_size', 'br_size', 'build_time']
+    row = '{0:<20} {1:<40} {2:>10} {3:>10} {4:>10} {5:>12}'
+    print(row.format(*columns))
+    entries = read_manifest(current_app.jinja_env.assets_environment)
+    for name, entry in sorted(entries.items()):
+        build_time = entry.get('build_time')
+        print(row.format(name,
+                         entry['path'],
+                         entry['size'],
+                         entry.get('gz_size', '-'),
+                         entry.get('br_size', '-'),
+                         '{0:.2f} s'.format(build_time) if build_time is not None else '-'))
+
+
+class StaticBundles:
+    """Flask extension adding HTTP caching headers to versioned bundles served by the static route.
+
+    Files in the bundle folder (`app/static/cache`) are assumed to include a version in their name, so that their
+    content never changes. They are served with a `Cache-Control` header allowing browsers to cache them for a year
+    without revalidating them, and with a strong ETag based on their content, so that conditional requests are answered
+    with a 304 response.
+
+    In production nginx serves the static files itself, and the same headers are set in `nginx.conf`. This extension
+    covers the case that the Flask server is used.
+
+    In addition the extension sets the Flask-Assets manifest to a `BundleManifest`, unless another manifest has been
+    configured already, so that compressed variants of the bundles are created when they are built.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        app.config.setdefault('ASSETS_MANIFEST', 'bundles:{folder}/manifest.json'.format(folder=BUNDLE_FOLDER))
+
+        @app.after_request
+        def add_bundle_caching_headers(response):
+            if request.endpoint != 'static' or response.status_code not in (200, 304):
+                return response
+            filename = (request.view_args or {}).get('filename', '')
+            if not filename.startswith(BUNDLE_FOLDER + '/'):
+                return response
+
+            path = os.path.join(app.static_folder, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return response
+            response.cache_control.public = True
+            response.cache_control.max_age = MAX_AGE
+            response.cache_control.no_cache = None
+            response.headers['Cache-Control'] += ', immutable'
+            response.set_etag(_file_etag(path, stat.st_mtime_ns, stat.st_size))
+            return response.make_conditional(request)
+
+
+def _bundle_names(env):
+    """Get the sorted names of the bundles defined in `BUNDLES_FILE` which are registered with an environment."""
+
+    return sorted(name for name in load_bundles(BUNDLES_FILE, env=env) if name in env)
+
+
+def _manifest_entry(bundle, ctx, version):
+    """Create compressed variants of a bundle's output file and return the bundle's manifest entry."""
+
+    path = bundle.resolve_output(ctx, version=version)
+    entry = dict(version=version,
+                 path=os.path.relpath(path, ctx.directory),
+                 sha256=_sha256(path),
+                 size=os.path.getsize(path))
+    if path.endswith(COMPRESSIBLE_EXTENSIONS):
+        entry.update({'{0}_size'.format(extension): size for extension, size in compress(path).items()})
+    return entry
+
+
+def _input_hash(bundle, ctx):
+    """Get a hash of a bundle's definition and the content of its input files (including nested bundles)."""
+
+    from webassets import Bundle
+
+    sha256 = hashlib.sha256(str(bundle.id()).encode('utf-8'))
+    for item, path in bundle.resolve_contents(ctx):
+        if isinstance(path, Bundle):
+            sha256.update(_input_hash(path, ctx).encode('utf-8'))
+        else:
+            sha256.update(os.path.relpath(path, ctx.directory).encode('utf-8'))
+            sha256.update(_sha256(path).encode('utf-8'))
+    for path in bundle.resolve_depends(ctx):
+        sha256.update(_sha256(path).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+# app used for building bundles in a build process
+_build_app = None
+
+
+def _build_bundle(config_name, name):
+    """Build a bundle in a build process and return its manifest entry (including the build time)."""
+
+    global _build_app
+    if _build_app is None:
+        from . import create_app
+        _build_app = create_app(config_name)
+        # the manifest is written by the parent process
+        _build_app.config['ASSETS_MANIFEST'] = False
+
+    with _build_app.app_context():
+        from webassets.bundle import wrap
+
+        env = _build_app.jinja_env.assets_environment
+        bundle = env[name]
+        start = time.perf_counter()
+        bundle.build(force=True)
+        entry = _manifest_entry(bundle, wrap(env, bundle), bundle.get_version())
+        entry['build_time'] = time.perf_counter() - start
+    return entry
+
+
+@functools.lru_cache(maxsize=256)
+def _file_etag(path, mtime, size):
+    """Get the ETag for a file. The modification time and size are passed so that changed files get a new ETag."""
+
+    return _sha256(path)[:32]
+
+
+def _sha256(path):
+    """Get the hex SHA-256 hash of a file's content."""
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(functools.partial(f.read, 64 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
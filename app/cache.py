@@ -0,0 +1,308 @@
+import functools
+import threading
+import time
+
+from collections import OrderedDict
+
+from flask import current_app, has_request_context, request
+
+
+class LRUCache:
+    """A thread-safe in-memory cache with a time to live and least-recently-used eviction.
+
+    The total size of the cached values is bounded. The size of a value is determined by the `sizeof` function, which by
+    default counts every value as 1, so that `max_size` is just the maximum number of entries. Whenever adding a value
+    would exceed the bound, the least recently used entries are evicted.
+
+    The cache is local to the process. If you run multiple worker processes, each of them has its own cache.
+
+    Params:
+    -------
+    timeout: float
+        Number of seconds after which an entry expires. Entries never expire if this is None or 0.
+    max_size: int
+        Maximum total size of the cached values. The size is unbounded if this is None or 0.
+    sizeof: function
+        Function which takes a value and returns its size.
+    """
+
+    def __init__(self, timeout=None, max_size=None, sizeof=None):
+        self.timeout = timeout
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get a cached value.
+
+        A hit moves the entry to the end of the eviction queue. Expired entries are removed.
+
+        Params:
+        -------
+        key: hashable
+            Key of the value.
+        default: object
+            Value to return if there is no (unexpired) entry for the key.
+
+        Returns:
+        --------
+        object
+            The cached value, or the default value.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        """Cache a value.
+
+        Values which are larger than the maximum size aren't cached at all.
+
+        Params:
+        -------
+        key: hashable
+            Key of the value.
+        value: object
+            Value to cache.
+        timeout: float
+            Number of seconds after which the entry expires. The cache's default timeout is used if this is None.
+        """
+
+        timeout = self.timeout if timeout is None else timeout
+        expires = time.monotonic() + timeout if timeout else None
+        size = self.sizeof(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_size and size > self.max_size:
+                return
+            while self.max_size and self._entries and self.size + size > self.max_size:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = (value, size, expires)
+            self.size += size
+
+    def delete(self, key):
+        """Remove the entry for a key, if there is one.
+
+        Params:
+        -------
+        key: hashable
+            Key of the entry to remove.
+        """
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_where(self, predicate):
+        """Remove all entries whose key matches a predicate.
+
+        Params:
+        -------
+        predicate: function
+            Function which takes a key and returns True if the corresponding entry should be removed.
+
+        Returns:
+        --------
+        int
+            The number of removed entries.
+        """
+
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries."""
+
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        """Remove an entry. The caller must hold the lock."""
+
+        value, size, expires = self._entries.pop(key)
+        self.size -= size
+
+
+class PlotCache:
+    """Cache for the script and div generated by Bokeh's `components` function.
+
+    The cache is used by means of the `cached` decorator, which should be applied to a function returning the result
+    of the `components` function. The cache key is formed from the function name, the request path and the request's
+    query arguments, as well as the arguments passed to the decorated function. So a route might look as follows.
+
+    ```python
+    @main.route('/sine')
+    def sine_plot():
+        script, div = sine_components()
+        return render_template('plot.html', script=script, div=div)
+
+
+    @plot_cache.cached()
+    def sine_components():
+        p = figure(title='Sine')
+        ...
+        return components(p)
+    ```
+
+    The template is still rendered for every request, so that user specific content such as the navigation bar remains
+    correct.
+
+    Timeout and maximum size are read from the app configuration variables `PLOT_CACHE_TIMEOUT` and
+    `PLOT_CACHE_MAX_SIZE`. The size of an entry is the total number of characters in its script and div. Caching is
+    disabled if the maximum size is 0.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the cache for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        if app.config.get('PLOT_CACHE_MAX_SIZE', 0):
+            cache = LRUCache(timeout=app.config.get('PLOT_CACHE_TIMEOUT'),
+                             max_size=app.config['PLOT_CACHE_MAX_SIZE'],
+                             sizeof=lambda components: sum(len(c) for c in components))
+        else:
+            cache = None
+        app.extensions['plot_cache'] = cache
+
+    def cached(self, timeout=None):
+        """Decorator for caching the output of a function returning Bokeh components.
+
+        The decorated function gets an additional method `invalidate`, which takes the same (optional) parameters as
+        this class' `invalidate` method (apart from the function).
+
+        Params:
+        -------
+        timeout: float
+            Number of seconds after which the cached output expires. The configured timeout is used if this is None.
+
+        Returns:
+        --------
+        function
+            The decorator.
+        """
+
+        def decorator(f):
+            name = f.__module__ + '.' + f.__name__
+
+            @functools.wraps(f)
+            def decorated(*args, **kwargs):
+                cache = self.cache
+                if cache is None:
+                    return f(*args, **kwargs)
+
+                key = PlotCache._key(name, args, kwargs)
+                value = cache.get(key)
+                if value is None:
+                    value = tuple(f(*args, **kwargs))
+                    cache.set(key, value, timeout=timeout)
+                return value
+
+            decorated.cache_name = name
+            decorated.invalidate = functools.partial(self.invalidate, decorated)
+            return decorated
+
+        return decorator
+
+    def invalidate(self, f=None, path=None):
+        """Remove cached components.
+
+        If neither a function nor a path is given, all entries are removed. Otherwise only the entries for the given
+        function and/or request path are removed.
+
+        Only the cache of the current process is affected.
+
+        Params:
+        -------
+        f: function
+            Function decorated with the `cached` decorator.
+        path: str
+            Request path, such as '/sine'.
+
+        Returns:
+        --------
+        int
+            The number of removed entries.
+        """
+
+        cache = self.cache
+        if cache is None:
+            return 0
+
+        def matches(key):
+            return (f is None or key[0] == f.cache_name) and (path is None or key[1] == path)
+
+        return cache.delete_where(matches)
+
+    @property
+    def cache(self):
+        """The cache for the current app, or None if caching is disabled."""
+
+        return current_app.extensions.get('plot_cache')
+
+    @staticmethod
+    def _key(name, args, kwargs):
+        """Get the cache key for a function call in the current request.
+
+        Params:
+        -------
+        name: str
+            Fully qualified function name.
+        args: tuple
+            Positional function arguments.
+        kwargs: dict
+            Keyword function arguments.
+
+        Returns:
+        --------
+        tuple
+            The cache key.
+        """
+
+        if has_request_context():
+            path = request.path
+            query = tuple(sorted(request.args.items(multi=True)))
+        else:
+            path = None
+            query = ()
+        return name, path, query, args, tuple(sorted(kwargs.items()))
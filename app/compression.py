@@ -0,0 +1,303 @@
+import zlib
+
+# content types which are compressed by default
+COMPRESSIBLE_MIMETYPES = ('application/javascript', 'application/json', 'application/x-ndjson', 'application/xml',
+                          'image/svg+xml', 'text/css', 'text/csv', 'text/html', 'text/javascript', 'text/plain',
+                          'text/xml')
+
+# encodings in order of preference
+GZIP = 'gzip'
+BROTLI = 'br'
+
+
+class CompressionMiddleware:
+    """WSGI middleware compressing responses with gzip or Brotli.
+
+    The encoding is negotiated with the request's `Accept-Encoding` header. Brotli is preferred if the client accepts
+    it and the brotli module is installed. A response is only compressed if its content type is in the allowlist, it
+    isn't compressed already, its status code implies a body and its `Cache-Control` header doesn't forbid
+    transformations. Responses smaller than `min_size` bytes aren't compressed either, as compression wouldn't gain
+    anything. If a response has no `Content-Length` header (because it is streamed), up to `min_size` bytes of it are
+    read before deciding whether to compress it.
+
+    The body is compressed incrementally while it is iterated over, so that streamed responses are never held in
+    memory as a whole. Compressed responses have no `Content-Length` header, and their ETag is turned into a weak one.
+    All responses with a compressible content type get a `Vary: Accept-Encoding` header.
+
+    Params:
+    -------
+    wsgi_app: function
+        WSGI app.
+    level: int
+        gzip compression level (1 to 9).
+    brotli_quality: int
+        Brotli quality (0 to 11).
+    min_size: int
+        Minimum number of bytes for a response to be compressed.
+    mimetypes: iterable of str
+        Content types (without parameters) of the responses which may be compressed.
+    """
+
+    def __init__(self, wsgi_app, level=6, brotli_quality=4, min_size=500, mimetypes=COMPRESSIBLE_MIMETYPES):
+        self.wsgi_app = wsgi_app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        try:
+            import brotli
+            self._brotli = brotli
+        except ImportError:
+            self._brotli = None
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, _VaryingStartResponse(start_response, self.mimetypes))
+
+        response = _CompressedResponse(self, encoding, start_response)
+        return response.run(self.wsgi_app(environ, response.start_response))
+
+    def negotiate(self, accept_encoding):
+        """Choose the encoding for a response.
+
+        Params:
+        -------
+        accept_encoding: str
+            Value of the `Accept-Encoding` request header.
+
+        Returns:
+        --------
+        str
+            The encoding ('br' or 'gzip'), or None if the response shouldn't be compressed.
+        """
+
+        accepted = {}
+        for item in accept_encoding.split(','):
+            coding, _, parameters = item.strip().partition(';')
+            quality = 1.0
+            parameter, _, value = parameters.strip().partition('=')
+            if parameter.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                accepted[coding.strip().lower()] = quality
+
+        def quality_of(coding):
+            return accepted.get(coding, accepted.get('*', 0.0))
+
+        if self._brotli is not None and quality_of(BROTLI) > 0 and quality_of(BROTLI) >= quality_of(GZIP):
+            return BROTLI
+        if quality_of(GZIP) > 0:
+            return GZIP
+        return None
+
+    def compressor(self, encoding):
+        """Create a compressor for an encoding, as a pair of functions compressing a chunk and finishing the stream."""
+
+        if encoding == BROTLI:
+            compressor = self._brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, compressor.flush
+
+    def is_compressible(self, status, headers):
+        """Check whether a response with the given status and headers may be compressed (irrespective of its size)."""
+
+        code = int(status.split(None, 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        if _header(headers, 'Content-Encoding') is not None:
+            return False
+        if 'no-transform' in (_header(headers, 'Cache-Control') or '').lower():
+            return False
+        return _mimetype(headers) in self.mimetypes
+
+
+class _VaryingStartResponse:
+    """start_response wrapper adding a `Vary: Accept-Encoding` header for compressible content types."""
+
+    def __init__(self, start_response, mimetypes):
+        self._start_response = start_response
+        self._mimetypes = mimetypes
+
+    def __call__(self, status, headers, exc_info=None):
+        if _mimetype(headers) in self._mimetypes:
+            headers = _add_vary(headers)
+        return self._start_response(status, headers, exc_info)
+
+
+class _CompressedResponse:
+    """The response to a request which accepts a compressed response."""
+
+    def __init__(self, middleware, encoding, start_response):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._start_response = start_response
+        self._status = None
+        self._headers = None
+        self._exc_info = None
+        self._started = False
+        self._written = []
+
+    def start_response(self, status, headers, exc_info=None):
+        if exc_info is not None and self._started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self._status = status
+        self._headers = list(headers)
+        self._exc_info = exc_info
+        # data passed to the (deprecated) write function is sent before the body
+        return self._write
+
+    def _write(self, data):
+        self._written.append(data)
+
+    def run(self, app_iter):
+        """Return the compressed (or uncompressed) body for the app's body."""
+
+        try:
+            iterator = iter(app_iter)
+            buffered = []
+            if self._status is None:
+                # the app may call start_response when the first chunk of the body is requested
+                for chunk in iterator:
+                    buffered.append(chunk)
+                    break
+            buffered = self._written + buffered
+            self._written = []
+            size = sum(len(chunk) for chunk in buffered)
+            if self.middleware.is_compressible(self._status, self._headers):
+                content_length = _header(self._headers, 'Content-Length')
+                if content_length is None:
+                    # read the start of a streamed response to find out whether it is big enough
+                    for chunk in iterator:
+                        buffered.append(chunk)
+                        size += len(chunk)
+                        if size >= self.middleware.min_size:
+                            break
+                    compress = size >= self.middleware.min_size
+                else:
+                    compress = int(content_length) >= self.middleware.min_size
+                headers = _add_vary(self._headers)
+            else:
+                compress = False
+                headers = self._headers
+        except BaseException:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+            raise
+
+        if compress:
+            headers = [(name, _weak_etag(value) if name.lower() == 'etag' else value) for name, value in headers
+                       if name.lower() != 'content-length']
+            headers.append(('Content-Encoding', self.encoding))
+        self._start_response(self._status, headers, self._exc_info)
+        self._started = True
+        return _ClosingIterator(self._body(buffered, iterator, compress), app_iter)
+
+    def _body(self, buffered, iterator, compress):
+        if not compress:
+            for chunk in buffered:
+                yield chunk
+            for chunk in iterator:
+                yield chunk
+            return
+
+        process, finish = self.middleware.compressor(self.encoding)
+        for chunk in buffered:
+            compressed = process(chunk)
+            if compressed:
+                yield compressed
+        for chunk in iterator:
+            compressed = process(chunk)
+            if compressed:
+                yield compressed
+        yield finish()
+
+
+class _ClosingIterator:
+    """Iterator over a body which closes the app's iterable when it is closed."""
+
+    def __init__(self, body, app_iter):
+        self._body = body
+        self._app_iter = app_iter
+
+    def __iter__(self):
+        return self._body
+
+    def close(self):
+        self._body.close()
+        if hasattr(self._app_iter, 'close'):
+            self._app_iter.close()
+
+
+class Compression:
+    """Flask extension compressing responses.
+
+    The app's WSGI app is wrapped in a `CompressionMiddleware`. The gzip compression level, the Brotli quality and the
+    minimum response size are read from the app configuration variables `COMPRESSION_LEVEL`,
+    `COMPRESSION_BROTLI_QUALITY` and `COMPRESSION_MIN_SIZE`, and the allowlist of content types from
+    `COMPRESSION_MIMETYPES`. Compression is disabled if the level is 0.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        level = app.config.get('COMPRESSION_LEVEL', 6)
+        if not level:
+            return
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                             level=level,
+                                             brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+                                             min_size=app.config.get('COMPRESSION_MIN_SIZE', 500),
+                                             mimetypes=app.config.get('COMPRESSION_MIMETYPES', COMPRESSIBLE_MIMETYPES))
+
+
+def _header(headers, name):
+    """Get the value of a header, or None if there is no such header."""
+
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _mimetype(headers):
+    """Get the content type of a response without parameters."""
+
+    return (_header(headers, 'Content-Type') or '').split(';', 1)[0].strip().lower()
+
+
+def _add_vary(headers):
+    """Add Accept-Encoding to the Vary header."""
+
+    vary = _header(headers, 'Vary')
+    if vary is None:
+        return list(headers) + [('Vary', 'Accept-Encoding')]
+    if 'accept-encoding' in vary.lower() or vary.strip() == '*':
+        return list(headers)
+    return [(name, value + ', Accept-Encoding' if name.lower() == 'vary' else value) for name, value in headers]
+
+
+def _weak_etag(etag):
+    """Turn an ETag into a weak ETag, as the compressed body differs from the uncompressed one."""
+
+    return etag if etag.startswith('W/') else 'W/' + etag
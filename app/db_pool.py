@@ -0,0 +1,312 @@
+import json
+import os
+import threading
+import time
+
+import flask_sqlalchemy
+from sqlalchemy import exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+from .processes import is_running
+
+
+class PoolStatistics:
+    """Statistics for the database connection pool of a process.
+
+    The statistics are periodically written as a JSON file named after the process id to a directory shared by all
+    processes, so that they can be collected with the `read_pool_statistics` function.
+
+    Params:
+    -------
+    directory: str
+        Directory for the statistics files. The statistics aren't written to file if this is None.
+    write_interval: float
+        Minimum number of seconds between writing the statistics to file.
+    """
+
+    def __init__(self, directory=None, write_interval=1):
+        self.directory = directory
+        self.write_interval = write_interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all statistics, for example in a worker process forked from a process which has used the pool."""
+
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.timeouts = 0
+            self.invalidations = 0
+            self.wait_time = 0.0
+            self.max_wait_time = 0.0
+            self.max_checked_out = 0
+            self.max_overflow = 0
+            self._last_written = 0
+
+    def record_checkout(self, pool, wait_time):
+        """Record a connection checkout.
+
+        Params:
+        -------
+        pool: QueuePool
+            The pool from which the connection was checked out.
+        wait_time: float
+            Number of seconds spent waiting for the connection.
+        """
+
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            self.max_checked_out = max(self.max_checked_out, pool.checkedout())
+            self.max_overflow = max(self.max_overflow, pool.overflow())
+        self.write(pool)
+
+    def record_checkin(self, pool):
+        """Record a connection checkin.
+
+        Params:
+        -------
+        pool: QueuePool
+            The pool to which the connection was returned.
+        """
+
+        with self._lock:
+            self.checkins += 1
+        self.write(pool)
+
+    def record_timeout(self, pool):
+        """Record a checkout which timed out because the pool was exhausted.
+
+        Params:
+        -------
+        pool: QueuePool
+            The exhausted pool.
+        """
+
+        with self._lock:
+            self.timeouts += 1
+        self.write(pool, force=True)
+
+    def record_invalidation(self):
+        """Record the invalidation of a connection."""
+
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool):
+        """Get the current statistics.
+
+        Params:
+        -------
+        pool: QueuePool
+            The pool for which the statistics are collected.
+
+        Returns:
+        --------
+        dict
+            The statistics.
+        """
+
+        with self._lock:
+            return dict(
+                pid=os.getpid(),
+                updated=time.time(),
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+                checkouts=self.checkouts,
+                checkins=self.checkins,
+                timeouts=self.timeouts,
+                invalidations=self.invalidations,
+                total_wait_time=self.wait_time,
+                max_wait_time=self.max_wait_time,
+                max_checked_out=self.max_checked_out,
+                max_overflow=self.max_overflow
+            )
+
+    def write(self, pool, force=False):
+        """Write the current statistics to file.
+
+        Unless forced, nothing is written if the statistics have been written less than `write_interval` seconds
+        ago.
+
+        Params:
+        -------
+        pool: QueuePool
+            The pool for which the statistics are collected.
+        force: bool
+            Whether to write the statistics irrespective of when they were written last.
+        """
+
+        if self.directory is None:
+            return
+        now = time.time()
+        if not force and now - self._last_written < self.write_interval:
+            return
+        self._last_written = now
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, '{pid}.json'.format(pid=os.getpid()))
+        tmp_path = '{path}.{thread}.tmp'.format(path=path, thread=threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(pool), f)
+        os.replace(tmp_path, path)
+
+
+class MeteredQueuePool(QueuePool):
+    """A queue pool which records statistics and optionally checks connections before handing them out.
+
+    If `ping_on_checkout` is True, a `SELECT 1` query is executed on every connection checked out from the pool. If the
+    query fails (for example because the MySQL server has closed the connection), the connection is invalidated and a
+    new one is established.
+
+    Params:
+    -------
+    creator: function
+        Function returning a DB-API connection.
+    ping_on_checkout: bool
+        Whether to check connections before handing them out.
+    statistics: PoolStatistics
+        Object for recording the pool statistics.
+    **kwargs: keyword arguments
+        Keyword arguments for the QueuePool constructor.
+    """
+
+    def __init__(self, creator, ping_on_checkout=False, statistics=None, **kwargs):
+        QueuePool.__init__(self, creator, **kwargs)
+        self.ping_on_checkout = ping_on_checkout
+        self.statistics = statistics or PoolStatistics()
+
+    def recreate(self):
+        pool = QueuePool.recreate(self)
+        pool.ping_on_checkout = self.ping_on_checkout
+        pool.statistics = self.statistics
+        return pool
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            record = QueuePool._do_get(self)
+        except exc.TimeoutError:
+            self.statistics.record_timeout(self)
+            raise
+        self.statistics.record_checkout(self, time.monotonic() - start)
+
+        # the DB-API connection is called dbapi_connection since SQLAlchemy 1.4
+        dbapi_connection = getattr(record, 'dbapi_connection', None) or record.connection
+        if self.ping_on_checkout and dbapi_connection is not None:
+            try:
+                cursor = dbapi_connection.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+            except Exception as e:
+                # the connection will be re-established when the record is checked out
+                record.invalidate(e)
+                self.statistics.record_invalidation()
+
+        return record
+
+    def _do_return_conn(self, record):
+        QueuePool._do_return_conn(self, record)
+        self.statistics.record_checkin(self)
+
+    def _invalidate(self, *args, **kwargs):
+        self.statistics.record_invalidation()
+        return QueuePool._invalidate(self, *args, **kwargs)
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """Flask-SQLAlchemy extension using a metered connection pool.
+
+    The pool is used for all databases other than SQLite. Its size, overflow, recycle time and timeout are set by the
+    app configuration variables `DATABASE_POOL_SIZE`, `DATABASE_POOL_MAX_OVERFLOW`, `DATABASE_POOL_RECYCLE` and
+    `DATABASE_POOL_TIMEOUT`. Whether connections are checked on checkout and where the pool statistics are written to
+    is set by `DATABASE_POOL_PRE_PING` and `DATABASE_POOL_STATS_DIR`.
+
+    The pool options are added to the engine options in the driver-specific hook of Flask-SQLAlchemy, which is called
+    `apply_driver_hacks` in version 2 and `_apply_driver_defaults` in version 3. (Version 3 ignores the
+    `SQLALCHEMY_POOL_*` configuration variables, hence these aren't used.)
+    """
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        # Flask-SQLAlchemy 2.x (which returns the URL and options from version 2.4 on)
+        result = flask_sqlalchemy.SQLAlchemy.apply_driver_hacks(self, app, sa_url, options)
+        if result is not None:
+            sa_url, options = result
+        _apply_pool_options(app, sa_url.drivername, options)
+        return result
+
+    def _apply_driver_defaults(self, options, app):
+        # Flask-SQLAlchemy 3.x
+        flask_sqlalchemy.SQLAlchemy._apply_driver_defaults(self, options, app)
+        _apply_pool_options(app, make_url(options['url']).drivername, options)
+
+
+def _apply_pool_options(app, drivername, options):
+    """Add the options for the metered connection pool to the engine options, unless the database is SQLite.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    drivername: str
+        Driver name of the database URL.
+    options: dict
+        Engine options.
+    """
+
+    if drivername.startswith('sqlite'):
+        return
+    options['poolclass'] = MeteredQueuePool
+    for option, key in (('pool_size', 'DATABASE_POOL_SIZE'),
+                        ('max_overflow', 'DATABASE_POOL_MAX_OVERFLOW'),
+                        ('pool_recycle', 'DATABASE_POOL_RECYCLE'),
+                        ('pool_timeout', 'DATABASE_POOL_TIMEOUT')):
+        if key in app.config:
+            options[option] = app.config[key]
+    options['ping_on_checkout'] = app.config.get('DATABASE_POOL_PRE_PING', False)
+    options['statistics'] = PoolStatistics(directory=app.config.get('DATABASE_POOL_STATS_DIR'))
+
+
+def read_pool_statistics(directory):
+    """Read the pool statistics of all running processes.
+
+    Statistics files of processes which aren't running any longer are deleted.
+
+    Params:
+    -------
+    directory: str
+        Directory containing the statistics files.
+
+    Returns:
+    --------
+    list of dict
+        The statistics, sorted by process id.
+    """
+
+    if not os.path.isdir(directory):
+        return []
+
+    statistics = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(directory, filename)
+        pid = int(filename[:-len('.json')])
+        if not is_running(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                statistics.append(json.load(f))
+        except FileNotFoundError:
+            # the process has stopped and another process has removed the file in the meantime
+            continue
+
+    return sorted(statistics, key=lambda s: s['pid'])
@@ -0,0 +1,186 @@
+import numpy as np
+
+
+def downsample(df, x, y, width=None, num_points=None, method='lttb', points_per_pixel=2):
+    """Reduce the number of rows of a dataframe for plotting.
+
+    The target number of points is either given explicitly or calculated from the plot width (in pixels). Plotting more
+    than a few points per pixel doesn't improve a plot, but it increases both the size of the data sent to the browser
+    and the time it takes to render the plot.
+
+    Two methods are available:
+
+    'lttb'
+        The Largest-Triangle-Three-Buckets algorithm, which preserves the visual shape of a line. This is a good choice
+        for line plots.
+    'minmax'
+        The minimum and maximum value in each bucket of consecutive points. This guarantees that spikes aren't lost,
+        which might matter more than the shape for noisy data.
+
+    Rows with a missing x or y value are dropped. The dataframe must be sorted by its x values.
+
+    If more than one y column is given, the points are chosen for each column separately, and the union of the chosen
+    rows is returned. So in this case the returned dataframe may have more rows than requested.
+
+    Params:
+    -------
+    df: DataFrame
+        Dataframe to downsample.
+    x: str
+        Name of the column with the x values. The index is used if this is None. Datetime values are supported.
+    y: str or list of str
+        Name(s) of the column(s) with the y values.
+    width: int
+        Plot width in pixels.
+    num_points: int
+        Number of points to keep. This takes precedence over the plot width.
+    method: str
+        Downsampling method, 'lttb' or 'minmax'.
+    points_per_pixel: float
+        Number of points to keep per pixel of the plot width.
+
+    Returns:
+    --------
+    DataFrame
+        Dataframe with a subset of the rows of the given dataframe.
+    """
+
+    methods = dict(lttb=lttb, minmax=min_max)
+    if method not in methods:
+        raise ValueError('Unknown downsampling method: {0}'.format(method))
+    if num_points is None:
+        if width is None:
+            raise ValueError('Either the plot width or the number of points must be given.')
+        num_points = int(width * points_per_pixel)
+
+    y_columns = [y] if isinstance(y, str) else list(y)
+    df = df.dropna(subset=y_columns + ([x] if x is not None else []))
+    if len(df) <= num_points:
+        return df
+
+    x_values = _as_float(df.index.values if x is None else df[x].values)
+    indices = [methods[method](x_values, _as_float(df[column].values), num_points) for column in y_columns]
+    rows = indices[0] if len(indices) == 1 else np.unique(np.concatenate(indices))
+
+    return df.iloc[rows]
+
+
+def lttb(x, y, num_points):
+    """Select points with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last point are always selected. The remaining points are split into `num_points - 2` buckets of
+    consecutive points, and from each bucket the point is selected which forms the largest triangle with the point
+    selected from the previous bucket and the average of the next bucket.
+
+    See Sveinn Steinarsson, Downsampling Time Series for Visual Representation (2013),
+    http://hdl.handle.net/1946/15343.
+
+    Params:
+    -------
+    x: ndarray
+        Finite x values, sorted in ascending order.
+    y: ndarray
+        Finite y values.
+    num_points: int
+        Number of points to select.
+
+    Returns:
+    --------
+    ndarray
+        The indices of the selected points, in ascending order.
+    """
+
+    n = len(x)
+    if num_points >= n or num_points < 3:
+        return np.arange(n)
+
+    # bucket i covers the indices edges[i] to edges[i + 1] - 1
+    edges = np.linspace(1, n - 1, num_points - 1).astype(np.int64)
+
+    # bucket averages, calculated from cumulative sums
+    counts = np.diff(edges)
+    x_sums = np.concatenate(([0], np.cumsum(x)))
+    y_sums = np.concatenate(([0], np.cumsum(y)))
+    x_averages = (x_sums[edges[1:]] - x_sums[edges[:-1]]) / counts
+    y_averages = (y_sums[edges[1:]] - y_sums[edges[:-1]]) / counts
+
+    # the point following the last bucket is the last point
+    next_x = np.append(x_averages[1:], x[-1])
+    next_y = np.append(y_averages[1:], y[-1])
+
+    selected = np.empty(num_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(num_points - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        areas = np.abs((x[start:end] - ax) * (next_y[i] - ay) - (next_x[i] - ax) * (y[start:end] - ay))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def min_max(x, y, num_points):
+    """Select the points with the minimum and maximum y value in buckets of consecutive points.
+
+    The points are split into `num_points // 2` buckets, and from each bucket the points with the smallest and largest
+    y value are selected. The first and last point are always selected.
+
+    Params:
+    -------
+    x: ndarray
+        Finite x values, sorted in ascending order. These are not used, but are accepted for consistency with `lttb`.
+    y: ndarray
+        Finite y values.
+    num_points: int
+        Approximate number of points to select.
+
+    Returns:
+    --------
+    ndarray
+        The indices of the selected points, in ascending order.
+    """
+
+    n = len(y)
+    num_buckets = num_points // 2
+    if num_points >= n or num_buckets < 1:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, num_buckets + 1).astype(np.int64)
+    bucket_ids = np.repeat(np.arange(num_buckets), np.diff(edges))
+
+    def first_in_bucket(mask):
+        positions = np.flatnonzero(mask)
+        _, first = np.unique(bucket_ids[positions], return_index=True)
+        return positions[first]
+
+    minima = np.minimum.reduceat(y, edges[:-1])
+    maxima = np.maximum.reduceat(y, edges[:-1])
+    argmin = first_in_bucket(y == minima[bucket_ids])
+    argmax = first_in_bucket(y == maxima[bucket_ids])
+
+    return np.unique(np.concatenate(([0, n - 1], argmin, argmax)))
+
+
+def _as_float(values):
+    """Convert numeric or datetime values to a float array.
+
+    Datetimes are converted to their integer representation.
+
+    Params:
+    -------
+    values: array-like
+        Values to convert.
+
+    Returns:
+    --------
+    ndarray
+        The converted values.
+    """
+
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        values = values.astype(np.int64)
+    return values.astype(np.float64)
@@ -0,0 +1,326 @@
+import hashlib
+import logging
+import os
+import smtplib
+import sys
+import threading
+import time
+import traceback
+
+from collections import OrderedDict
+from email.message import EmailMessage
+from email.utils import formatdate
+
+from flask import current_app
+
+
+def fingerprint(exc_info):
+    """Get the fingerprint of an exception.
+
+    The fingerprint is derived from the exception type and the locations (file, function and line) of all frames in its
+    traceback, but not from the error message, as this often includes variable content such as ids. So exceptions
+    raised by the same code path have the same fingerprint.
+
+    Params:
+    -------
+    exc_info: tuple
+        Exception type, exception and traceback, as returned by `sys.exc_info`.
+
+    Returns:
+    --------
+    tuple
+        The fingerprint (as a 12 character hex string), the qualified name of the exception type and the location
+        (file, line and function) of the innermost frame.
+    """
+
+    exc_type, exc_value, tb = exc_info
+    exception = '{module}.{name}'.format(module=exc_type.__module__, name=exc_type.__qualname__)
+    frames = traceback.extract_tb(tb)
+    locations = ['{0}:{1}:{2}'.format(frame[0], frame[2], frame[1]) for frame in frames]
+    digest = hashlib.sha1('\n'.join([exception] + locations).encode('utf-8')).hexdigest()[:12]
+    if frames:
+        filename, line, function = frames[-1][0], frames[-1][1], frames[-1][2]
+        location = '{file}:{line} in {function}'.format(file=filename, line=line, function=function)
+    else:
+        location = 'unknown'
+    return digest, exception, location
+
+
+class ErrorReports:
+    """Flask extension for logging exceptions without flooding the logs.
+
+    Exceptions are fingerprinted by their type and stack location (see the `fingerprint` function). The first
+    occurrence of a fingerprint is logged with its full traceback, but further occurrences within the same time window
+    (set by the app configuration variable `ERROR_REPORTS_WINDOW`, in seconds) are only counted. The next occurrence
+    after the window has passed is logged again, together with the number of occurrences which weren't logged.
+
+    The windows are tracked separately for every server process. If metrics are enabled, the number of exceptions per
+    fingerprint is recorded for all processes as the metric `app_errors_total`, and it can be queried with the
+    `error_counts` method.
+
+    Params:
+    -------
+    metrics: Metrics
+        Metrics extension for recording the error counts.
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, metrics=None, app=None):
+        if metrics is not None:
+            metrics.describe('app_errors_total', 'counter', 'Total number of exceptions, by fingerprint.')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        app.extensions['error_reports'] = _ErrorWindows(app.config.get('ERROR_REPORTS_WINDOW', 60))
+
+    def log(self, e, logger=None):
+        """Log an exception, unless it has been logged within the current time window.
+
+        This method must be called from within an except block or an error handler.
+
+        Params:
+        -------
+        e: Exception
+            The exception.
+        logger: Logger
+            Logger to use. The app's logger is used by default.
+
+        Returns:
+        --------
+        str
+            The fingerprint of the exception.
+        """
+
+        exc_info = sys.exc_info()
+        if exc_info[1] is not e:
+            exc_info = (type(e), e, e.__traceback__)
+        digest, exception, location = fingerprint(exc_info)
+
+        store = current_app.extensions.get('metrics')
+        if store is not None:
+            store.increment('app_errors_total', dict(fingerprint=digest, exception=exception, location=location))
+
+        suppressed = current_app.extensions['error_reports'].record(digest)
+        if suppressed is not None:
+            message = str(e)
+            if suppressed:
+                message = '{message} [{count} further occurrence(s) of error {fingerprint} were not logged]'.format(
+                    message=message, count=suppressed, fingerprint=digest)
+            (logger or current_app.logger).error(message, exc_info=exc_info, extra=dict(fingerprint=digest))
+
+        return digest
+
+    def error_counts(self):
+        """Get the number of exceptions per fingerprint for all server processes.
+
+        Returns:
+        --------
+        list of dict
+            The fingerprint, exception type, location and count of all recorded exceptions, sorted by decreasing count.
+            The list is empty if metrics are disabled.
+        """
+
+        store = current_app.extensions.get('metrics')
+        if store is None:
+            return []
+        counts = []
+        for (name, labels), value in store.collect().items():
+            if name == 'app_errors_total':
+                counts.append(dict(labels, count=int(value)))
+        return sorted(counts, key=lambda c: (-c['count'], c['fingerprint']))
+
+
+class _ErrorWindows:
+    """Time windows for the exception fingerprints of a process.
+
+    Params:
+    -------
+    window: float
+        Length of a window in seconds.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def record(self, digest):
+        """Record an occurrence of a fingerprint.
+
+        Params:
+        -------
+        digest: str
+            Fingerprint.
+
+        Returns:
+        --------
+        int or None
+            None if the fingerprint has occurred within the current window. Otherwise the number of occurrences in the
+            previous window which weren't logged.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            start, suppressed = self._windows.get(digest, (None, 0))
+            if start is not None and now - start < self.window:
+                self._windows[digest] = (start, suppressed + 1)
+                return None
+            self._windows[digest] = (now, 0)
+            return suppressed
+
+
+class DigestMailHandler(logging.Handler):
+    """Logging handler which sends log records as digest emails from a background thread.
+
+    Unlike `logging.handlers.SMTPHandler`, emitting a record doesn't block until an email has been sent. The record is
+    added to a buffer instead, and a background thread sends the buffered records as a single email, with records
+    grouped by their fingerprint (see the `fingerprint` function) or, if they have no exception information, by their
+    logger, source location and level. At most one email is sent every `interval` seconds, and at most `max_groups`
+    groups are included in an email.
+
+    The background thread is started when the first record is emitted in a process, so that the handler may be created
+    before a server forks its worker processes. Buffered records are sent when the handler is flushed or closed.
+
+    Params:
+    -------
+    mailhost: str
+        Host of the SMTP server, optionally with the port (as in 'mail.example.com:25').
+    fromaddr: str
+        From address.
+    toaddrs: tuple of str
+        To addresses.
+    subject: str
+        Subject. The number of records is appended to it.
+    interval: float
+        Minimum number of seconds between two emails.
+    max_groups: int
+        Maximum number of groups of records included in an email.
+    timeout: float
+        Timeout in seconds for connecting to the SMTP server.
+    """
+
+    def __init__(self, mailhost, fromaddr, toaddrs, subject, interval=300, max_groups=50, timeout=10):
+        logging.Handler.__init__(self)
+        host, _, port = mailhost.partition(':')
+        self.mailhost = host
+        self.mailport = int(port) if port else smtplib.SMTP_PORT
+        self.fromaddr = fromaddr
+        self.toaddrs = toaddrs
+        self.subject = subject
+        self.interval = interval
+        self.max_groups = max_groups
+        self.timeout = timeout
+        self._groups = OrderedDict()
+        self._buffer_lock = threading.Lock()
+        self._pending = threading.Event()
+        self._closed = threading.Event()
+        self._last_sent = -float('inf')
+        self._pid = None
+
+    def emit(self, record):
+        try:
+            key = self._group_key(record)
+            with self._buffer_lock:
+                group = self._groups.get(key)
+                if group is None:
+                    self._groups[key] = dict(record=record, count=1, first=record.created, last=record.created)
+                else:
+                    group['count'] += 1
+                    group['last'] = record.created
+            self._start_sender()
+            self._pending.set()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Send the buffered records (if there are any)."""
+
+        with self._buffer_lock:
+            groups = self._groups
+            self._groups = OrderedDict()
+        if not groups:
+            return
+        self._last_sent = time.monotonic()
+        try:
+            self._send(groups)
+        except Exception:
+            self.handleError(next(iter(groups.values()))['record'])
+
+    def close(self):
+        self._closed.set()
+        self._pending.set()
+        self.flush()
+        logging.Handler.close(self)
+
+    def _start_sender(self):
+        """Start the background thread for sending emails, unless it has been started in the current process."""
+
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._buffer_lock:
+            if self._pid == pid:
+                return
+            sender = threading.Thread(target=self._run, name='DigestMailHandler')
+            sender.daemon = True
+            sender.start()
+            self._pid = pid
+
+    def _run(self):
+        """Send the buffered records whenever there are records and the minimum interval has passed."""
+
+        while not self._closed.is_set():
+            self._pending.wait()
+            delay = self._last_sent + self.interval - time.monotonic()
+            if delay > 0 and self._closed.wait(delay):
+                return
+            self._pending.clear()
+            self.flush()
+
+    def _send(self, groups):
+        """Send an email with groups of records."""
+
+        count = sum(group['count'] for group in groups.values())
+        parts = []
+        for key, group in list(groups.items())[:self.max_groups]:
+            header = '{count} x {key} (first: {first}, last: {last})'.format(
+                count=group['count'], key=key, first=formatdate(group['first'], True),
+                last=formatdate(group['last'], True))
+            parts.append('\n'.join([header, '=' * len(header), self.format(group['record'])]))
+        if len(groups) > self.max_groups:
+            parts.append('... and {0} further group(s) of errors.'.format(len(groups) - self.max_groups))
+
+        message = EmailMessage()
+        message['From'] = self.fromaddr
+        message['To'] = ', '.join(self.toaddrs)
+        message['Subject'] = '{subject} ({count} record(s))'.format(subject=self.subject, count=count)
+        message['Date'] = formatdate(localtime=True)
+        message.set_content('\n\n\n'.join(parts))
+
+        smtp = smtplib.SMTP(self.mailhost, self.mailport, timeout=self.timeout)
+        try:
+            smtp.send_message(message)
+        finally:
+            smtp.quit()
+
+    @staticmethod
+    def _group_key(record):
+        """Get the key by which a record is grouped in an email."""
+
+        fingerprint_digest = getattr(record, 'fingerprint', None)
+        if fingerprint_digest is None and record.exc_info and record.exc_info[0] is not None:
+            fingerprint_digest = fingerprint(record.exc_info)[0]
+        if fingerprint_digest is not None:
+            return 'error {0}'.format(fingerprint_digest)
+        return '{level} in {name} at {path}:{line}'.format(
+            level=record.levelname, name=record.name, path=record.pathname, line=record.lineno)
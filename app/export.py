@@ -0,0 +1,298 @@
+import csv
+import datetime
+import decimal
+import io
+import json
+
+from flask import current_app, Response
+
+# content types of the export formats
+MIMETYPES = dict(csv='text/csv', ndjson='application/x-ndjson')
+
+
+class RowBatches:
+    """Iterator over the rows of a query result in batches, which are fetched from the database as needed.
+
+    The database connection is returned to the pool when all rows have been read or the iterator is closed. If it is
+    closed before all rows have been read, the connection is discarded instead, as the rows still pending on an
+    unbuffered cursor would have to be read before the connection could be used again.
+
+    Params:
+    -------
+    connection: pooled DBAPI connection
+        Connection on which the query has been executed.
+    cursor: DBAPI cursor
+        Cursor with the query result.
+    batch_size: int
+        Number of rows per batch.
+    """
+
+    def __init__(self, connection, cursor, batch_size):
+        self.connection = connection
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            rows = self.cursor.fetchmany(self.batch_size)
+        except BaseException:
+            self.close()
+            raise
+        if not rows:
+            self._close(finished=True)
+            raise StopIteration
+        return rows
+
+    def close(self):
+        """Stop reading the rows and release the database connection."""
+
+        self._close(finished=False)
+
+    def _close(self, finished):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if finished:
+                self.cursor.close()
+            else:
+                self.connection.invalidate()
+        finally:
+            self.connection.close()
+
+
+def stream_query(engine, sql, params=None, batch_size=1000):
+    """Run a query with an unbuffered (server-side) cursor.
+
+    Unlike `pandas.read_sql` or a default MySQLdb cursor, this doesn't load the whole result into memory. Instead the
+    rows are fetched from the database server in batches while they are iterated over. For MySQL an `SSCursor` is used
+    (for both mysqlclient and PyMySQL); SQLite cursors fetch rows incrementally anyway.
+
+    The query is executed immediately, so that errors are raised by this function. While the rows are read, the
+    database connection can't be used for anything else, so make sure the returned iterator is closed if it isn't
+    exhausted (a Flask response closes it).
+
+    Params:
+    -------
+    engine: SQLAlchemy engine
+        Database engine, such as `db.engine`.
+    sql: str
+        SQL query, using the parameter style of the database driver (as for `pandas.read_sql`).
+    params: list or dict
+        Query parameters.
+    batch_size: int
+        Number of rows fetched at a time.
+
+    Returns:
+    --------
+    tuple
+        The list of column names and a `RowBatches` iterator over the rows.
+    """
+
+    connection = engine.raw_connection()
+    try:
+        cursor = _unbuffered_cursor(connection)
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+    except BaseException:
+        connection.invalidate()
+        connection.close()
+        raise
+    return columns, RowBatches(connection, cursor, batch_size)
+
+
+def csv_chunks(columns, batches):
+    """Generate a CSV file (encoded as UTF-8) with a header line, as one chunk per batch of rows.
+
+    Params:
+    -------
+    columns: list of str
+        Column names.
+    batches: iterable
+        Batches of rows.
+
+    Returns:
+    --------
+    generator
+        The chunks of the file.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield _pop(buffer)
+    for rows in batches:
+        writer.writerows(rows)
+        yield _pop(buffer)
+
+
+def ndjson_chunks(columns, batches):
+    """Generate newline-delimited JSON (encoded as UTF-8) with one object per row, as one chunk per batch of rows.
+
+    Dates and times are converted to ISO 8601 strings and decimals to floats.
+
+    Params:
+    -------
+    columns: list of str
+        Column names.
+    batches: iterable
+        Batches of rows.
+
+    Returns:
+    --------
+    generator
+        The chunks of the file.
+    """
+
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=_json_value) + '\n' for row in rows).encode('utf-8')
+
+
+class Exports:
+    """Registry of queries which can be downloaded as CSV or newline-delimited JSON.
+
+    A query is registered with the `query` decorator. The decorated function returns the SQL query and its parameters
+    for the current request, and the query result can then be downloaded from the route `/export/<name>.csv` or
+    `/export/<name>.ndjson`.
+
+    ```python
+    @exports.query('observations')
+    def observations():
+        return 'SELECT * FROM Observation WHERE night >= %s', (request.args['from'],)
+    ```
+
+    The result is streamed: its rows are fetched from the database in batches of `EXPORT_BATCH_SIZE` rows (an app
+    configuration variable) with an unbuffered cursor and sent while they are fetched (see `stream_query`), so that
+    the memory used doesn't depend on the size of the result.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        self.queries = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the registry for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        app.extensions['exports'] = dict(batch_size=app.config.get('EXPORT_BATCH_SIZE', 1000))
+
+    def query(self, name):
+        """Decorator for registering a query.
+
+        The decorated function must not take any arguments and must return the SQL query (in the parameter style of
+        the database driver) and its parameters (or None). It is called within the request for the export.
+
+        Params:
+        -------
+        name: str
+            Name of the export, as used in its URL.
+
+        Returns:
+        --------
+        function
+            The decorator.
+        """
+
+        def decorator(f):
+            self.queries[name] = f
+            return f
+
+        return decorator
+
+    def response(self, name, format):
+        """Get the streamed response for an export.
+
+        Params:
+        -------
+        name: str
+            Name of the export.
+        format: str
+            Format ('csv' or 'ndjson').
+
+        Returns:
+        --------
+        Response
+            The response, or None if there is no such export or format.
+        """
+
+        if name not in self.queries or format not in MIMETYPES:
+            return None
+        sql, params = self.queries[name]()
+        from . import db
+        columns, batches = stream_query(db.engine, sql, params,
+                                        batch_size=current_app.extensions['exports']['batch_size'])
+        chunks = csv_chunks(columns, batches) if format == 'csv' else ndjson_chunks(columns, batches)
+        filename = '{name}.{format}'.format(name=name, format=format)
+        response = Response(_ClosingChunks(chunks, batches), mimetype=MIMETYPES[format])
+        response.headers['Content-Disposition'] = 'attachment; filename="{filename}"'.format(filename=filename)
+        return response
+
+
+class _ClosingChunks:
+    """Iterable over the chunks of a response which closes the row batches when it is closed."""
+
+    def __init__(self, chunks, batches):
+        self._chunks = chunks
+        self._batches = batches
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        self._chunks.close()
+        self._batches.close()
+
+
+def _unbuffered_cursor(connection):
+    """Create an unbuffered cursor for a pooled DBAPI connection, if the database driver supports this."""
+
+    dbapi_connection = getattr(connection, 'dbapi_connection', None) or connection.connection
+    module = type(dbapi_connection).__module__
+    if module.startswith('MySQLdb'):
+        import MySQLdb.cursors
+        return dbapi_connection.cursor(MySQLdb.cursors.SSCursor)
+    if module.startswith('pymysql'):
+        import pymysql.cursors
+        return dbapi_connection.cursor(pymysql.cursors.SSCursor)
+    return dbapi_connection.cursor()
+
+
+def _pop(buffer):
+    """Get the content of a string buffer as UTF-8 and empty the buffer."""
+
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value.encode('utf-8')
+
+
+def _json_value(value):
+    """Convert a value which isn't JSON serialisable."""
+
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
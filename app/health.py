@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+from sqlalchemy import text
+
+# time when the server process has been started (or rather, when it has imported this module)
+STARTED = time.time()
+
+# paths requested by `warm_up` in addition to the health check, so that the modules, templates and database
+# connections needed by typical requests are loaded before the first request is handled
+WARM_UP_PATHS = ('/',)
+
+
+def check_health(db):
+    """Check whether the current process can handle requests.
+
+    Params:
+    -------
+    db: SQLAlchemy
+        Flask-SQLAlchemy extension.
+
+    Returns:
+    --------
+    dict
+        The health status, with the status ('ok' or 'failing'), the process id, the time when the process was started
+        (in seconds since the epoch) and the result of each check ('ok' or an error message).
+    """
+
+    checks = dict()
+    try:
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        checks['database'] = 'ok'
+    except Exception as e:
+        checks['database'] = '{type}: {message}'.format(type=type(e).__name__, message=e)
+
+    healthy = all(result == 'ok' for result in checks.values())
+    return dict(status='ok' if healthy else 'failing',
+                pid=os.getpid(),
+                started=STARTED,
+                checks=checks)
+
+
+def warm_up(app, paths=WARM_UP_PATHS):
+    """Check that an app is ready for requests and load everything needed for the first requests.
+
+    The health check route (`/health`) and the given paths are requested with the test client. This should be called
+    before a server process takes any requests; with uWSGI's `lazy-apps` option every worker loads the app (and hence
+    calls this function) before it accepts connections. The responses for the paths other than the health check are
+    ignored.
+
+    Only errors in the app itself (such as import, routing or template errors) make the health check route fail. A
+    failing check (for example because the database can't be reached) is logged as a warning and reported by the
+    health check route, but the app is considered ready, so that a server process started during a database outage
+    can still serve the pages which don't need the database.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    paths: iterable of str
+        Further paths to request.
+
+    Returns:
+    --------
+    dict
+        The health status (see `check_health`).
+
+    Raises:
+    -------
+    RuntimeError
+        If the health check route fails.
+    """
+
+    client = app.test_client(use_cookies=False)
+    response = client.get('/health', environ_base=dict(REMOTE_ADDR='127.0.0.1'))
+    body = response.get_data(as_text=True)
+    try:
+        status = json.loads(body) if response.status_code in (200, 503) else None
+    except ValueError:
+        status = None
+    if not isinstance(status, dict) or 'checks' not in status:
+        raise RuntimeError('The health check has failed: {body}'.format(body=body))
+    if status['status'] != 'ok':
+        app.logger.warning('The app has been loaded, but a health check is failing: {checks}'
+                           .format(checks=status['checks']))
+    for path in paths:
+        client.get(path).close()
+    return status
@@ -0,0 +1,58 @@
+from flask import abort, current_app, jsonify, request, Response
+
+from . import internal
+from .. import db, error_reports, precompute
+from ..db_pool import read_pool_statistics
+from ..health import check_health
+
+
+@internal.before_request
+def restrict_access():
+    """Restrict access to the internal routes.
+
+    Only requests from the IP addresses listed in the app configuration variable `INTERNAL_ALLOWED_ADDRESSES` are
+    allowed. Other requests are rejected with a 403 error.
+    """
+
+    if request.remote_addr not in current_app.config['INTERNAL_ALLOWED_ADDRESSES']:
+        abort(403)
+
+
+@internal.route('/internal/db-pool')
+def db_pool():
+    """Return the database connection pool statistics of all server processes as JSON."""
+
+    return jsonify(processes=read_pool_statistics(current_app.config['DATABASE_POOL_STATS_DIR']))
+
+
+@internal.route('/internal/errors')
+def errors():
+    """Return the number of exceptions per fingerprint for all server processes as JSON."""
+
+    return jsonify(errors=error_reports.error_counts())
+
+
+@internal.route('/health')
+def health():
+    """Return the health status of the server process as JSON, with a 503 status if any check fails."""
+
+    status = check_health(db)
+    return jsonify(status), 200 if status['status'] == 'ok' else 503
+
+
+@internal.route('/internal/precompute')
+def precomputed_datasets():
+    """Return the refresh interval and the time, duration and outcome of the last refresh of every precomputed dataset
+    as JSON."""
+
+    return jsonify(datasets=precompute.status())
+
+
+@internal.route('/metrics')
+def metrics():
+    """Return the request metrics of all server processes in the Prometheus text format."""
+
+    store = current_app.extensions['metrics']
+    if store is None:
+        abort(404)
+    return Response(store.render(), mimetype='text/plain; version=0.0.4')
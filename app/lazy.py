@@ -0,0 +1,38 @@
+import importlib
+
+
+class LazyModule:
+    """A placeholder for a module which is imported when one of its attributes is accessed for the first time.
+
+    Importing libraries like NumPy, Pandas or Bokeh takes a long time. If they are imported at the top of a views
+    module, this time is spent whenever a server process or Flask command starts, even if the library is never used.
+    Using a placeholder instead defers the import until the library is actually needed.
+
+    ```python
+    pd = LazyModule('pandas')
+
+    @main.route('/table')
+    def table():
+        df = pd.read_sql(sql, db.engine)  # Pandas is imported here
+        ...
+    ```
+
+    Params:
+    -------
+    name: str
+        Fully qualified module name.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return '<lazy module {name}>'.format(name=self.__dict__['_name'])
@@ -1,11 +1,12 @@
-from flask import current_app, render_template
+from flask import render_template
 
 from . import main
+from .. import error_reports
 
 
 @main.errorhandler(500)
 def internal_server_error(e):
-    current_app.logger.error(str(e), exc_info=1)
+    error_reports.log(e)
     return render_template('500.html'), 500
 
 
@@ -16,5 +17,15 @@ def file_not_found_error(e):
 
 @main.errorhandler(Exception)
 def exception_raised(e):
-    current_app.logger.error(str(e), exc_info=1)
+    error_reports.log(e)
     return render_template('500.html'), 500
+
+
+@main.app_errorhandler(503)
+def service_unavailable_error(e):
+    return render_template('503.html'), 503
+
+
+@main.app_errorhandler(504)
+def timeout_error(e):
+    return render_template('504.html'), 504
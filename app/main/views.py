@@ -1,8 +1,19 @@
-from flask import render_template
+from flask import abort, render_template
 
 from . import main
+from .. import exports
 
 
 @main.route('/')
 def index():
     return render_template('index.html')
+
+
+@main.route('/export/<name>.<format>')
+def export(name, format):
+    """Stream the result of a registered export query as CSV or newline-delimited JSON."""
+
+    response = exports.response(name, format)
+    if response is None:
+        abort(404)
+    return response
@@ -0,0 +1,110 @@
+import os
+
+# fields of /proc/<pid>/smaps which are summed up for a memory report
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap')
+
+
+def memory_usage(pid):
+    """Get the memory usage of a process, split into memory shared with other processes and private memory.
+
+    The values are read from `/proc/<pid>/smaps_rollup` (or `/proc/<pid>/smaps` on older kernels), so this only works
+    on Linux, and only for processes of the same user (unless run as root). Shared memory includes the pages which
+    worker processes share with the master process they were forked from, as long as none of them has modified the
+    pages (copy-on-write). The proportional set size (PSS) counts shared pages divided by the number of processes
+    sharing them, so the sum of the PSS of all workers is their actual memory consumption.
+
+    Params:
+    -------
+    pid: int
+        Process id.
+
+    Returns:
+    --------
+    dict
+        The resident set size (`rss`), proportional set size (`pss`), shared memory (`shared`), private memory
+        (`private`) and swapped out memory (`swap`), all in bytes, as well as the process id (`pid`).
+    """
+
+    path = '/proc/{pid}/smaps_rollup'.format(pid=pid)
+    if not os.path.exists(path):
+        path = '/proc/{pid}/smaps'.format(pid=pid)
+    totals = dict((field, 0) for field in SMAPS_FIELDS)
+    with open(path) as f:
+        for line in f:
+            field, _, value = line.partition(':')
+            if field in totals:
+                totals[field] += int(value.split()[0]) * 1024
+    return dict(pid=pid,
+                rss=totals['Rss'],
+                pss=totals['Pss'],
+                shared=totals['Shared_Clean'] + totals['Shared_Dirty'],
+                private=totals['Private_Clean'] + totals['Private_Dirty'],
+                swap=totals['Swap'])
+
+
+def server_processes(directory, name='uwsgi'):
+    """Find the server processes (master and workers) running in a directory.
+
+    Params:
+    -------
+    directory: str
+        Working directory of the server.
+    name: str
+        Name of the server executable.
+
+    Returns:
+    --------
+    list of dict
+        The process id (`pid`) and parent process id (`ppid`) of every process, sorted by process id.
+    """
+
+    directory = os.path.realpath(directory)
+    processes = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{pid}/cmdline'.format(pid=entry), 'rb') as f:
+                executable = f.read().split(b'\0')[0].decode('utf-8', errors='replace')
+            if os.path.basename(executable) != name:
+                continue
+            if os.path.realpath(os.readlink('/proc/{pid}/cwd'.format(pid=entry))) != directory:
+                continue
+            with open('/proc/{pid}/stat'.format(pid=entry)) as f:
+                # the process name in parentheses may contain spaces, so the fields after it are counted from its end
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            # the process has stopped, or it belongs to another user
+            continue
+        processes.append(dict(pid=int(entry), ppid=ppid))
+    return sorted(processes, key=lambda p: p['pid'])
+
+
+def memory_report(directory, name='uwsgi'):
+    """Get the memory usage of the server processes running in a directory.
+
+    Params:
+    -------
+    directory: str
+        Working directory of the server.
+    name: str
+        Name of the server executable.
+
+    Returns:
+    --------
+    list of dict
+        The memory usage (see `memory_usage`) of every process, with its role ('master' or 'worker'), sorted by
+        process id.
+    """
+
+    processes = server_processes(directory, name)
+    pids = set(p['pid'] for p in processes)
+    report = []
+    for process in processes:
+        try:
+            usage = memory_usage(process['pid'])
+        except OSError:
+            continue
+        usage['role'] = 'worker' if process['ppid'] in pids else 'master'
+        report.append(usage)
+    return report
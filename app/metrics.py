@@ -0,0 +1,457 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from collections import OrderedDict
+
+from flask import g, request
+
+from .processes import is_running
+
+# upper bounds (in seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+# values files written by this process, keyed by path (as only one writer per file is allowed, they are shared by all
+# metrics stores of the process)
+_process_files = {}
+_process_files_lock = threading.Lock()
+
+
+class MmapValues:
+    """A file-backed, memory-mapped mapping of string keys to float values.
+
+    The file starts with the number of bytes used (as a 4 byte integer, padded to 8 bytes), followed by the entries.
+    Each entry consists of the length of the key (as a 4 byte integer), the UTF-8 encoded key padded so that the entry
+    length is a multiple of 8, and the value (as an 8 byte float). The number of used bytes is updated after an entry
+    has been written, so that other processes may read the file at any time.
+
+    Only one process may write to a file, but it can be read from any number of processes with the static `read`
+    method. Writing is thread-safe.
+
+    Params:
+    -------
+    path: str
+        Path of the file. The file is created if it doesn't exist.
+    initial_size: int
+        Initial size of the file in bytes.
+    """
+
+    def __init__(self, path, initial_size=64 * 1024):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = open(path, 'a+b')
+        self._capacity = max(os.fstat(self._f.fileno()).st_size, initial_size)
+        self._f.truncate(self._capacity)
+        self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        self._used = struct.unpack_from('i', self._m, 0)[0] or 8
+        self._positions = {key: position for key, value, position in MmapValues._entries(self._m, self._used)}
+
+    def get(self, key):
+        """Get the value for a key, or 0 if there is no value."""
+
+        position = self._positions.get(key)
+        return struct.unpack_from('d', self._m, position)[0] if position is not None else 0.0
+
+    def set(self, key, value):
+        """Set the value for a key."""
+
+        with self._lock:
+            struct.pack_into('d', self._m, self._position(key), value)
+
+    def increment(self, key, amount=1.0):
+        """Increment the value for a key. Values for new keys start at 0."""
+
+        with self._lock:
+            position = self._position(key)
+            struct.pack_into('d', self._m, position, struct.unpack_from('d', self._m, position)[0] + amount)
+
+    def keys(self):
+        """Get the keys."""
+
+        return list(self._positions.keys())
+
+    def close(self):
+        """Close the file."""
+
+        self._m.close()
+        self._f.close()
+
+    def _position(self, key):
+        """Get the position of the value for a key, adding an entry if necessary. The caller must hold the lock."""
+
+        position = self._positions.get(key)
+        if position is None:
+            encoded = key.encode('utf-8')
+            padding = 8 - (4 + len(encoded)) % 8
+            padded_length = 4 + len(encoded) + padding
+            entry_length = padded_length + 8
+            if self._used + entry_length > self._capacity:
+                self._grow(self._used + entry_length)
+            struct.pack_into('i{0}s{1}xd'.format(len(encoded), padding),
+                             self._m, self._used, len(encoded), encoded, 0.0)
+            position = self._used + padded_length
+            self._used += entry_length
+            struct.pack_into('i', self._m, 0, self._used)
+            self._positions[key] = position
+        return position
+
+    def _grow(self, min_capacity):
+        """Increase the file size to at least a given number of bytes. The caller must hold the lock."""
+
+        capacity = self._capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        self._m.close()
+        self._f.truncate(capacity)
+        self._capacity = capacity
+        self._m = mmap.mmap(self._f.fileno(), self._capacity)
+
+    @staticmethod
+    def read(path):
+        """Read all entries of a file.
+
+        Params:
+        -------
+        path: str
+            Path of the file.
+
+        Returns:
+        --------
+        dict
+            The values, keyed by their key.
+        """
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < 8:
+            return {}
+        used = struct.unpack_from('i', data, 0)[0]
+        return {key: value for key, value, position in MmapValues._entries(data, used)}
+
+    @staticmethod
+    def _entries(data, used):
+        """Generate the key, value and value position of all entries in a buffer."""
+
+        position = 8
+        while position < used:
+            length = struct.unpack_from('i', data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+            value_position = position + 4 + length + (8 - (4 + length) % 8)
+            yield key, struct.unpack_from('d', data, value_position)[0], value_position
+            position = value_position + 8
+
+
+class MetricsStore:
+    """Store for metrics shared by all processes of a server.
+
+    Every process writes its values to its own memory-mapped file in a common directory, so that no locking between
+    processes is required. When the metrics are collected, the values from all files are added up. Gauges (such as the
+    number of requests in progress) are only included for running processes, whereas the counter values of processes
+    which have stopped are moved to an archive file, so that counters never decrease.
+
+    Params:
+    -------
+    directory: str
+        Directory for the metrics files.
+    descriptions: dict
+        Type and help text of the metrics, keyed by metric name.
+    """
+
+    def __init__(self, directory, descriptions):
+        self.directory = directory
+        self.descriptions = descriptions
+        self._values = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._keys = {}
+
+    def increment(self, name, labels, amount=1.0):
+        """Increment a counter or gauge.
+
+        Params:
+        -------
+        name: str
+            Metric name.
+        labels: dict
+            Label values, keyed by label name.
+        amount: float
+            Amount to add.
+        """
+
+        self._file().increment(self._key(name, labels), amount)
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        """Add a value to a histogram.
+
+        Params:
+        -------
+        name: str
+            Histogram name.
+        labels: dict
+            Label values, keyed by label name.
+        value: float
+            Observed value.
+        buckets: tuple of float
+            Upper bounds of the buckets, in ascending order. The last bound must be infinity.
+        """
+
+        values = self._file()
+        bound = next(b for b in buckets if value <= b)
+        values.increment(self._key(name + '_bucket', dict(labels, le=_format_value(bound))))
+        values.increment(self._key(name + '_sum', labels), value)
+        values.increment(self._key(name + '_count', labels))
+
+    def collect(self):
+        """Collect the values from all processes.
+
+        Returns:
+        --------
+        dict
+            The values, keyed by tuples of sample name and label items.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'archive.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._archive_stopped_processes()
+
+            totals = {}
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.db'):
+                    continue
+                pid = filename[:-len('.db')]
+                running = pid == 'archive' or is_running(int(pid))
+                for key, value in MmapValues.read(os.path.join(self.directory, filename)).items():
+                    name, labels = json.loads(key)
+                    if not running and self._kind(name) == 'gauge':
+                        continue
+                    sample = (name, tuple(sorted(labels.items())))
+                    totals[sample] = totals.get(sample, 0) + value
+        return totals
+
+    def render(self):
+        """Render the metrics of all processes in the Prometheus text format.
+
+        Returns:
+        --------
+        str
+            The rendered metrics.
+        """
+
+        samples = self.collect()
+        lines = []
+        for name, (kind, documentation) in self.descriptions.items():
+            lines.append('# HELP {name} {documentation}'.format(name=name, documentation=documentation))
+            lines.append('# TYPE {name} {kind}'.format(name=name, kind=kind))
+            if kind == 'histogram':
+                lines.extend(MetricsStore._render_histogram(name, samples))
+            else:
+                for (sample_name, labels), value in sorted(samples.items()):
+                    if sample_name == name:
+                        lines.append(_format_sample(name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+    def _file(self):
+        """Get the values file for the current process.
+
+        The file is (re-)opened whenever the process id has changed, which happens if the server forks worker processes
+        after the app has been created. All stores using the same directory in a process share the file, as they would
+        overwrite each other's entries otherwise.
+        """
+
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._values = self._process_file(pid)
+                    self._pid = pid
+        return self._values
+
+    def _process_file(self, pid):
+        """Get the values file of a process from the files shared by all stores, opening it if necessary."""
+
+        path = os.path.join(os.path.abspath(self.directory), '{pid}.db'.format(pid=pid))
+        with _process_files_lock:
+            values = _process_files.get(path)
+            # the file has to be opened again if it has been deleted (for example together with the directory)
+            if values is None or not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                values = MmapValues(path)
+
+                # the file might be left over from a stopped process with the same id
+                for key in values.keys():
+                    if self._kind(json.loads(key)[0]) == 'gauge':
+                        values.set(key, 0)
+
+                _process_files[path] = values
+        return values
+
+    def _archive_stopped_processes(self):
+        """Move the counter values of stopped processes to the archive file. The caller must hold the archive lock."""
+
+        archive = None
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.db') or filename == 'archive.db':
+                continue
+            if is_running(int(filename[:-len('.db')])):
+                continue
+            if archive is None:
+                archive = MmapValues(os.path.join(self.directory, 'archive.db'))
+            path = os.path.join(self.directory, filename)
+            for key, value in MmapValues.read(path).items():
+                if self._kind(json.loads(key)[0]) != 'gauge':
+                    archive.increment(key, value)
+            os.remove(path)
+        if archive is not None:
+            archive.close()
+
+    def _kind(self, sample_name):
+        """Get the kind of metric a sample belongs to."""
+
+        for suffix in ('', '_bucket', '_sum', '_count'):
+            if suffix and not sample_name.endswith(suffix):
+                continue
+            name = sample_name[:len(sample_name) - len(suffix)]
+            if name in self.descriptions:
+                return self.descriptions[name][0]
+        return 'untyped'
+
+    def _key(self, name, labels):
+        """Get the file key for a sample. Keys are cached, as encoding them is relatively expensive."""
+
+        cache_key = (name, tuple(sorted(labels.items())))
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = json.dumps([name, labels], sort_keys=True)
+            self._keys[cache_key] = key
+        return key
+
+    @staticmethod
+    def _render_histogram(name, samples):
+        """Render the samples of a histogram, with cumulative bucket counts."""
+
+        buckets = {}
+        for (sample_name, labels), value in samples.items():
+            if sample_name == name + '_bucket':
+                labels = dict(labels)
+                bound = float(labels.pop('le'))
+                buckets.setdefault(tuple(sorted(labels.items())), []).append((bound, value))
+
+        lines = []
+        for labels in sorted(buckets):
+            counts = dict(buckets[labels])
+            cumulative = 0
+            for bound in sorted(set(counts) | set(LATENCY_BUCKETS)):
+                cumulative += counts.get(bound, 0)
+                lines.append(_format_sample(name + '_bucket', labels + (('le', _format_value(bound)),), cumulative))
+            for suffix in ('_sum', '_count'):
+                lines.append(_format_sample(name + suffix, labels, samples.get((name + suffix, labels), 0)))
+        return lines
+
+
+class Metrics:
+    """Flask extension recording request metrics for all processes of a server.
+
+    For every request the latency and response status are recorded, labelled by endpoint and HTTP method. In addition
+    the number of requests in progress is tracked. The metrics are stored in the directory given by the app
+    configuration variable `METRICS_DIR`, and recording is disabled if the configuration variable `METRICS_ENABLED` is
+    False.
+
+    Other parts of the app may record their own metrics, which must be declared with the `describe` method before the
+    app is initialised.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        self.descriptions = OrderedDict()
+        self.describe('http_requests_total', 'counter', 'Total number of HTTP requests.')
+        self.describe('http_request_duration_seconds', 'histogram', 'HTTP request latency in seconds.')
+        self.describe('http_requests_in_progress', 'gauge', 'Number of HTTP requests in progress.')
+        if app is not None:
+            self.init_app(app)
+
+    def describe(self, name, kind, documentation):
+        """Declare a metric.
+
+        Params:
+        -------
+        name: str
+            Metric name.
+        kind: str
+            Metric type, i.e. 'counter', 'gauge' or 'histogram'.
+        documentation: str
+            Help text.
+        """
+
+        self.descriptions[name] = (kind, documentation)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        if not app.config.get('METRICS_ENABLED'):
+            app.extensions['metrics'] = None
+            return
+
+        store = MetricsStore(app.config['METRICS_DIR'], self.descriptions)
+        app.extensions['metrics'] = store
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_start_time = time.perf_counter()
+            store.increment('http_requests_in_progress', {})
+
+        @app.after_request
+        def record_request(response):
+            Metrics._record(store, response.status_code)
+            return response
+
+        @app.teardown_request
+        def finish_request(exc):
+            if getattr(g, 'metrics_start_time', None) is None:
+                return
+            if not getattr(g, 'metrics_recorded', False):
+                Metrics._record(store, 500)
+            store.increment('http_requests_in_progress', {}, -1)
+
+    @staticmethod
+    def _record(store, status_code):
+        """Record the latency and status of the current request."""
+
+        if getattr(g, 'metrics_start_time', None) is None:
+            return
+        labels = dict(endpoint=request.endpoint or 'none', method=request.method)
+        store.observe('http_request_duration_seconds', labels, time.perf_counter() - g.metrics_start_time)
+        store.increment('http_requests_total', dict(labels, status=str(status_code)))
+        g.metrics_recorded = True
+
+
+def _format_sample(name, labels, value):
+    """Format a sample in the Prometheus text format."""
+
+    if labels:
+        escaped = ('{0}="{1}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                   for k, v in labels)
+        name = '{name}{{{labels}}}'.format(name=name, labels=','.join(escaped))
+    return '{name} {value}'.format(name=name, value=_format_value(value))
+
+
+def _format_value(value):
+    """Format a float value in the Prometheus text format."""
+
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
@@ -0,0 +1,285 @@
+import concurrent.futures
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context, current_app, g, request
+from werkzeug.exceptions import HTTPException, ServiceUnavailable
+
+
+class BulkheadFull(ServiceUnavailable):
+    """Raised if heavy work is requested while the limit for the blueprint is reached already."""
+
+    description = 'The server is too busy to handle this request right now. Please try again later.'
+
+
+class DeadlineExceeded(HTTPException):
+    """Raised if heavy work doesn't finish before the deadline of the request."""
+
+    code = 504
+    description = 'The request took too long and has been cancelled. Please try again later.'
+
+
+class Bulkhead:
+    """Bounded thread pool for heavy work.
+
+    At most `limit` functions can run at the same time, and there is no queue: if all slots are taken, `submit`
+    returns None. If a budget is given, a function also needs one of its slots, so that several bulkheads can share a
+    common limit. A slot is only freed when its function has finished, even if the request which submitted it has
+    given up waiting for it. The thread pool is created when it is first used in a process, so that the app can be
+    created before a server forks its worker processes.
+
+    Params:
+    -------
+    name: str
+        Name of the bulkhead (the blueprint name).
+    limit: int
+        Maximum number of functions running at the same time.
+    budget: BoundedSemaphore
+        Semaphore shared with other bulkheads.
+    """
+
+    def __init__(self, name, limit, budget=None):
+        self.name = name
+        self.limit = limit
+        self.budget = budget
+        self._slots = threading.BoundedSemaphore(limit)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, f, *args, **kwargs):
+        """Run a function in the thread pool, if there is a free slot.
+
+        Params:
+        -------
+        f: function
+            Function to run.
+        *args: arguments
+            Positional arguments for the function.
+        **kwargs: keyword arguments
+            Keyword arguments for the function.
+
+        Returns:
+        --------
+        Future
+            The future for the function's result, or None if no slot is free.
+        """
+
+        if not self._slots.acquire(blocking=False):
+            return None
+        if self.budget is not None and not self.budget.acquire(blocking=False):
+            self._slots.release()
+            return None
+        try:
+            future = self._pool().submit(f, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        """Free the slots taken by a function."""
+
+        self._slots.release()
+        if self.budget is not None:
+            self.budget.release()
+
+    def _pool(self):
+        """Get the thread pool for the current process."""
+
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.limit)
+                    self._pid = pid
+        return self._executor
+
+
+class Offload:
+    """Flask extension for running heavy work in bounded thread pools with a deadline.
+
+    Every blueprint gets its own pool (a bulkhead), so that heavy requests for one blueprint can't take all the
+    server threads needed by the other blueprints. The number of functions running at the same time for a blueprint
+    is limited by the app configuration variable `OFFLOAD_LIMITS` (a dictionary of blueprint names and limits), or
+    `OFFLOAD_CONCURRENCY` for blueprints which aren't listed. In addition at most `OFFLOAD_TOTAL_CONCURRENCY`
+    functions run at the same time for all blueprints together, so that the requests waiting for offloaded work can
+    never occupy all server threads. If a limit is reached, further work is rejected immediately with a 503 error.
+
+    Every request has a deadline, `OFFLOAD_TIMEOUT` seconds after it started, which is shared by all the work it
+    offloads. If the work doesn't finish in time, the request fails with a 504 error. Python threads can't be stopped,
+    so work which is already running carries on in the background (and keeps its slot) until it finishes; long-running
+    functions can call `check_deadline` to stop early.
+
+    If metrics are enabled, rejected and timed out work is counted as the metrics `app_offload_rejected_total` and
+    `app_offload_timeouts_total`, by blueprint.
+
+    Params:
+    -------
+    metrics: Metrics
+        Metrics extension for recording the rejected and timed out work.
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, metrics=None, app=None):
+        self._local = threading.local()
+        if metrics is not None:
+            metrics.describe('app_offload_rejected_total', 'counter',
+                             'Total number of offloaded functions rejected because the bulkhead was full.')
+            metrics.describe('app_offload_timeouts_total', 'counter',
+                             'Total number of offloaded functions which missed the request deadline.')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        The extension may be initialised again for the same app, for example to change its configuration.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        initialised = 'offload' in app.extensions
+        app.extensions['offload'] = _Bulkheads(app.config.get('OFFLOAD_CONCURRENCY', 2),
+                                               app.config.get('OFFLOAD_LIMITS', {}),
+                                               app.config.get('OFFLOAD_TOTAL_CONCURRENCY'))
+        if initialised:
+            return
+
+        @app.before_request
+        def start_deadline():
+            g.offload_deadline = time.monotonic() + current_app.config.get('OFFLOAD_TIMEOUT', 10)
+
+    def run(self, f, *args, **kwargs):
+        """Run a function in the bulkhead of the current request's blueprint and wait for its result.
+
+        The function runs in a copy of the current request context.
+
+        Params:
+        -------
+        f: function
+            Function to run.
+        *args: arguments
+            Positional arguments for the function.
+        **kwargs: keyword arguments
+            Keyword arguments for the function.
+
+        Returns:
+        --------
+        any
+            The function's return value.
+
+        Raises:
+        -------
+        BulkheadFull
+            If the limit for the blueprint or the total limit is reached already.
+        DeadlineExceeded
+            If the function doesn't finish before the request deadline.
+        """
+
+        deadline = self.deadline()
+        blueprint = request.blueprint or 'app'
+        if deadline - time.monotonic() <= 0:
+            self._count('app_offload_timeouts_total', blueprint)
+            raise DeadlineExceeded()
+
+        @copy_current_request_context
+        def call():
+            self._local.deadline = deadline
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self._local.deadline = None
+
+        future = current_app.extensions['offload'].get(blueprint).submit(call)
+        if future is None:
+            self._count('app_offload_rejected_total', blueprint)
+            raise BulkheadFull()
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except concurrent.futures.TimeoutError:
+            if future.done():
+                # the function has finished just after the timeout (or has raised a TimeoutError itself)
+                return future.result()
+            future.cancel()
+            self._count('app_offload_timeouts_total', blueprint)
+            raise DeadlineExceeded()
+
+    def offloaded(self, f):
+        """Decorator for running a view function with `run`.
+
+        Params:
+        -------
+        f: function
+            View function.
+
+        Returns:
+        --------
+        function
+            The decorated view function.
+        """
+
+        @functools.wraps(f)
+        def view(*args, **kwargs):
+            return self.run(f, *args, **kwargs)
+
+        return view
+
+    def deadline(self):
+        """Get the deadline of the current request, as a `time.monotonic` value.
+
+        Returns:
+        --------
+        float
+            The deadline.
+        """
+
+        deadline = getattr(self._local, 'deadline', None)
+        if deadline is not None:
+            return deadline
+        if 'offload_deadline' not in g:
+            g.offload_deadline = time.monotonic() + current_app.config.get('OFFLOAD_TIMEOUT', 10)
+        return g.offload_deadline
+
+    def check_deadline(self):
+        """Raise a `DeadlineExceeded` exception if the deadline of the current request has passed.
+
+        Call this regularly in long-running offloaded functions (for example between database queries), so that they
+        stop once their result isn't needed any longer.
+        """
+
+        if time.monotonic() >= self.deadline():
+            raise DeadlineExceeded()
+
+    @staticmethod
+    def _count(name, blueprint):
+        store = current_app.extensions.get('metrics')
+        if store is not None:
+            store.increment(name, dict(blueprint=blueprint))
+
+
+class _Bulkheads:
+    """The bulkheads of an app, which are created when they are first needed and share a total limit (unless it is
+    None)."""
+
+    def __init__(self, concurrency, limits, total=None):
+        self.concurrency = concurrency
+        self.limits = dict(limits)
+        self.budget = threading.BoundedSemaphore(total) if total else None
+        self._bulkheads = {}
+        self._lock = threading.Lock()
+
+    def get(self, blueprint):
+        with self._lock:
+            if blueprint not in self._bulkheads:
+                self._bulkheads[blueprint] = Bulkhead(blueprint, self.limits.get(blueprint, self.concurrency),
+                                                      budget=self.budget)
+            return self._bulkheads[blueprint]
@@ -0,0 +1,294 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from flask import current_app
+
+from .query_cache import QueryResultCache
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """A dataset which is computed in the background by the precompute worker.
+
+    Datasets are created with the `dataset` decorator of the `Precomputer` extension.
+
+    Params:
+    -------
+    precomputer: Precomputer
+        Extension managing the dataset.
+    name: str
+        Unique name of the dataset.
+    compute: function
+        Function without arguments returning the dataset as a dataframe.
+    interval: float
+        Number of seconds between refreshes.
+    """
+
+    def __init__(self, precomputer, name, compute, interval):
+        self.precomputer = precomputer
+        self.name = name
+        self.compute = compute
+        self.interval = interval
+
+    def get(self):
+        """Get the most recently computed version of the dataset.
+
+        See `Precomputer.get`.
+        """
+
+        return self.precomputer.get(self.name)
+
+    def refresh(self):
+        """Compute the dataset and store it.
+
+        See `Precomputer.refresh`.
+        """
+
+        return self.precomputer.refresh(self.name)
+
+
+class Precomputer:
+    """Flask extension for datasets which are computed periodically in the background rather than during requests.
+
+    A view declares an expensive dataset by decorating a function computing it as a dataframe, specifying how often
+    the dataset should be refreshed. Within a request the dataset is read with its `get` method.
+
+    ```python
+    @precompute.dataset(interval=600)
+    def downtime_per_month():
+        return pd.read_sql('SELECT ...', db.engine)
+
+    @main.route('/downtime')
+    def downtime():
+        df = downtime_per_month.get()
+        ...
+    ```
+
+    The datasets are refreshed by the `flask precompute` command (see `run`), which runs as a separate process. The
+    results are stored in the directory given by the app configuration variable `PRECOMPUTE_DIR` (see
+    `QueryResultCache`), so that all server processes memory-map the same data. A request always gets the most recent
+    result, however old it is; only if a dataset hasn't been computed at all is it computed during the request.
+
+    The start time, duration and outcome of the last refresh of every dataset are stored in the same directory, and
+    they are returned by the `status` method.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        self.datasets = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        directory = app.config['PRECOMPUTE_DIR']
+        os.makedirs(os.path.join(directory, 'status'), exist_ok=True)
+        # precomputed datasets must never be evicted
+        app.extensions['precompute'] = dict(store=QueryResultCache(directory, max_size=None),
+                                            status_dir=os.path.join(directory, 'status'))
+
+    def dataset(self, name=None, interval=300):
+        """Decorator for declaring a precomputed dataset.
+
+        The decorated function must not take any arguments and must return a dataframe. It is called within an app
+        context. The decorator returns a `Dataset`.
+
+        Params:
+        -------
+        name: str
+            Unique name of the dataset. By default the module and name of the decorated function are used.
+        interval: float
+            Number of seconds between refreshes.
+
+        Returns:
+        --------
+        function
+            The decorator.
+        """
+
+        def decorator(f):
+            dataset_name = name or '{module}.{name}'.format(module=f.__module__, name=f.__name__)
+            existing = self.datasets.get(dataset_name)
+            if existing is not None and existing.compute.__code__ is not f.__code__:
+                raise ValueError('There is a dataset with the name {name} already.'.format(name=dataset_name))
+            dataset = Dataset(self, dataset_name, f, interval)
+            self.datasets[dataset_name] = dataset
+            return dataset
+
+        return decorator
+
+    def get(self, name):
+        """Get the most recently computed version of a dataset.
+
+        The dataset is computed (and stored) if it hasn't been computed yet. If several processes request such a
+        dataset at the same time, only one of them computes it.
+
+        Params:
+        -------
+        name: str
+            Name of the dataset.
+
+        Returns:
+        --------
+        DataFrame
+            The dataset. It is memory-mapped, and it must be treated as read-only.
+        """
+
+        dataset = self.datasets[name]
+        store = current_app.extensions['precompute']['store']
+        return store.cached(name, lambda: self._compute(dataset), timeout=math.inf)
+
+    def refresh(self, name):
+        """Compute a dataset and store it, replacing the previous version.
+
+        Params:
+        -------
+        name: str
+            Name of the dataset.
+
+        Returns:
+        --------
+        DataFrame
+            The dataset.
+        """
+
+        dataset = self.datasets[name]
+        df = self._compute(dataset)
+        return current_app.extensions['precompute']['store'].set(name, df)
+
+    def status(self):
+        """Get the status of all datasets.
+
+        Returns:
+        --------
+        list of dict
+            The name and refresh interval of every dataset, as well as the start time (as a Unix timestamp) and
+            duration (in seconds) of its last refresh, the error message if the last refresh failed, and the start time
+            of the last successful refresh. The values for the refresh are None if there hasn't been any.
+        """
+
+        statuses = []
+        for name, dataset in sorted(self.datasets.items()):
+            status = dict(name=name, interval=dataset.interval, last_refresh=None, duration=None, error=None,
+                          last_success=None)
+            status.update(self._read_status(name))
+            statuses.append(status)
+        return statuses
+
+    def run(self, app, names=None, workers=2, once=False, poll_interval=1):
+        """Refresh datasets in parallel whenever they are due.
+
+        A dataset is due if its refresh interval has passed since its last refresh started (irrespective of whether
+        that refresh succeeded). The refreshes are run in a pool of threads, each within its own app context, and a
+        dataset is never refreshed by two threads at the same time.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        names: list of str
+            Names of the datasets to refresh. All datasets are refreshed if this is None.
+        workers: int
+            Maximum number of datasets refreshed at the same time.
+        once: bool
+            Whether to refresh all datasets immediately (irrespective of when they were last refreshed) and return
+            once all of them have been refreshed.
+        poll_interval: float
+            Number of seconds between checks whether datasets are due.
+        """
+
+        names = list(names or sorted(self.datasets))
+        for name in names:
+            if name not in self.datasets:
+                raise ValueError('Unknown dataset: {name}'.format(name=name))
+
+        with app.app_context():
+            last_refreshes = {name: self._read_status(name).get('last_refresh') for name in names}
+        next_refreshes = {name: 0 if once or last_refreshes[name] is None
+                          else last_refreshes[name] + self.datasets[name].interval
+                          for name in names}
+
+        def refresh(name):
+            with app.app_context():
+                try:
+                    self.refresh(name)
+                except Exception:
+                    # the error is recorded in the status, and the dataset is tried again after its interval
+                    logger.exception('Precomputing the dataset {name} failed.'.format(name=name))
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                now = time.time()
+                for name in names:
+                    if name not in running.values() and next_refreshes[name] <= now:
+                        running[executor.submit(refresh, name)] = name
+                        next_refreshes[name] = math.inf if once else now + self.datasets[name].interval
+                if not running:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                done, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+
+    def _compute(self, dataset):
+        """Compute a dataset and record the start time, duration and outcome in its status."""
+
+        started = time.time()
+        start = time.perf_counter()
+        status = self._read_status(dataset.name)
+        try:
+            df = dataset.compute()
+        except Exception as e:
+            status.update(last_refresh=started, duration=time.perf_counter() - start, error=str(e) or repr(e))
+            self._write_status(dataset.name, status)
+            raise
+        status.update(last_refresh=started, duration=time.perf_counter() - start, error=None, last_success=started,
+                      rows=len(df))
+        self._write_status(dataset.name, status)
+        return df
+
+    def _read_status(self, name):
+        """Read the status of a dataset, or return an empty dictionary if there is none."""
+
+        try:
+            with open(self._status_path(name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_status(self, name, status):
+        """Write the status of a dataset."""
+
+        # write to a temporary file first, so that other processes never read an incomplete status
+        path = self._status_path(name)
+        tmp_path = '{path}.{pid}.{thread}.tmp'.format(path=path, pid=os.getpid(), thread=threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, path)
+
+    def _status_path(self, name):
+        """Get the path of the status file of a dataset."""
+
+        return os.path.join(current_app.extensions['precompute']['status_dir'],
+                            QueryResultCache.digest(name) + '.json')
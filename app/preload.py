@@ -0,0 +1,68 @@
+import importlib
+
+# libraries which take a long time to import and use a lot of memory (uwsgi.ini imports them in the uWSGI master)
+HEAVY_MODULES = ('numpy', 'pandas', 'bokeh.embed', 'bokeh.plotting', 'bokeh.resources')
+
+
+def import_heavy_modules():
+    """Import the libraries in `HEAVY_MODULES`.
+
+    If this is done before the server forks its worker processes, the workers share the memory used by these
+    libraries rather than each importing them again.
+    """
+
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+def in_uwsgi_master():
+    """Check whether the current process is a uWSGI master process.
+
+    This is the case if the app is loaded by the master (i.e. uWSGI's `lazy-apps` option is off), so that the workers
+    are forked after the app has been created.
+
+    Returns:
+    --------
+    bool
+        Whether the current process is a uWSGI master process.
+    """
+
+    try:
+        import uwsgi
+    except ImportError:
+        return False
+    return uwsgi.worker_id() == 0
+
+
+def prepare_for_fork(app, db):
+    """Prepare an app which has been created in the uWSGI master for being used by forked worker processes.
+
+    The database connections opened so far are closed, as a connection must never be used by more than one process.
+    After every fork the worker gets a fresh connection pool (without touching the connections of the master, in case
+    there are any) and fresh pool statistics.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    db: SQLAlchemy
+        Flask-SQLAlchemy extension.
+    """
+
+    from uwsgidecorators import postfork
+
+    with app.app_context():
+        db.engine.dispose()
+
+    @postfork
+    def reset_database_pool():
+        with app.app_context():
+            engine = db.engine
+            try:
+                # since SQLAlchemy 1.4.33 the pool can be replaced without closing the connections of the parent
+                engine.dispose(close=False)
+            except TypeError:
+                engine.dispose()
+            statistics = getattr(engine.pool, 'statistics', None)
+            if statistics is not None:
+                statistics.reset()
@@ -0,0 +1,25 @@
+import os
+
+
+def is_running(pid):
+    """Check whether a process is running.
+
+    Params:
+    -------
+    pid: int
+        Process id.
+
+    Returns:
+    --------
+    bool
+        Whether the process is running.
+    """
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists, but belongs to another user
+        return True
+    return True
@@ -0,0 +1,442 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from contextlib import contextmanager
+
+from flask import current_app
+
+# number of attempts for reading an entry which is replaced or evicted while it is read
+READ_ATTEMPTS = 3
+
+
+class QueryResultCache:
+    """Cache for query results (or other dataframes) which is shared by all processes on a machine.
+
+    Results are stored in a directory as one NumPy `.npy` file per column, and they are memory-mapped when read. So
+    all processes (the server processes as well as the Bokeh server) share both the result of a query and the memory
+    holding it, and a query only has to be run by one process.
+
+    Each entry is a directory with the column files and a JSON file describing the columns. The entry for a key is
+    accessed via a symbolic link named after the key, which is replaced atomically when the entry is updated, so that
+    readers always see a complete entry.
+
+    An entry expires `timeout` seconds after it has been created. If an expired (or missing) entry is requested, only
+    one process computes it; other processes requesting the same entry wait for the result. When an entry is added,
+    the least recently used entries are removed if the total size of all entries would exceed `max_size` bytes.
+
+    Columns with a numeric, boolean or datetime type and columns containing only strings are memory-mapped. Other
+    columns (such as columns with a mix of strings and None) are pickled and loaded into memory.
+
+    Params:
+    -------
+    directory: str
+        Directory for the cache files. It is created if it doesn't exist.
+    timeout: float
+        Number of seconds after which an entry expires.
+    max_size: int
+        Maximum total size of all entries in bytes. The size is unbounded if this is None or 0.
+    """
+
+    def __init__(self, directory, timeout=300, max_size=1024 * 1024 * 1024):
+        self.directory = directory
+        self.timeout = timeout
+        self.max_size = max_size
+        os.makedirs(os.path.join(directory, 'entries'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'locks'), exist_ok=True)
+
+    def read_sql(self, sql, con, params=None, timeout=None, **kwargs):
+        """Get the result of a query, running the query with `pandas.read_sql` if necessary.
+
+        The SQL text, the parameters and any further keyword arguments form the cache key.
+
+        Params:
+        -------
+        sql: str
+            SQL query.
+        con: SQLAlchemy engine or connection
+            Database connection.
+        params: list or dict
+            Query parameters.
+        timeout: float
+            Number of seconds after which the cached result expires. The cache's timeout is used by default.
+        **kwargs: keyword arguments
+            Keyword arguments for `pandas.read_sql`.
+
+        Returns:
+        --------
+        DataFrame
+            The query result.
+        """
+
+        import pandas as pd
+
+        return self.cached(_sql_key(sql, params, kwargs), lambda: pd.read_sql(sql, con, params=params, **kwargs),
+                           timeout=timeout)
+
+    def cached(self, key, compute, timeout=None):
+        """Get a cached dataframe, computing it if necessary.
+
+        Params:
+        -------
+        key: object
+            Cache key. It must be serialisable as JSON (values which aren't are converted to strings).
+        compute: function
+            Function without arguments returning the dataframe for the key.
+        timeout: float
+            Number of seconds after which the cached dataframe expires. The cache's timeout is used by default.
+
+        Returns:
+        --------
+        DataFrame
+            The dataframe.
+        """
+
+        digest = self.digest(key)
+        timeout = self.timeout if timeout is None else timeout
+
+        df = self._read(digest, timeout)
+        if df is not None:
+            return df
+
+        with self._lock(digest):
+            # another process may have computed the entry while this one was waiting for the lock
+            df = self._read(digest, timeout)
+            if df is not None:
+                return df
+            df = compute()
+            self._write(digest, df)
+
+        return self._read_written(digest, df)
+
+    def get(self, key, max_age=None):
+        """Get a cached dataframe without computing it.
+
+        Params:
+        -------
+        key: object
+            Cache key.
+        max_age: float
+            Maximum age of the entry in seconds. The entry is returned irrespective of its age if this is None.
+
+        Returns:
+        --------
+        DataFrame
+            The dataframe, or None if there is no entry for the key or the entry is too old.
+        """
+
+        return self._read(self.digest(key), max_age)
+
+    def set(self, key, df):
+        """Add a dataframe to the cache, replacing any existing entry for its key.
+
+        Params:
+        -------
+        key: object
+            Cache key.
+        df: DataFrame
+            The dataframe.
+
+        Returns:
+        --------
+        DataFrame
+            The cached (memory-mapped) dataframe, or the given dataframe if the entry has been evicted already.
+        """
+
+        digest = self.digest(key)
+        with self._lock(digest):
+            self._write(digest, df)
+        return self._read_written(digest, df)
+
+    def invalidate(self, key=None):
+        """Remove an entry, or all entries if no key is given.
+
+        Params:
+        -------
+        key: object
+            Cache key.
+        """
+
+        digests = [self.digest(key)] if key is not None else [d for d, _, _ in self._entries()]
+        for digest in digests:
+            with self._lock(digest):
+                self._remove(digest)
+
+    @staticmethod
+    def digest(key):
+        """Get the digest used as the file name for a cache key."""
+
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _read(self, digest, timeout):
+        """Read an entry, or return None if it doesn't exist or has expired (unless the timeout is None)."""
+
+        import numpy as np
+
+        link = os.path.join(self.directory, digest)
+        for _ in range(READ_ATTEMPTS):
+            try:
+                entry = os.path.join(self.directory, os.readlink(link))
+                with open(os.path.join(entry, 'meta.json')) as f:
+                    meta = json.load(f)
+                if timeout is not None and time.time() - meta['created'] > timeout:
+                    return None
+                columns = []
+                for i, column in enumerate(meta['columns']):
+                    path = os.path.join(entry, '{0}.npy'.format(i))
+                    if column['mmap']:
+                        columns.append(np.load(path, mmap_mode='r'))
+                    else:
+                        columns.append(np.load(path, allow_pickle=True))
+                # the modification time of the entry is used for finding the least recently used entries
+                os.utime(entry)
+            except FileNotFoundError:
+                # the entry doesn't exist, or it has been replaced or evicted in the meantime
+                if not os.path.lexists(link):
+                    return None
+                continue
+
+            return _dataframe([column['name'] for column in meta['columns']], columns, meta['index'])
+        return None
+
+    def _read_written(self, digest, df):
+        """Evict entries if necessary after writing an entry, and read the written entry."""
+
+        self._evict()
+        # the memory-mapped dataframe is returned, unless the entry has been evicted already
+        cached_df = self._read(digest, None)
+        return cached_df if cached_df is not None else df
+
+    def _write(self, digest, df):
+        """Write a dataframe as the new entry for a digest."""
+
+        import numpy as np
+
+        index = [name for name in df.index.names if name is not None]
+        if index:
+            df = df.reset_index()
+
+        version = '{digest}.{version}'.format(digest=digest, version=uuid.uuid4().hex)
+        tmp_entry = os.path.join(self.directory, 'entries', version + '.tmp')
+        os.makedirs(tmp_entry)
+        columns = []
+        size = 0
+        for i, name in enumerate(df.columns):
+            values = np.asarray(df[name])
+            if values.dtype.kind == 'O' and all(isinstance(value, str) for value in values):
+                values = values.astype(str)
+            mmap = values.dtype.kind in 'biufcmMU'
+            path = os.path.join(tmp_entry, '{0}.npy'.format(i))
+            np.save(path, values, allow_pickle=not mmap)
+            size += os.path.getsize(path)
+            columns.append(dict(name=name, mmap=mmap))
+        with open(os.path.join(tmp_entry, 'meta.json'), 'w') as f:
+            json.dump(dict(columns=columns, index=index, created=time.time(), size=size), f, default=str)
+        entry = os.path.join(self.directory, 'entries', version)
+        os.rename(tmp_entry, entry)
+
+        # replace the link atomically, and remove the previous entry (processes which have mapped its files can still
+        # access them)
+        link = os.path.join(self.directory, digest)
+        previous = self._target(digest)
+        tmp_link = '{link}.{pid}.tmp'.format(link=link, pid=os.getpid())
+        os.symlink(os.path.join('entries', version), tmp_link)
+        os.replace(tmp_link, link)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def _remove(self, digest):
+        """Remove the entry for a digest."""
+
+        previous = self._target(digest)
+        try:
+            os.remove(os.path.join(self.directory, digest))
+        except FileNotFoundError:
+            pass
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def _evict(self):
+        """Remove the least recently used entries until the total size doesn't exceed the maximum size."""
+
+        if not self.max_size:
+            return
+        with self._lock('evict', blocking=False) as locked:
+            if not locked:
+                # another process is evicting entries already
+                return
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total_size = sum(size for _, size, _ in entries)
+            for digest, size, _ in entries:
+                if total_size <= self.max_size:
+                    break
+                with self._lock(digest):
+                    self._remove(digest)
+                total_size -= size
+
+    def _entries(self):
+        """Get the digest, size and last access time of all entries."""
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if len(name) != 40 or not os.path.islink(os.path.join(self.directory, name)):
+                continue
+            target = self._target(name)
+            try:
+                with open(os.path.join(target, 'meta.json')) as f:
+                    size = json.load(f)['size']
+                entries.append((name, size, os.path.getmtime(target)))
+            except (FileNotFoundError, TypeError):
+                continue
+        return entries
+
+    def _target(self, digest):
+        """Get the path of the entry directory for a digest, or None if there is no entry."""
+
+        try:
+            return os.path.join(self.directory, os.readlink(os.path.join(self.directory, digest)))
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _lock(self, name, blocking=True):
+        """Context manager holding an exclusive file lock, which yields whether the lock has been acquired."""
+
+        with open(os.path.join(self.directory, 'locks', name + '.lock'), 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _dataframe(names, columns, index_names):
+    """Create a dataframe from its columns without copying the (memory-mapped) column values.
+
+    Passing the columns to the `DataFrame` constructor would consolidate the columns of the same type into a single
+    two-dimensional array, i.e. copy them. Instead, a single-column dataframe is created for each column from a view
+    of the column values, and these dataframes are concatenated. The index is created from the index columns directly,
+    as `set_index` would copy the dataframe.
+
+    Params:
+    -------
+    names: list of str
+        Column names.
+    columns: list of numpy.ndarray
+        Column values.
+    index_names: list of str
+        Names of the columns to use as the index.
+
+    Returns:
+    --------
+    DataFrame
+        The dataframe.
+    """
+
+    import pandas as pd
+
+    index_arrays = [values for name, values in zip(names, columns) if name in index_names]
+    if len(index_arrays) > 1:
+        index = pd.MultiIndex.from_arrays(index_arrays, names=index_names)
+    elif index_arrays:
+        index = pd.Index(index_arrays[0], name=index_names[0])
+    else:
+        index = None
+
+    frames = [pd.DataFrame(values.reshape(-1, 1), index=index, columns=[name], copy=False)
+              for name, values in zip(names, columns) if name not in index_names]
+    if not frames:
+        return pd.DataFrame(index=index)
+    if len(frames) == 1:
+        return frames[0]
+    # pandas 3 never copies when concatenating (it uses copy on write), and deprecates the copy argument
+    no_copy = {} if int(pd.__version__.split('.')[0]) >= 3 else dict(copy=False)
+    return pd.concat(frames, axis=1, **no_copy)
+
+
+class QueryCache:
+    """Flask extension for caching query results across processes.
+
+    The results are stored in the directory given by the app configuration variable `QUERY_CACHE_DIR`, and their
+    timeout and the maximum total size of the cache are read from the configuration variables `QUERY_CACHE_TIMEOUT` and
+    `QUERY_CACHE_MAX_SIZE`. See `QueryResultCache` for details. Caching is disabled if the maximum size is 0.
+
+    Use the `read_sql` method instead of `pandas.read_sql`:
+
+    ```python
+    df = query_cache.read_sql('SELECT * FROM Weather WHERE date > %s', db.engine, params=(start,))
+    ```
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the cache for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        if app.config.get('QUERY_CACHE_MAX_SIZE', 0) and app.config.get('QUERY_CACHE_DIR'):
+            cache = QueryResultCache(app.config['QUERY_CACHE_DIR'],
+                                     timeout=app.config.get('QUERY_CACHE_TIMEOUT', 300),
+                                     max_size=app.config['QUERY_CACHE_MAX_SIZE'])
+        else:
+            cache = None
+        app.extensions['query_cache'] = cache
+
+    def read_sql(self, sql, con, params=None, timeout=None, **kwargs):
+        """Get the result of a query, running the query if necessary.
+
+        See `QueryResultCache.read_sql` for the parameters. The query is always run if caching is disabled.
+        """
+
+        cache = current_app.extensions.get('query_cache')
+        if cache is None:
+            import pandas as pd
+            return pd.read_sql(sql, con, params=params, **kwargs)
+        return cache.read_sql(sql, con, params=params, timeout=timeout, **kwargs)
+
+    def invalidate(self, sql=None, params=None, **kwargs):
+        """Remove a cached query result, or all cached results if no query is given.
+
+        Params:
+        -------
+        sql: str
+            SQL query.
+        params: list or dict
+            Query parameters.
+        **kwargs: keyword arguments
+            Keyword arguments which were passed to `read_sql`.
+        """
+
+        cache = current_app.extensions.get('query_cache')
+        if cache is None:
+            return
+        cache.invalidate(_sql_key(sql, params, kwargs) if sql is not None else None)
+
+
+def _sql_key(sql, params, kwargs):
+    """Get the cache key for a query."""
+
+    return 'read_sql', str(sql), params, kwargs
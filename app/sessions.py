@@ -0,0 +1,491 @@
+import abc
+import base64
+import mmap
+import os
+import sqlite3
+import stat
+import struct
+import threading
+import time
+import zlib
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from .cache import LRUCache
+
+# number of version slots shared by all processes (8 bytes each)
+VERSION_SLOTS = 64 * 1024
+
+# session keys holding the id of the logged in user (Flask-Login 0.3 uses user_id, later versions _user_id)
+USER_ID_KEYS = ('_user_id', 'user_id')
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """A session whose data is kept on the server, identified by an opaque id in the session cookie.
+
+    Params:
+    -------
+    initial: dict
+        Session data.
+    sid: str
+        Session id, or None if the session hasn't been stored yet.
+    text: str
+        Serialized session data as loaded from the store.
+    expires: float
+        Time (in seconds since the epoch) when the stored session expires.
+    """
+
+    def __init__(self, initial=None, sid=None, text=None, expires=None):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.text = text
+        self.expires = expires
+        self.new = sid is None
+        self.modified = False
+        self.user_id = _user_id(self)
+
+
+class SessionStore(abc.ABC):
+    """Abstract base class for the storage of server-side sessions.
+
+    A store keeps the serialized data and the expiry time of every session. Expired sessions must be treated as if
+    they didn't exist. A store may additionally provide a version for every session, which must change after the
+    session has been saved or deleted, in any process. Only then can the sessions be cached by the processes.
+    """
+
+    @abc.abstractmethod
+    def load(self, sid):
+        """Load a session.
+
+        Params:
+        -------
+        sid: str
+            Session id.
+
+        Returns:
+        --------
+        tuple
+            The serialized data and the expiry time of the session, or None if there is no unexpired session.
+        """
+
+    @abc.abstractmethod
+    def save(self, sid, text, expires):
+        """Save a session.
+
+        Params:
+        -------
+        sid: str
+            Session id.
+        text: str
+            Serialized session data.
+        expires: float
+            Time (in seconds since the epoch) when the session expires.
+        """
+
+    @abc.abstractmethod
+    def touch(self, sid, expires):
+        """Change the expiry time of a session without changing its data or version.
+
+        Params:
+        -------
+        sid: str
+            Session id.
+        expires: float
+            Time (in seconds since the epoch) when the session expires.
+        """
+
+    @abc.abstractmethod
+    def delete(self, sid):
+        """Delete a session.
+
+        Params:
+        -------
+        sid: str
+            Session id.
+        """
+
+    @abc.abstractmethod
+    def collect_garbage(self):
+        """Delete all expired sessions.
+
+        Returns:
+        --------
+        int
+            The number of deleted sessions.
+        """
+
+    def version(self, sid):
+        """Get the current version of a session, or None if the store has no versions."""
+
+        return None
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store using a local SQLite database shared by all processes.
+
+    The database is used in write-ahead logging mode, so that reading sessions doesn't block while another process is
+    saving one. Every thread of every process has its own connection.
+
+    The versions of the sessions are kept in a memory-mapped file, so that a process can check whether a cached session
+    is still current without querying the database. The session id is hashed to one of `VERSION_SLOTS` slots, and the
+    slot is set to a new random value after a session has been saved or deleted (rather than before, as a process
+    might otherwise read the new version but still load the old data). Sessions sharing a slot merely invalidate each
+    other's cache entries.
+
+    As the session ids are credentials, the directory is created so that only the current user can access it, the
+    files are only readable and writable by the current user, and a directory owned by another user is refused.
+
+    Params:
+    -------
+    directory: str
+        Directory for the database and the versions file. It is created if it doesn't exist.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'sessions.sqlite')
+        self.versions = _VersionTable(os.path.join(directory, 'sessions.versions'))
+        self._local = threading.local()
+
+    def load(self, sid):
+        row = self._connection().execute('SELECT data, expires FROM sessions WHERE id = ? AND expires > ?',
+                                         (sid, time.time())).fetchone()
+        return tuple(row) if row is not None else None
+
+    def save(self, sid, text, expires):
+        self._connection().execute('INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)',
+                                   (sid, text, expires))
+        self.versions.bump(sid)
+
+    def touch(self, sid, expires):
+        self._connection().execute('UPDATE sessions SET expires = ? WHERE id = ?', (expires, sid))
+
+    def delete(self, sid):
+        self._connection().execute('DELETE FROM sessions WHERE id = ?', (sid,))
+        self.versions.bump(sid)
+
+    def collect_garbage(self):
+        return self._connection().execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),)).rowcount
+
+    def version(self, sid):
+        return self.versions.get(sid)
+
+    def _connection(self):
+        """Get the database connection of the current thread, creating the database if necessary."""
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        _private_directory(self.directory)
+        # SQLite gives the write-ahead log and shared memory files the permissions of the database file
+        os.close(_private_file(self.path))
+        # the connection is in autocommit mode, as every statement is a transaction of its own
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, '
+                           'expires REAL NOT NULL)')
+        connection.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)')
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface storing the session data on the server.
+
+    The session cookie only contains a random session id, so that it is neither signed nor verified, and its size
+    doesn't depend on the session data. Sessions are only saved if their data has changed. The session id is replaced
+    with a new one whenever the logged in user changes, so that an id obtained before logging in is worthless
+    afterwards.
+
+    Sessions expire `PERMANENT_SESSION_LIFETIME` after they have been saved, irrespective of whether they are
+    permanent. The expiry time is extended once less than half of the lifetime is left, and a permanent session cookie
+    expires at the same time as the session. Expired sessions are deleted by a background thread every `gc_interval`
+    seconds.
+
+    If a cache is given and the store provides versions, the serialized session data is cached by the process, and a
+    session is only loaded from the store if its version has changed since it was cached.
+
+    Params:
+    -------
+    store: SessionStore
+        Session store.
+    cache: LRUCache
+        Cache for the serialized sessions, keyed by session id.
+    gc_interval: float
+        Number of seconds between deleting the expired sessions.
+    """
+
+    serializer = session_json_serializer
+    session_class = ServerSideSession
+
+    def __init__(self, store, cache=None, gc_interval=600):
+        self.store = store
+        self.cache = cache
+        self.gc_interval = gc_interval
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def open_session(self, app, request):
+        self._start_collector()
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if sid:
+            record = self._load(sid)
+            if record is not None:
+                text, expires = record
+                return self.session_class(self.serializer.loads(text), sid=sid, text=text, expires=expires)
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = app.config['SESSION_COOKIE_NAME']
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid is not None:
+                self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add('Cookie')
+            return
+
+        now = time.time()
+        lifetime = _total_seconds(app.permanent_session_lifetime)
+        # an unmodified session needn't be serialized, and assigning unchanged values doesn't cause a write
+        text = self.serializer.dumps(dict(session)) if session.modified else session.text
+        sid = session.sid
+        if sid is None or _user_id(session) != session.user_id:
+            if sid is not None:
+                self._delete(sid)
+            sid = _generate_session_id()
+            self._save(sid, text, now + lifetime)
+        elif text != session.text:
+            self._save(sid, text, now + lifetime)
+        elif session.expires - now < lifetime / 2:
+            self._touch(sid, text, now + lifetime)
+        else:
+            return
+
+        kwargs = dict(expires=now + lifetime if session.permanent else None,
+                      httponly=self.get_cookie_httponly(app),
+                      domain=domain,
+                      path=path,
+                      secure=self.get_cookie_secure(app))
+        if hasattr(self, 'get_cookie_samesite'):
+            kwargs['samesite'] = self.get_cookie_samesite(app)
+        response.set_cookie(name, sid, **kwargs)
+        response.vary.add('Cookie')
+
+    def _load(self, sid):
+        """Load the serialized data and the expiry time of a session, from the cache if it is current."""
+
+        # the version must be read before the session is loaded, so that a change in between invalidates the entry
+        version = self.store.version(sid) if self.cache is not None else None
+        if version is not None:
+            entry = self.cache.get(sid)
+            if entry is not None and entry[1] == version and entry[2] > time.time():
+                return entry[0], entry[2]
+
+        record = self.store.load(sid)
+        if version is not None:
+            if record is not None:
+                self.cache.set(sid, (record[0], version, record[1]))
+            else:
+                self.cache.delete(sid)
+        return record
+
+    def _save(self, sid, text, expires):
+        # the saved session isn't cached, as another process may save the session concurrently, and the version it
+        # sets may be overwritten by this process's version (or vice versa); the next load caches whatever has been
+        # saved last, under the version read before loading it
+        self.store.save(sid, text, expires)
+        if self.cache is not None:
+            self.cache.delete(sid)
+
+    def _touch(self, sid, text, expires):
+        self.store.touch(sid, expires)
+        if self.cache is not None:
+            entry = self.cache.get(sid)
+            if entry is not None:
+                self.cache.set(sid, (text, entry[1], expires))
+
+    def _delete(self, sid):
+        self.store.delete(sid)
+        if self.cache is not None:
+            self.cache.delete(sid)
+
+    def _start_collector(self):
+        """Start the background thread for deleting expired sessions, unless it has been started in this process."""
+
+        pid = os.getpid()
+        if self._pid == pid or not self.gc_interval:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            collector = threading.Thread(target=self._collect_garbage, name='SessionGarbageCollector')
+            collector.daemon = True
+            collector.start()
+            self._pid = pid
+
+    def _collect_garbage(self):
+        while True:
+            time.sleep(self.gc_interval)
+            try:
+                self.store.collect_garbage()
+            except sqlite3.Error:
+                # the database is busy; try again next time
+                pass
+
+
+class ServerSideSessions:
+    """Flask extension storing the sessions on the server rather than in the session cookie.
+
+    The store is chosen with the app configuration variable `SESSION_STORE`. If it is `sqlite`, the sessions are stored
+    in a SQLite database in the directory `SESSION_DIR` (see `SQLiteSessionStore`), and every process caches up to
+    `SESSION_CACHE_MAX_SIZE` bytes of serialized sessions (0 disables the cache). Expired sessions are deleted every
+    `SESSION_GC_INTERVAL` seconds. If it is `cookie`, Flask's default signed cookie sessions are used.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+
+    Raises:
+    -------
+    ValueError:
+        If the session store isn't supported.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        kind = app.config.get('SESSION_STORE', 'cookie')
+        if kind == 'cookie':
+            app.extensions['sessions'] = None
+            return
+        if kind != 'sqlite':
+            raise ValueError('Unsupported session store: {kind}'.format(kind=kind))
+
+        max_size = app.config.get('SESSION_CACHE_MAX_SIZE', 0)
+        cache = LRUCache(max_size=max_size, sizeof=lambda entry: len(entry[0])) if max_size else None
+        interface = ServerSideSessionInterface(SQLiteSessionStore(app.config['SESSION_DIR']),
+                                               cache=cache,
+                                               gc_interval=app.config.get('SESSION_GC_INTERVAL', 600))
+        app.session_interface = interface
+        app.extensions['sessions'] = interface
+
+
+class _VersionTable:
+    """Version slots for session ids, in a memory-mapped file shared by all processes.
+
+    Params:
+    -------
+    path: str
+        Path of the file. The file is created if it doesn't exist.
+    slots: int
+        Number of slots.
+    """
+
+    def __init__(self, path, slots=VERSION_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._m = None
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        """Get the version of the slot of a session id."""
+
+        return struct.unpack_from('q', self._map(), self._offset(sid))[0]
+
+    def bump(self, sid):
+        """Set the slot of a session id to a new random version, and return the version."""
+
+        version = struct.unpack('q', os.urandom(8))[0]
+        struct.pack_into('q', self._map(), self._offset(sid), version)
+        return version
+
+    def _offset(self, sid):
+        return 8 * (zlib.crc32(sid.encode('utf-8')) % self.slots)
+
+    def _map(self):
+        if self._m is not None:
+            return self._m
+        with self._lock:
+            if self._m is None:
+                _private_directory(os.path.dirname(self.path))
+                with open(_private_file(self.path), 'r+b') as f:
+                    if os.fstat(f.fileno()).st_size < 8 * self.slots:
+                        f.truncate(8 * self.slots)
+                    # the mapping remains valid after the file is closed, and forked processes share it
+                    self._m = mmap.mmap(f.fileno(), 8 * self.slots)
+        return self._m
+
+
+def _private_directory(directory):
+    """Create a directory which only the current user can access, or check that an existing one is owned by the user.
+
+    Params:
+    -------
+    directory: str
+        Path of the directory.
+
+    Raises:
+    -------
+    PermissionError:
+        If the path isn't a directory owned by the current user.
+    """
+
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # a symbolic link is refused, as it might point to a directory controlled by another user
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError('The session directory must be a directory owned by the current user: {directory}'
+                              .format(directory=directory))
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+
+
+def _private_file(path):
+    """Open a file only the current user can read and write (creating it if necessary), and return the descriptor."""
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    # files created by earlier versions may be readable by other users
+    os.fchmod(fd, 0o600)
+    return fd
+
+
+def _generate_session_id():
+    """Generate a random session id (with 256 bits of randomness)."""
+
+    return base64.urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode('ascii')
+
+
+def _user_id(session):
+    """Get the id of the user logged in in a session, or None if no user is logged in."""
+
+    for key in USER_ID_KEYS:
+        if key in session:
+            return session[key]
+    return None
+
+
+def _total_seconds(lifetime):
+    """Get the number of seconds of a session lifetime, which may be a timedelta or a number."""
+
+    return lifetime.total_seconds() if hasattr(lifetime, 'total_seconds') else float(lifetime)
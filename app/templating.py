@@ -0,0 +1,109 @@
+import os
+
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from .cache import LRUCache
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension adding a tag for caching rendered template fragments.
+
+    The tag takes one or more expressions forming the cache key and an optional timeout (in seconds), as in
+
+    ```
+    {% cache 'navbar', current_user.is_authenticated, timeout=600 %}
+        ...
+    {% endcache %}
+    ```
+
+    The template name and the line of the tag are added to the key, so that the same key may be used in different
+    places. The fragment is rendered as usual if there is no fragment cache for the current app.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+
+        key = [nodes.Const(parser.name), nodes.Const(lineno)]
+        timeout = nodes.Const(None)
+        while True:
+            if parser.stream.current.test('name:timeout') and parser.stream.look().test('assign'):
+                next(parser.stream)
+                next(parser.stream)
+                timeout = parser.parse_expression()
+            else:
+                key.append(parser.parse_expression())
+            if not parser.stream.skip_if('comma'):
+                break
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', [nodes.Tuple(key, 'load'), timeout]),
+                               [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, timeout, caller):
+        cache = current_app.extensions.get('fragment_cache')
+        if cache is None:
+            return caller()
+
+        value = cache.get(key)
+        if value is None:
+            value = str(caller())
+            cache.set(key, value, timeout=timeout)
+        return Markup(value)
+
+
+class TemplateCache:
+    """Flask extension for caching compiled templates and rendered template fragments.
+
+    Compiled templates are stored in the directory given by the app configuration variable
+    `TEMPLATE_BYTECODE_CACHE_DIR`, so that they are shared by all server processes and templates only need to be
+    compiled again if they have changed. No bytecode cache is used if the directory is None.
+
+    Fragments are cached with the `cache` tag (see `FragmentCacheExtension`). Their default timeout and the maximum
+    total number of characters of all cached fragments are read from the app configuration variables
+    `FRAGMENT_CACHE_TIMEOUT` and `FRAGMENT_CACHE_MAX_SIZE`. Fragment caching is disabled if the maximum size is 0, but
+    the `cache` tag can still be used. The fragment cache is local to the process.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the caches for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        if app.config.get('FRAGMENT_CACHE_MAX_SIZE', 0):
+            cache = LRUCache(timeout=app.config.get('FRAGMENT_CACHE_TIMEOUT'),
+                             max_size=app.config['FRAGMENT_CACHE_MAX_SIZE'],
+                             sizeof=len)
+        else:
+            cache = None
+        app.extensions['fragment_cache'] = cache
+
+    def invalidate(self):
+        """Remove all cached fragments of the current process."""
+
+        cache = current_app.extensions.get('fragment_cache')
+        if cache is not None:
+            cache.clear()
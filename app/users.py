@@ -0,0 +1,213 @@
+import functools
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .cache import LRUCache
+
+
+class UserCache:
+    """Per-process cache for the users loaded by Flask-Login's user loader.
+
+    Flask-Login calls the user loader for every request of an authenticated user. If users are stored in a database,
+    this means a query per request. The `cached` decorator avoids this by caching the loaded users, keyed by their id.
+
+    ```python
+    @login_manager.user_loader
+    @user_cache.cached
+    def load_user(user_id):
+        ...
+    ```
+
+    The cached user objects are shared by all requests (and threads) of a server process, so they must not be modified
+    in requests, and they must not be database model instances attached to a session. A cached user must be removed
+    with the `invalidate` method whenever the user's data changes (for example, when the password is changed or the
+    user logs out). As every server process has its own cache, this only affects the current process; the other
+    processes pick up the change when their entry expires.
+
+    Timeout and maximum number of cached users are read from the app configuration variables `USER_CACHE_TIMEOUT` and
+    `USER_CACHE_MAX_SIZE`. Caching is disabled if the maximum size is 0.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the cache for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        if app.config.get('USER_CACHE_MAX_SIZE', 0):
+            cache = LRUCache(timeout=app.config.get('USER_CACHE_TIMEOUT'), max_size=app.config['USER_CACHE_MAX_SIZE'])
+        else:
+            cache = None
+        app.extensions['user_cache'] = cache
+
+    def cached(self, f):
+        """Decorator for caching the users returned by a user loader.
+
+        Users which can't be loaded (i.e. for which the loader returns None) aren't cached.
+
+        Params:
+        -------
+        f: function
+            User loader, which takes a user id and returns the corresponding user or None.
+
+        Returns:
+        --------
+        function
+            The decorated user loader.
+        """
+
+        @functools.wraps(f)
+        def decorated(user_id):
+            cache = current_app.extensions.get('user_cache')
+            if cache is None:
+                return f(user_id)
+
+            user = cache.get(user_id)
+            if user is None:
+                user = f(user_id)
+                if user is not None:
+                    cache.set(user_id, user)
+            return user
+
+        return decorated
+
+    def invalidate(self, user_id=None):
+        """Remove a user from the cache of the current process.
+
+        Params:
+        -------
+        user_id: str
+            Id of the user to remove. All users are removed if this is None.
+        """
+
+        cache = current_app.extensions.get('user_cache')
+        if cache is None:
+            return
+        if user_id is None:
+            cache.clear()
+        else:
+            cache.delete(user_id)
+
+
+class VerificationBusyError(Exception):
+    """Raised if a password verification is requested while too many verifications are in progress."""
+
+    pass
+
+
+class PasswordVerifier:
+    """Runs password verifications in a bounded thread pool.
+
+    Verifying a password with a key derivation function (such as PBKDF2 or bcrypt) takes a lot of CPU time on purpose.
+    If many users try to log in at the same time, these verifications could occupy all the server threads, so that no
+    other requests are handled. This extension therefore limits the number of verifications per process: at most
+    `PASSWORD_VERIFICATION_WORKERS` verifications run at the same time, and at most `PASSWORD_VERIFICATION_MAX_PENDING`
+    verifications may be running or waiting. Any further verification is rejected immediately with a
+    `VerificationBusyError`, which should result in a 503 response. The values are read from the app configuration.
+
+    The thread pool is created when it is first used in a process, so that the app can be created before a server forks
+    its worker processes.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialise the extension for a Flask app.
+
+        Params:
+        -------
+        app: Flask
+            Flask app.
+        """
+
+        app.extensions['password_verifier'] = _BoundedExecutor(app.config.get('PASSWORD_VERIFICATION_WORKERS', 1),
+                                                               app.config.get('PASSWORD_VERIFICATION_MAX_PENDING', 1))
+
+    def verify(self, f, *args, **kwargs):
+        """Call a password verification function in the thread pool and wait for its result.
+
+        Params:
+        -------
+        f: function
+            Function verifying a password.
+        *args: positional arguments
+            Positional arguments for the function.
+        **kwargs: keyword arguments
+            Keyword arguments for the function.
+
+        Returns:
+        --------
+        object
+            The function's return value.
+
+        Raises:
+        -------
+        VerificationBusyError
+            If the maximum number of pending verifications has been reached.
+        """
+
+        return current_app.extensions['password_verifier'].call(f, *args, **kwargs)
+
+
+class _BoundedExecutor:
+    """A thread pool which rejects calls when too many calls are pending.
+
+    Params:
+    -------
+    workers: int
+        Number of threads.
+    max_pending: int
+        Maximum number of running and queued calls.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def call(self, f, *args, **kwargs):
+        """Call a function in the thread pool and return its result."""
+
+        if not self._slots.acquire(blocking=False):
+            raise VerificationBusyError('Too many password verifications are in progress.')
+        try:
+            return self._pool().submit(f, *args, **kwargs).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        """Get the thread pool for the current process."""
+
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                    self._pid = pid
+        return self._executor
@@ -0,0 +1,168 @@
+import numpy as np
+
+# kinds of update returned by update_source
+NONE = 'none'
+PATCH = 'patch'
+REPLACE = 'replace'
+STREAM = 'stream'
+
+
+def changed_rows(old, new):
+    """Find the rows in which two columns of the same length differ.
+
+    NaN values are considered equal to each other.
+
+    Params:
+    -------
+    old: array-like
+        Current column values.
+    new: array-like
+        New column values.
+
+    Returns:
+    --------
+    ndarray
+        Boolean array which is True for the rows with different values.
+    """
+
+    old = np.asarray(old)
+    new = np.asarray(new)
+    changed = np.asarray(old != new, dtype=bool)
+    if old.dtype.kind in 'fcmM' and new.dtype.kind in 'fcmM':
+        # NaN (and NaT) are the only values which differ from themselves
+        changed &= ~((old != old) & (new != new))
+    return changed
+
+
+def source_delta(current, new, rollover=None, max_patch_fraction=0.5):
+    """Determine the smallest update which turns the current data of a column data source into new data.
+
+    The following kinds of update are considered:
+
+    'none'
+        The data hasn't changed.
+    'stream'
+        Rows have been appended to the data. If `rollover` is given, rows may also have been removed from the start,
+        provided the new data has `rollover` rows (so that streaming with this rollover removes them). This is the
+        case for a plot showing a moving time window.
+    'patch'
+        The number of rows is unchanged, and at most the fraction `max_patch_fraction` of all values have changed.
+    'replace'
+        Any other change, including added or removed columns.
+
+    Params:
+    -------
+    current: dict
+        Current data, as a dictionary of column names and values.
+    new: dict
+        New data, as a dictionary of column names and values. All columns must have the same length.
+    rollover: int
+        Maximum number of rows when streaming.
+    max_patch_fraction: float
+        Maximum fraction of changed values for which a patch is used.
+
+    Returns:
+    --------
+    tuple
+        The kind of update and its argument for the column data source: None for 'none', the new rows for 'stream',
+        the patches (as a dictionary of column names and lists of index-value pairs) for 'patch', and the new data for
+        'replace'.
+    """
+
+    if set(current) != set(new):
+        return REPLACE, new
+    if not new:
+        return NONE, None
+
+    current = {name: np.asarray(values) for name, values in current.items()}
+    new = {name: np.asarray(values) for name, values in new.items()}
+    current_length = len(next(iter(current.values())))
+    new_length = len(next(iter(new.values())))
+
+    changed = None
+    if new_length == current_length:
+        changed = {name: np.flatnonzero(changed_rows(current[name], new[name])) for name in new}
+        if not any(len(rows) for rows in changed.values()):
+            return NONE, None
+
+    if rollover is not None and new_length == rollover:
+        # rows appended, and rows removed from the start by the rollover (this is checked before patches, as a shifted
+        # window changes most values)
+        start = _overlap_start(current, new)
+        if start is not None:
+            return STREAM, {name: new[name][current_length - start:] for name in new}
+
+    if changed is not None:
+        total_changed = sum(len(rows) for rows in changed.values())
+        if total_changed <= max_patch_fraction * new_length * len(new):
+            patches = {name: list(zip(rows.tolist(), new[name][rows].tolist()))
+                       for name, rows in changed.items() if len(rows)}
+            return PATCH, patches
+
+    if current_length < new_length and (rollover is None or new_length <= rollover):
+        # rows appended
+        if all(not changed_rows(current[name], new[name][:current_length]).any() for name in new):
+            return STREAM, {name: new[name][current_length:] for name in new}
+
+    return REPLACE, new
+
+
+def update_source(source, new, rollover=None, max_patch_fraction=0.5):
+    """Update a column data source with the smallest possible change.
+
+    Replacing the columns of a source means that all their values are sent to the browser. So instead the source's
+    `stream` or `patch` method is used if only some rows have been added or changed (see `source_delta`). For example,
+    the following callback only sends the alpha values of the points which cross the cutoff radius.
+
+    ```python
+    def update_alpha(attr, old, new):
+        x, y = source.data['x'], source.data['y']
+        alpha = np.where(np.hypot(x, y) <= cutoff_slider.value, 1, 0.1)
+        update_source(source, dict(x=x, y=y, alpha=alpha))
+    ```
+
+    Params:
+    -------
+    source: ColumnDataSource
+        Column data source.
+    new: dict
+        New data, as a dictionary of column names and values. All columns must have the same length.
+    rollover: int
+        Maximum number of rows when streaming.
+    max_patch_fraction: float
+        Maximum fraction of changed values for which a patch is used.
+
+    Returns:
+    --------
+    str
+        The kind of update ('none', 'stream', 'patch' or 'replace').
+    """
+
+    kind, delta = source_delta(source.data, new, rollover=rollover, max_patch_fraction=max_patch_fraction)
+    if kind == STREAM:
+        source.stream(delta, rollover=rollover)
+    elif kind == PATCH:
+        source.patch(delta)
+    elif kind == REPLACE:
+        source.data = dict(delta)
+    return kind
+
+
+def _overlap_start(current, new):
+    """Find the first row (other than the first) from which the current data is the start of the new data.
+
+    None is returned if there is no such row, or if the new data has no rows in addition to the overlapping ones.
+    """
+
+    current_length = len(next(iter(current.values())))
+    new_length = len(next(iter(new.values())))
+    name = next(iter(new))
+    # only rows whose value in the first column matches the first new value can be the start of the overlap
+    candidates = np.flatnonzero(~changed_rows(current[name], np.repeat(new[name][:1], current_length)))
+    for start in candidates[candidates > 0]:
+        overlap = current_length - start
+        if overlap >= new_length:
+            continue
+        if all(not changed_rows(current[column][start:], new[column][:overlap]).any() for column in new):
+            return start
+    return None
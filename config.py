@@ -1,9 +1,12 @@
+import configparser
 import enum
+import functools
 import logging
 import os
+import tempfile
+import types
 
 from logging.handlers import RotatingFileHandler
-from logging.handlers import SMTPHandler
 
 
 class SSLStatus(enum.Enum):
@@ -13,9 +16,13 @@ class SSLStatus(enum.Enum):
 
 class Config:
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def settings(config_name):
         """Return the settings.
 
+        The settings are computed only once per configuration name and process. Call `Config.settings.cache_clear()` if
+        you need to recompute them after changing environment variables.
+
         Params:
         -------
         config_name: str
@@ -23,8 +30,8 @@ class Config:
 
         Returns:
         --------
-        dict:
-            The settings.
+        mappingproxy:
+            The settings, as a read-only dictionary.
         """
 
         # set environment variables from file
@@ -41,6 +48,41 @@ class Config:
         # database
         database_uri = Config._environment_variable('DATABASE_URI', prefix=prefix, config_name=config_name)
 
+        # database connection pool (the defaults are based on the number of threads per uWSGI process)
+        uwsgi_processes, uwsgi_threads = Config.uwsgi_layout()
+        database_pool_size = int(Config._environment_variable('DATABASE_POOL_SIZE',
+                                                              prefix=prefix,
+                                                              config_name=config_name,
+                                                              required=False,
+                                                              default=uwsgi_threads))
+        database_pool_max_overflow = int(Config._environment_variable('DATABASE_POOL_MAX_OVERFLOW',
+                                                                      prefix=prefix,
+                                                                      config_name=config_name,
+                                                                      required=False,
+                                                                      default=uwsgi_threads))
+        database_pool_recycle = int(Config._environment_variable('DATABASE_POOL_RECYCLE',
+                                                                 prefix=prefix,
+                                                                 config_name=config_name,
+                                                                 required=False,
+                                                                 default=3600))
+        database_pool_timeout = float(Config._environment_variable('DATABASE_POOL_TIMEOUT',
+                                                                   prefix=prefix,
+                                                                   config_name=config_name,
+                                                                   required=False,
+                                                                   default=10))
+        database_pool_pre_ping = int(Config._environment_variable('DATABASE_POOL_PRE_PING',
+                                                                  prefix=prefix,
+                                                                  config_name=config_name,
+                                                                  required=False,
+                                                                  default=1)) != 0
+        database_pool_stats_dir = Config._environment_variable('DATABASE_POOL_STATS_DIR',
+                                                               prefix=prefix,
+                                                               config_name=config_name,
+                                                               required=False,
+                                                               default=os.path.join(tempfile.gettempdir(),
+                                                                                    prefix.lower() + config_name +
+                                                                                    '_db_pool_stats'))
+
         # location of log file
         logging_file_base_path = Config._environment_variable('LOGGING_FILE_BASE_PATH',
                                                               prefix=prefix,
@@ -73,9 +115,9 @@ class Config:
                                                                  config_name=config_name,
                                                                  required=False)
         if logging_mail_to_addresses:
-            to_addresses = logging_mail_to_addresses.split(r'\s*,\s*')
+            to_addresses = tuple(address.strip() for address in logging_mail_to_addresses.split(','))
         else:
-            to_addresses = []
+            to_addresses = ()
 
         # host for sending log emails
         logging_mail_host = Config._environment_variable('LOGGING_MAIL_HOST',
@@ -103,6 +145,250 @@ class Config:
                                                             config_name=config_name,
                                                             required=False)
 
+        # minimum number of seconds between two log emails
+        logging_mail_digest_interval = float(Config._environment_variable('LOGGING_MAIL_DIGEST_INTERVAL',
+                                                                          prefix=prefix,
+                                                                          config_name=config_name,
+                                                                          required=False,
+                                                                          default=300))
+
+        # number of seconds within which an exception is logged only once
+        error_reports_window = float(Config._environment_variable('ERROR_REPORTS_WINDOW',
+                                                                  prefix=prefix,
+                                                                  config_name=config_name,
+                                                                  required=False,
+                                                                  default=60))
+
+        # number of rows fetched from the database at a time for streamed exports
+        export_batch_size = int(Config._environment_variable('EXPORT_BATCH_SIZE',
+                                                             prefix=prefix,
+                                                             config_name=config_name,
+                                                             required=False,
+                                                             default=1000))
+
+        # number of seconds after which cached Bokeh plot components expire
+        plot_cache_timeout = float(Config._environment_variable('PLOT_CACHE_TIMEOUT',
+                                                                prefix=prefix,
+                                                                config_name=config_name,
+                                                                required=False,
+                                                                default=300))
+
+        # maximum total size (in characters) of cached Bokeh plot components
+        plot_cache_max_size = int(Config._environment_variable('PLOT_CACHE_MAX_SIZE',
+                                                               prefix=prefix,
+                                                               config_name=config_name,
+                                                               required=False,
+                                                               default=50 * 1024 * 1024))
+
+        # directory for compiled templates
+        template_bytecode_cache_dir = Config._environment_variable(
+            'TEMPLATE_BYTECODE_CACHE_DIR',
+            prefix=prefix,
+            config_name=config_name,
+            required=False,
+            default=os.path.join(tempfile.gettempdir(), prefix.lower() + config_name + '_jinja_cache'))
+
+        # number of seconds after which cached template fragments expire
+        fragment_cache_timeout = float(Config._environment_variable('FRAGMENT_CACHE_TIMEOUT',
+                                                                    prefix=prefix,
+                                                                    config_name=config_name,
+                                                                    required=False,
+                                                                    default=300))
+
+        # maximum total size (in characters) of cached template fragments
+        fragment_cache_max_size = int(Config._environment_variable('FRAGMENT_CACHE_MAX_SIZE',
+                                                                   prefix=prefix,
+                                                                   config_name=config_name,
+                                                                   required=False,
+                                                                   default=10 * 1024 * 1024))
+
+        # caching of query results (shared by all processes)
+        query_cache_dir = Config._environment_variable('QUERY_CACHE_DIR',
+                                                       prefix=prefix,
+                                                       config_name=config_name,
+                                                       required=False,
+                                                       default=os.path.join(tempfile.gettempdir(),
+                                                                            prefix.lower() + config_name +
+                                                                            '_query_cache'))
+        query_cache_timeout = float(Config._environment_variable('QUERY_CACHE_TIMEOUT',
+                                                                 prefix=prefix,
+                                                                 config_name=config_name,
+                                                                 required=False,
+                                                                 default=300))
+        query_cache_max_size = int(Config._environment_variable('QUERY_CACHE_MAX_SIZE',
+                                                                prefix=prefix,
+                                                                config_name=config_name,
+                                                                required=False,
+                                                                default=1024 * 1024 * 1024))
+
+        # precomputation of expensive datasets (shared by all processes)
+        precompute_dir = Config._environment_variable('PRECOMPUTE_DIR',
+                                                      prefix=prefix,
+                                                      config_name=config_name,
+                                                      required=False,
+                                                      default=os.path.join(tempfile.gettempdir(),
+                                                                           prefix.lower() + config_name +
+                                                                           '_precompute'))
+        precompute_workers = int(Config._environment_variable('PRECOMPUTE_WORKERS',
+                                                              prefix=prefix,
+                                                              config_name=config_name,
+                                                              required=False,
+                                                              default=2))
+
+        # compression of responses (gzip and Brotli)
+        compression_level = int(Config._environment_variable('COMPRESSION_LEVEL',
+                                                             prefix=prefix,
+                                                             config_name=config_name,
+                                                             required=False,
+                                                             default=6))
+        compression_brotli_quality = int(Config._environment_variable('COMPRESSION_BROTLI_QUALITY',
+                                                                      prefix=prefix,
+                                                                      config_name=config_name,
+                                                                      required=False,
+                                                                      default=4))
+        compression_min_size = int(Config._environment_variable('COMPRESSION_MIN_SIZE',
+                                                                prefix=prefix,
+                                                                config_name=config_name,
+                                                                required=False,
+                                                                default=500))
+
+        # server-side sessions (shared by all processes, and only accessible by the user running the site)
+        session_store = Config._environment_variable('SESSION_STORE',
+                                                     prefix=prefix,
+                                                     config_name=config_name,
+                                                     required=False,
+                                                     default='sqlite')
+        session_dir = Config._environment_variable('SESSION_DIR',
+                                                   prefix=prefix,
+                                                   config_name=config_name,
+                                                   required=False,
+                                                   default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                        'sessions',
+                                                                        config_name))
+        session_cache_max_size = int(Config._environment_variable('SESSION_CACHE_MAX_SIZE',
+                                                                  prefix=prefix,
+                                                                  config_name=config_name,
+                                                                  required=False,
+                                                                  default=16 * 1024 * 1024))
+        session_gc_interval = float(Config._environment_variable('SESSION_GC_INTERVAL',
+                                                                 prefix=prefix,
+                                                                 config_name=config_name,
+                                                                 required=False,
+                                                                 default=600))
+
+        # caching of the users loaded by Flask-Login
+        user_cache_timeout = float(Config._environment_variable('USER_CACHE_TIMEOUT',
+                                                                prefix=prefix,
+                                                                config_name=config_name,
+                                                                required=False,
+                                                                default=60))
+        user_cache_max_size = int(Config._environment_variable('USER_CACHE_MAX_SIZE',
+                                                               prefix=prefix,
+                                                               config_name=config_name,
+                                                               required=False,
+                                                               default=1000))
+
+        # concurrency of password verifications (by default, at least half of the server threads remain available for
+        # other requests)
+        password_verification_workers = int(Config._environment_variable('PASSWORD_VERIFICATION_WORKERS',
+                                                                         prefix=prefix,
+                                                                         config_name=config_name,
+                                                                         required=False,
+                                                                         default=1))
+        password_verification_max_pending = int(Config._environment_variable('PASSWORD_VERIFICATION_MAX_PENDING',
+                                                                             prefix=prefix,
+                                                                             config_name=config_name,
+                                                                             required=False,
+                                                                             default=max(1, uwsgi_threads // 2)))
+
+        # heavy work offloaded to bounded thread pools, one per blueprint (by default, at least half of the server
+        # threads remain available for cheap requests, as the total limit applies to all blueprints together)
+        offload_concurrency = int(Config._environment_variable('OFFLOAD_CONCURRENCY',
+                                                               prefix=prefix,
+                                                               config_name=config_name,
+                                                               required=False,
+                                                               default=max(1, uwsgi_threads // 2)))
+        offload_limits = Config._environment_variable('OFFLOAD_LIMITS',
+                                                      prefix=prefix,
+                                                      config_name=config_name,
+                                                      required=False,
+                                                      default='')
+        offload_limits = dict((blueprint.strip(), int(limit)) for blueprint, limit in
+                              (item.split('=') for item in offload_limits.split(',') if item.strip()))
+        offload_total_concurrency = int(Config._environment_variable('OFFLOAD_TOTAL_CONCURRENCY',
+                                                                     prefix=prefix,
+                                                                     config_name=config_name,
+                                                                     required=False,
+                                                                     default=max(1, uwsgi_threads // 2)))
+        offload_timeout = float(Config._environment_variable('OFFLOAD_TIMEOUT',
+                                                             prefix=prefix,
+                                                             config_name=config_name,
+                                                             required=False,
+                                                             default=10))
+
+        # rejection of requests when the server is overloaded (0 disables the respective limit)
+        admission_max_queue_time = float(Config._environment_variable('ADMISSION_MAX_QUEUE_TIME',
+                                                                      prefix=prefix,
+                                                                      config_name=config_name,
+                                                                      required=False,
+                                                                      default=5))
+        admission_max_in_flight = int(Config._environment_variable('ADMISSION_MAX_IN_FLIGHT',
+                                                                   prefix=prefix,
+                                                                   config_name=config_name,
+                                                                   required=False,
+                                                                   default=0))
+        admission_max_latency = float(Config._environment_variable('ADMISSION_MAX_LATENCY',
+                                                                   prefix=prefix,
+                                                                   config_name=config_name,
+                                                                   required=False,
+                                                                   default=10))
+        admission_retry_after = int(Config._environment_variable('ADMISSION_RETRY_AFTER',
+                                                                 prefix=prefix,
+                                                                 config_name=config_name,
+                                                                 required=False,
+                                                                 default=5))
+
+        # embedding of Bokeh server plots
+        bokeh_server_url = Config._environment_variable('BOKEH_SERVER_URL',
+                                                        prefix=prefix,
+                                                        config_name=config_name,
+                                                        required=False)
+        bokeh_server_internal_url = Config._environment_variable('BOKEH_SERVER_INTERNAL_URL',
+                                                                 prefix=prefix,
+                                                                 config_name=config_name,
+                                                                 required=False)
+        bokeh_session_pool_size = int(Config._environment_variable('BOKEH_SESSION_POOL_SIZE',
+                                                                   prefix=prefix,
+                                                                   config_name=config_name,
+                                                                   required=False,
+                                                                   default=0))
+        bokeh_session_max_age = float(Config._environment_variable('BOKEH_SESSION_MAX_AGE',
+                                                                   prefix=prefix,
+                                                                   config_name=config_name,
+                                                                   required=False,
+                                                                   default=10))
+
+        # IP addresses from which the internal routes may be accessed
+        internal_allowed_addresses = Config._environment_variable('INTERNAL_ALLOWED_ADDRESSES',
+                                                                  prefix=prefix,
+                                                                  config_name=config_name,
+                                                                  required=False,
+                                                                  default='127.0.0.1, ::1')
+        internal_allowed_addresses = tuple(address.strip() for address in internal_allowed_addresses.split(','))
+
+        # recording of request metrics
+        metrics_enabled = int(Config._environment_variable('METRICS_ENABLED',
+                                                           prefix=prefix,
+                                                           config_name=config_name,
+                                                           required=False,
+                                                           default=1)) != 0
+        metrics_dir = Config._environment_variable('METRICS_DIR',
+                                                   prefix=prefix,
+                                                   config_name=config_name,
+                                                   required=False,
+                                                   default=os.path.join(tempfile.gettempdir(),
+                                                                        prefix.lower() + config_name + '_metrics'))
+
         # disable SSL?
         try:
             ssl_status = SSLStatus.ENABLED if int(os.environ.get(prefix + 'SSL_ENABLED')) != 0 else SSLStatus.DISABLED
@@ -114,29 +400,78 @@ class Config:
         flyway_command = os.environ.get(prefix + 'DB_MIGRATION_FLYWAY_COMMAND', 'flyway')
         migration_sql_dir = os.environ.get(prefix + 'DB_MIGRATION_SQL_DIR', 'db_migrations')
 
+        # port of the Bokeh server (as used for deploying the site)
+        bokeh_server_port = int(os.environ.get(prefix + 'DEPLOY_BOKEH_SERVER_PORT', 5100))
+
         # enable logging?
         with_logging = int(os.environ.get(prefix + 'WITH_LOGGING', True)) != 0
 
-        return dict(
+        return types.MappingProxyType(dict(
+            admission_max_in_flight=admission_max_in_flight,
+            admission_max_latency=admission_max_latency,
+            admission_max_queue_time=admission_max_queue_time,
+            admission_retry_after=admission_retry_after,
+            bokeh_server_internal_url=bokeh_server_internal_url,
+            bokeh_server_port=bokeh_server_port,
+            bokeh_server_url=bokeh_server_url,
+            bokeh_session_max_age=bokeh_session_max_age,
+            bokeh_session_pool_size=bokeh_session_pool_size,
+            compression_brotli_quality=compression_brotli_quality,
+            compression_level=compression_level,
+            compression_min_size=compression_min_size,
+            database_pool_max_overflow=database_pool_max_overflow,
+            database_pool_pre_ping=database_pool_pre_ping,
+            database_pool_recycle=database_pool_recycle,
+            database_pool_size=database_pool_size,
+            database_pool_stats_dir=database_pool_stats_dir,
+            database_pool_timeout=database_pool_timeout,
             database_uri=database_uri,
+            error_reports_window=error_reports_window,
+            export_batch_size=export_batch_size,
             flyway_command=flyway_command,
+            fragment_cache_max_size=fragment_cache_max_size,
+            fragment_cache_timeout=fragment_cache_timeout,
+            internal_allowed_addresses=internal_allowed_addresses,
             logging_file_base_path=logging_file_base_path,
             logging_file_logging_level=logging_file_logging_level,
             logging_file_logging_level_name=logging_file_logging_level_name,
             logging_file_max_bytes=logging_file_max_bytes,
             logging_file_backup_count=logging_file_backup_count,
+            logging_mail_digest_interval=logging_mail_digest_interval,
             logging_mail_from_address=logging_mail_from_address,
             logging_mail_host=logging_mail_host,
             logging_mail_logging_level=logging_mail_logging_level,
             logging_mail_logging_level_name=logging_mail_logging_level_name,
             logging_mail_subject=logging_mail_subject,
             logging_mail_to_addresses=to_addresses,
+            metrics_dir=metrics_dir,
+            metrics_enabled=metrics_enabled,
             migration_sql_dir=migration_sql_dir,
             migration_tool=migration_tool,
+            offload_concurrency=offload_concurrency,
+            offload_limits=types.MappingProxyType(offload_limits),
+            offload_timeout=offload_timeout,
+            offload_total_concurrency=offload_total_concurrency,
+            password_verification_max_pending=password_verification_max_pending,
+            password_verification_workers=password_verification_workers,
+            plot_cache_max_size=plot_cache_max_size,
+            plot_cache_timeout=plot_cache_timeout,
+            precompute_dir=precompute_dir,
+            precompute_workers=precompute_workers,
+            query_cache_dir=query_cache_dir,
+            query_cache_max_size=query_cache_max_size,
+            query_cache_timeout=query_cache_timeout,
             secret_key=secret_key,
+            session_cache_max_size=session_cache_max_size,
+            session_dir=session_dir,
+            session_gc_interval=session_gc_interval,
+            session_store=session_store,
+            template_bytecode_cache_dir=template_bytecode_cache_dir,
+            user_cache_max_size=user_cache_max_size,
+            user_cache_timeout=user_cache_timeout,
             ssl_status=ssl_status,
             with_logging=with_logging
-        )
+        ))
 
     @staticmethod
     def _set_environment_variables_from_file(env_var_file):
@@ -203,9 +538,12 @@ class Config:
         return variable_value
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def environment_variable_prefix():
         """Get the prefix to use for the environment variables.
 
+        The prefix is read from file only once per process.
+
         Returns:
         --------
         str
@@ -222,6 +560,25 @@ class Config:
                       "will be ignored."
             raise IOError(message)
 
+    @staticmethod
+    def uwsgi_layout():
+        """Get the number of processes and threads per process used by uWSGI.
+
+        The numbers are read from the root level file `uwsgi.ini`. A single process or thread is assumed if the
+        respective setting is missing.
+
+        Returns:
+        --------
+        tuple
+            The number of processes and the number of threads per process.
+        """
+
+        parser = configparser.ConfigParser(strict=False, interpolation=None)
+        parser.read(os.path.join(os.path.dirname(__file__), 'uwsgi.ini'))
+        processes = parser.getint('uwsgi', 'processes', fallback=1)
+        threads = parser.getint('uwsgi', 'threads', fallback=1)
+        return processes, threads
+
     @staticmethod
     def _logging_level(name):
         """Return the logging level for a given name.
@@ -277,18 +634,95 @@ class Config:
             file_handler.setLevel(settings['logging_file_logging_level'])
             app.logger.addHandler(file_handler)
 
-            # logging to email
+            # logging to email (the emails are sent as digests from a background thread, so that logging doesn't block)
             if settings['logging_mail_host'] and settings['logging_mail_to_addresses']:
-                smtp_handler = SMTPHandler(mailhost=settings['logging_mail_host'],
-                                           fromaddr=settings['logging_mail_from_address'],
-                                           toaddrs=settings['logging_mail_to_addresses'],
-                                           subject=settings['logging_mail_subject'])
-                smtp_handler.setLevel(settings['logging_mail_logging_level'])
-                app.logger.addHandler(smtp_handler)
+                from app.error_reports import DigestMailHandler
+                mail_handler = DigestMailHandler(mailhost=settings['logging_mail_host'],
+                                                 fromaddr=settings['logging_mail_from_address'],
+                                                 toaddrs=settings['logging_mail_to_addresses'],
+                                                 subject=settings['logging_mail_subject'],
+                                                 interval=settings['logging_mail_digest_interval'])
+                mail_handler.setLevel(settings['logging_mail_logging_level'])
+                app.logger.addHandler(mail_handler)
+
+        # logging of repeated exceptions
+        app.config['ERROR_REPORTS_WINDOW'] = settings['error_reports_window']
+
+        # streamed exports
+        app.config['EXPORT_BATCH_SIZE'] = settings['export_batch_size']
 
         # database access
         app.config['SQLALCHEMY_DATABASE_URI'] = settings['database_uri']
 
+        # database connection pool (not used for SQLite, see app.db_pool.SQLAlchemy)
+        app.config['DATABASE_POOL_SIZE'] = settings['database_pool_size']
+        app.config['DATABASE_POOL_MAX_OVERFLOW'] = settings['database_pool_max_overflow']
+        app.config['DATABASE_POOL_RECYCLE'] = settings['database_pool_recycle']
+        app.config['DATABASE_POOL_TIMEOUT'] = settings['database_pool_timeout']
+        app.config['DATABASE_POOL_PRE_PING'] = settings['database_pool_pre_ping']
+        app.config['DATABASE_POOL_STATS_DIR'] = settings['database_pool_stats_dir']
+
+        # request metrics
+        app.config['METRICS_ENABLED'] = settings['metrics_enabled']
+        app.config['METRICS_DIR'] = settings['metrics_dir']
+
+        # access to internal routes
+        app.config['INTERNAL_ALLOWED_ADDRESSES'] = settings['internal_allowed_addresses']
+
+        # caching of Bokeh plot components
+        app.config['PLOT_CACHE_TIMEOUT'] = settings['plot_cache_timeout']
+        app.config['PLOT_CACHE_MAX_SIZE'] = settings['plot_cache_max_size']
+
+        # embedding of Bokeh server plots
+        app.config['BOKEH_SERVER_URL'] = settings['bokeh_server_url']
+        app.config['BOKEH_SERVER_INTERNAL_URL'] = settings['bokeh_server_internal_url']
+        app.config['BOKEH_SERVER_PORT'] = settings['bokeh_server_port']
+        app.config['BOKEH_SESSION_POOL_SIZE'] = settings['bokeh_session_pool_size']
+        app.config['BOKEH_SESSION_MAX_AGE'] = settings['bokeh_session_max_age']
+
+        # caching of query results
+        app.config['QUERY_CACHE_DIR'] = settings['query_cache_dir']
+        app.config['QUERY_CACHE_TIMEOUT'] = settings['query_cache_timeout']
+        app.config['QUERY_CACHE_MAX_SIZE'] = settings['query_cache_max_size']
+
+        # precomputation of expensive datasets
+        app.config['PRECOMPUTE_DIR'] = settings['precompute_dir']
+        app.config['PRECOMPUTE_WORKERS'] = settings['precompute_workers']
+
+        # compression of responses
+        app.config['COMPRESSION_LEVEL'] = settings['compression_level']
+        app.config['COMPRESSION_BROTLI_QUALITY'] = settings['compression_brotli_quality']
+        app.config['COMPRESSION_MIN_SIZE'] = settings['compression_min_size']
+
+        # caching of compiled templates and rendered template fragments
+        app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = settings['template_bytecode_cache_dir']
+        app.config['FRAGMENT_CACHE_TIMEOUT'] = settings['fragment_cache_timeout']
+        app.config['FRAGMENT_CACHE_MAX_SIZE'] = settings['fragment_cache_max_size']
+
+        # server-side sessions
+        app.config['SESSION_STORE'] = settings['session_store']
+        app.config['SESSION_DIR'] = settings['session_dir']
+        app.config['SESSION_CACHE_MAX_SIZE'] = settings['session_cache_max_size']
+        app.config['SESSION_GC_INTERVAL'] = settings['session_gc_interval']
+
+        # caching of users and concurrency of password verifications
+        app.config['USER_CACHE_TIMEOUT'] = settings['user_cache_timeout']
+        app.config['USER_CACHE_MAX_SIZE'] = settings['user_cache_max_size']
+        app.config['PASSWORD_VERIFICATION_WORKERS'] = settings['password_verification_workers']
+        app.config['PASSWORD_VERIFICATION_MAX_PENDING'] = settings['password_verification_max_pending']
+
+        # offloading of heavy work
+        app.config['OFFLOAD_CONCURRENCY'] = settings['offload_concurrency']
+        app.config['OFFLOAD_LIMITS'] = dict(settings['offload_limits'])
+        app.config['OFFLOAD_TIMEOUT'] = settings['offload_timeout']
+        app.config['OFFLOAD_TOTAL_CONCURRENCY'] = settings['offload_total_concurrency']
+
+        # rejection of requests when the server is overloaded
+        app.config['ADMISSION_MAX_QUEUE_TIME'] = settings['admission_max_queue_time']
+        app.config['ADMISSION_MAX_IN_FLIGHT'] = settings['admission_max_in_flight']
+        app.config['ADMISSION_MAX_LATENCY'] = settings['admission_max_latency']
+        app.config['ADMISSION_RETRY_AFTER'] = settings['admission_retry_after']
+
         # use SSL?
         app.config['SSL_STATUS'] = False  # settings['ssl_status']
 
@@ -1,3 +1,4 @@
+import json
 import os
 import subprocess
 import sys
@@ -24,7 +25,10 @@ app_dir_name = os.environ[prefix + 'DEPLOY_APP_DIR_NAME']
 web_user = os.environ.get(prefix + 'DEPLOY_WEB_USER', 'www-data')
 web_user_group = os.environ.get(prefix + 'DEPLOY_WEB_USER_GROUP', 'www-data')
 domain_name = os.environ.get(prefix + 'DEPLOY_DOMAIN_NAME', host)
-bokeh_server_port = os.environ.get(prefix + 'DEPLOY_BOKEH_SERVER_PORT', 5100)
+bokeh_server_port = int(os.environ.get(prefix + 'DEPLOY_BOKEH_SERVER_PORT', 5100))
+bokeh_server_processes = int(os.environ.get(prefix + 'DEPLOY_BOKEH_SERVER_PROCESSES', 2))
+uwsgi_preload = int(os.environ.get(prefix + 'DEPLOY_UWSGI_PRELOAD', 0)) != 0
+uwsgi_reload_on_rss = int(os.environ.get(prefix + 'DEPLOY_UWSGI_RELOAD_ON_RSS', 512))
 migration_tool = settings['migration_tool']
 migration_sql_dir = settings['migration_sql_dir']
 
@@ -53,7 +57,30 @@ def upgrade_libs():
     sudo('apt-get upgrade')
 
 
-def update_supervisor():
+def _bokeh_worker_ports():
+    """Get the ports of the Bokeh server processes.
+
+    nginx listens on the Bokeh server port and passes requests on to the Bokeh server processes, which listen on the
+    subsequent ports.
+
+    Returns:
+    --------
+    list of int
+        The ports.
+    """
+    return [bokeh_server_port + i + 1 for i in range(bokeh_server_processes)]
+
+
+def update_supervisor(restart=True):
+    """Update the Supervisor configuration.
+
+    Params:
+    -------
+    restart: bool
+        Restart Supervisor and thus all its programs. Otherwise only the programs whose configuration has changed are
+        restarted.
+    """
+
     # Python files to load into the Bokeh server
     files = [f for f in os.listdir('bokeh_server') if f.lower().endswith('.py')]
 
@@ -61,29 +88,53 @@ def update_supervisor():
     sed = 'sed -e" s=---SITE_PATH---={site_dir}=g"' \
           '    -e "s=---WEB_USER---={web_user}=g"' \
           '    -e "s=---HOST---={host}=g"' \
+          '    -e "s=---UWSGI_INI---={uwsgi_ini}=g"' \
+          '    -e "s=---UWSGI_RELOAD_ON_RSS---={uwsgi_reload_on_rss}=g"' \
           '    -e "s=---BOKEH_SERVER_PORT---={bokeh_server_port}=g"' \
+          '    -e "s=---BOKEH_SERVER_PROCESSES---={bokeh_server_processes}=g"' \
+          '    -e "s=---BOKEH_WORKER_PORT_START---={bokeh_worker_port_start}=g"' \
           '    -e "s=---FILES---={files}=g"' \
           '    {site_dir}/supervisor.conf '.format(
         site_dir=site_dir,
         web_user=web_user,
         host=domain_name,
+        uwsgi_ini='uwsgi-preload.ini' if uwsgi_preload else 'uwsgi.ini',
+        uwsgi_reload_on_rss=uwsgi_reload_on_rss,
         bokeh_server_port=bokeh_server_port,
+        bokeh_server_processes=bokeh_server_processes,
+        bokeh_worker_port_start=_bokeh_worker_ports()[0],
         files=' '.join(files))
     sudo('{sed} > /etc/supervisor/conf.d/{domain_name}.conf'.format(
         sed=sed,
         domain_name=domain_name))
-    sudo('service supervisor restart')
+    if restart:
+        sudo('service supervisor restart')
+    else:
+        # only programs whose configuration has changed are restarted
+        sudo('supervisorctl reread')
+        sudo('supervisorctl update')
 
 
 def update_nginx_conf():
     static_dir = site_dir + '/app/static'
-    sudo('sed s=---DOMAIN_NAME---={domain_name}= {site_dir}/nginx.conf | sed s=---STATIC_DIR---={static_dir}= '
-         '> /etc/nginx/sites-available/{domain_name}'.format(domain_name=domain_name,
-                                                             site_dir=site_dir,
-                                                             static_dir=static_dir))
+    # one upstream server per Bokeh server process (sed turns the escaped newlines into line breaks)
+    bokeh_upstream_servers = '\\n'.join('  server 127.0.0.1:{port};'.format(port=port)
+                                         for port in _bokeh_worker_ports())
+    sudo('sed -e "s=---DOMAIN_NAME---={domain_name}=g"'
+         '    -e "s=---STATIC_DIR---={static_dir}=g"'
+         '    -e "s=---BOKEH_SERVER_PORT---={bokeh_server_port}=g"'
+         '    -e "s=---BOKEH_UPSTREAM_SERVERS---={bokeh_upstream_servers}=g"'
+         '    {site_dir}/nginx.conf > /etc/nginx/sites-available/{domain_name}'.format(
+             domain_name=domain_name,
+             site_dir=site_dir,
+             static_dir=static_dir,
+             bokeh_server_port=bokeh_server_port,
+             bokeh_upstream_servers=bokeh_upstream_servers))
     sudo('ln -sf /etc/nginx/sites-available/{domain_name} /etc/nginx/sites-enabled/{domain_name}'.format(
         domain_name=domain_name))
-    sudo('service nginx restart')
+    # reloading lets the running nginx workers finish their requests
+    sudo('nginx -t')
+    sudo('service nginx reload')
 
 
 def update_environment_variables_file():
@@ -93,17 +144,57 @@ def update_environment_variables_file():
     """
     settings = Config.settings('production')
     environment_variables = dict(
+        ADMISSION_MAX_IN_FLIGHT=settings['admission_max_in_flight'],
+        ADMISSION_MAX_LATENCY=settings['admission_max_latency'],
+        ADMISSION_MAX_QUEUE_TIME=settings['admission_max_queue_time'],
+        ADMISSION_RETRY_AFTER=settings['admission_retry_after'],
+        BOKEH_SERVER_INTERNAL_URL=settings['bokeh_server_internal_url'] or '',
+        BOKEH_SERVER_URL=settings['bokeh_server_url'] or '',
+        BOKEH_SESSION_MAX_AGE=settings['bokeh_session_max_age'],
+        BOKEH_SESSION_POOL_SIZE=settings['bokeh_session_pool_size'],
+        COMPRESSION_BROTLI_QUALITY=settings['compression_brotli_quality'],
+        COMPRESSION_LEVEL=settings['compression_level'],
+        COMPRESSION_MIN_SIZE=settings['compression_min_size'],
+        DATABASE_POOL_MAX_OVERFLOW=settings['database_pool_max_overflow'],
+        DATABASE_POOL_PRE_PING=int(settings['database_pool_pre_ping']),
+        DATABASE_POOL_RECYCLE=settings['database_pool_recycle'],
+        DATABASE_POOL_SIZE=settings['database_pool_size'],
+        DATABASE_POOL_TIMEOUT=settings['database_pool_timeout'],
         DATABASE_URI=settings['database_uri'],
+        ERROR_REPORTS_WINDOW=settings['error_reports_window'],
+        EXPORT_BATCH_SIZE=settings['export_batch_size'],
+        FRAGMENT_CACHE_MAX_SIZE=settings['fragment_cache_max_size'],
+        FRAGMENT_CACHE_TIMEOUT=settings['fragment_cache_timeout'],
+        INTERNAL_ALLOWED_ADDRESSES=', '.join(settings['internal_allowed_addresses']),
         LOGGING_FILE_BASE_PATH=settings['logging_file_base_path'],
         LOGGING_FILE_LOGGING_LEVEL=settings['logging_file_logging_level_name'],
         LOGGING_FILE_MAX_BYTES=settings['logging_file_max_bytes'],
         LOGGING_FILE_BACKUP_COUNT=settings['logging_file_backup_count'],
+        LOGGING_MAIL_DIGEST_INTERVAL=settings['logging_mail_digest_interval'],
         LOGGING_MAIL_FROM_ADDRESS=settings['logging_mail_from_address'],
         LOGGING_MAIL_LOGGING_LEVEL=settings['logging_mail_logging_level_name'],
         LOGGING_MAIL_SUBJECT=settings['logging_mail_subject'],
-        LOGGING_MAIL_TO_ADDRESSES=settings['logging_mail_to_addresses'],
+        LOGGING_MAIL_TO_ADDRESSES=', '.join(settings['logging_mail_to_addresses']),
+        METRICS_ENABLED=int(settings['metrics_enabled']),
+        OFFLOAD_CONCURRENCY=settings['offload_concurrency'],
+        OFFLOAD_LIMITS=', '.join('{0}={1}'.format(blueprint, limit)
+                                 for blueprint, limit in sorted(settings['offload_limits'].items())),
+        OFFLOAD_TIMEOUT=settings['offload_timeout'],
+        OFFLOAD_TOTAL_CONCURRENCY=settings['offload_total_concurrency'],
+        PASSWORD_VERIFICATION_MAX_PENDING=settings['password_verification_max_pending'],
+        PASSWORD_VERIFICATION_WORKERS=settings['password_verification_workers'],
+        PLOT_CACHE_MAX_SIZE=settings['plot_cache_max_size'],
+        PLOT_CACHE_TIMEOUT=settings['plot_cache_timeout'],
+        PRECOMPUTE_WORKERS=settings['precompute_workers'],
+        QUERY_CACHE_MAX_SIZE=settings['query_cache_max_size'],
+        QUERY_CACHE_TIMEOUT=settings['query_cache_timeout'],
         SECRET_KEY=settings['secret_key'],
-        SSL_STATUS=settings['ssl_status']
+        SESSION_CACHE_MAX_SIZE=settings['session_cache_max_size'],
+        SESSION_GC_INTERVAL=settings['session_gc_interval'],
+        SESSION_STORE=settings['session_store'],
+        SSL_STATUS=settings['ssl_status'],
+        USER_CACHE_MAX_SIZE=settings['user_cache_max_size'],
+        USER_CACHE_TIMEOUT=settings['user_cache_timeout']
     )
     file_content = ''
     keys = sorted(environment_variables.keys())
@@ -167,21 +258,13 @@ def update_log_dir():
 
 
 def update_webassets():
-    # remove bundle and cache directories
+    # the bundle and cache directories are kept, so that only bundles whose input has changed are built
     static_dir = site_dir + '/app/static'
     webassets_cache = static_dir + '/.webassets-cache'
     cache = static_dir + '/cache'
-    run('if [[ -d {cache} ]]\n'
-        'then\n'
-        '    rm -r {cache}\n'
-        'fi'.format(cache=cache))
-    sudo('if [[ -d {webassets_cache} ]]\n'
-         'then\n'
-         '    rm -r {webassets_cache}\n'
-         'fi'.format(webassets_cache=webassets_cache))
 
     # create bundles (must be run as root, as the deploy user doesn't own the error log)
-    sudo('cd {site_dir}; export FLASK_APP=run_server.py; export FLASK_CONFIG=production; venv/bin/flask assets build'
+    sudo('cd {site_dir}; export FLASK_APP=site_app.py; export FLASK_CONFIG=production; venv/bin/flask bundles build'
          .format(site_dir=site_dir))
 
     # make deploy user owner of the bundle directory
@@ -205,6 +288,114 @@ def update_python_packages():
         .format(site_dir=site_dir))
 
 
+def preload_code():
+    """Compile the new code and check that the app can be created before any server process is reloaded.
+
+    Importing `wsgi.py` creates the app and runs its health check (see `app.health.warm_up`), so that broken code or
+    configuration fails the deployment while the old code is still being served. A database which can't be reached
+    doesn't fail the deployment, but is reported when the workers are reloaded.
+    """
+
+    run('cd {site_dir}; venv/bin/python -m compileall -q app bokeh_server config.py site_app.py wsgi.py'
+        .format(site_dir=site_dir))
+
+    # the app is created as the web user, as it may create files (such as the log file) which the server must own
+    sudo('cd {site_dir}; venv/bin/python -c "import wsgi"'.format(site_dir=site_dir), user=web_user)
+
+
+def _wait_until_ready(url, timeout=120):
+    """Wait until a URL on the remote server returns a success status.
+
+    Params:
+    -------
+    url: str
+        URL.
+    timeout: float
+        Maximum number of seconds to wait.
+    """
+
+    run('for i in $(seq {attempts})\n'
+        'do\n'
+        '    curl --silent --fail --output /dev/null {url} && exit 0\n'
+        '    sleep 1\n'
+        'done\n'
+        'echo "{url} isn\'t ready" >&2\n'
+        'exit 1'.format(attempts=int(timeout), url=url))
+
+
+def reload_website(timeout=300):
+    """Reload the uWSGI workers one after the other.
+
+    Touching the reload file makes the uWSGI master reload its workers in turn (see `touch-chain-reload` in
+    `uwsgi.ini`). A worker is only replaced once the previous one has loaded the new code and passed the health check,
+    and the remaining workers handle the requests in the meantime. In preload mode (`DEPLOY_UWSGI_PRELOAD`) the master
+    itself is reloaded gracefully instead (see `uwsgi-preload.ini`), as the workers are forked from it; requests wait
+    in the socket's queue while it loads the new code. This function returns once the health check route has been
+    served by as many new workers as there are processes in `uwsgi.ini`. Workers whose health checks are failing (for
+    example because the database can't be reached) still serve the other pages, and they are reported.
+
+    Params:
+    -------
+    timeout: float
+        Maximum number of seconds to wait for the reload to finish.
+    """
+
+    processes = Config.uwsgi_layout()[0]
+    touched = float(run('date +%s'))
+    run('touch {site_dir}/{reload_file}'.format(site_dir=site_dir,
+                                                reload_file='uwsgi-preload.reload' if uwsgi_preload else 'uwsgi.reload'))
+
+    reloaded = set()
+    failing = dict()
+    deadline = time.time() + timeout
+    while len(reloaded) < processes:
+        if time.time() > deadline:
+            print('Only {count} of {processes} uWSGI workers have been reloaded.'.format(count=len(reloaded),
+                                                                                        processes=processes))
+            sys.exit(1)
+        output = run('curl --silent --header "Host: {domain_name}" http://127.0.0.1/health'
+                     .format(domain_name=domain_name), warn_only=True, quiet=True)
+        try:
+            status = json.loads(output)
+            if status['started'] >= touched:
+                reloaded.add(status['pid'])
+                if status['status'] != 'ok':
+                    failing[status['pid']] = status['checks']
+        except (ValueError, KeyError):
+            pass
+        time.sleep(0.5)
+
+    for pid, checks in sorted(failing.items()):
+        print('The health check of the uWSGI worker {pid} is failing: {checks}'.format(pid=pid, checks=checks))
+
+
+def restart_bokeh_servers(stagger=5):
+    """Restart the Bokeh server processes one at a time.
+
+    Each process is only restarted once the previous one accepts requests again. While a process is restarting, nginx
+    passes new requests to the other processes.
+
+    Params:
+    -------
+    stagger: float
+        Number of seconds to wait between restarts.
+    """
+
+    for port in _bokeh_worker_ports():
+        sudo('supervisorctl restart bokeh_server:bokeh_server_{port}'.format(port=port))
+        _wait_until_ready('http://127.0.0.1:{port}/'.format(port=port))
+        time.sleep(stagger)
+
+
+def rolling_reload():
+    """Load the new code into all server processes without downtime."""
+
+    preload_code()
+    reload_website()
+    sudo('supervisorctl restart precompute')
+    restart_bokeh_servers()
+
+
 if __name__ == '__main__':
     def deploy(with_setting_up=False):
         """Deploy the site to the remote server.
@@ -288,14 +479,17 @@ if __name__ == '__main__':
         update_webassets()
 
         # setup Supervisor
-        update_supervisor()
+        update_supervisor(restart=with_setting_up)
 
         # setup Nginx
         update_nginx_conf()
 
-        # yes, all should be working now - but it seems that existing Supervisor jobs might not have been killed
-        # hence we rather do a full reboot..
-        reboot()
+        if with_setting_up:
+            # yes, all should be working now - but it seems that existing Supervisor jobs might not have been killed
+            # hence we rather do a full reboot..
+            reboot()
+        else:
+            rolling_reload()
 
 
 def setup():
@@ -1,15 +1,66 @@
 #!/bin/bash
 
+# usage: ./run_tests.sh [--benchmark [test-client|uwsgi]]
+# with the --benchmark option the HTTP benchmark is run as well (in test client mode by default)
+BENCHMARK_MODE=
+if [[ $1 == '--benchmark' ]]
+then
+    BENCHMARK_MODE=${2:-test-client}
+fi
+
+# number of test processes run at the same time (by default the number of CPUs); every unit test module and every
+# feature file is run in its own process, unless this is 1
+JOBS=${TEST_JOBS:-$(getconf _NPROCESSORS_ONLN)}
+
+LOG_DIR=$(mktemp -d)
+trap 'rm -rf "$LOG_DIR"' EXIT
+
+# usage: run_in_parallel COMMAND FILE...
+# runs the command for every file in a separate process (at most $JOBS at a time) and shows the output of the failed
+# processes; the return status is non-zero if any process has failed
+run_in_parallel() {
+    local command=$1
+    shift
+    printf '%s\n' "$@" | xargs -P "$JOBS" -I {} sh -c \
+        'log="$0/$(echo "$2" | tr / _).log"; $1 "$2" > "$log" 2>&1 || touch "$log.failed"' "$LOG_DIR" "$command" {}
+
+    local status=0
+    local file
+    for file in "$@"
+    do
+        local log="$LOG_DIR/$(echo "$file" | tr / _).log"
+        if [[ -e $log.failed ]]
+        then
+            status=1
+            echo "FAILED: $file"
+            cat "$log"
+        else
+            echo "ok: $file"
+        fi
+    done
+    return $status
+}
+
 ERROR=0
 
-python -m unittest discover tests/unittests
+if [[ $JOBS -gt 1 ]]
+then
+    run_in_parallel 'python -m unittest' tests/unittests/test_*.py
+else
+    python -m unittest discover tests/unittests
+fi
 if [[ $? != 0 ]]
 then
     ERROR=1
     echo 'Unit tests did NOT pass!' >&2
 fi
 
-python -m behave tests/features
+if [[ $JOBS -gt 1 ]]
+then
+    run_in_parallel 'python -m behave' tests/features/*.feature
+else
+    python -m behave tests/features
+fi
 if [[ $? != 0 ]]
 then
     ERROR=1
@@ -23,4 +74,14 @@ then
     echo 'PEP8 tests did NOT pass!' >&2
 fi
 
+if [[ -n $BENCHMARK_MODE ]]
+then
+    python -m tests.benchmarks.http_routes --mode $BENCHMARK_MODE ${BENCHMARK_OPTIONS}
+    if [[ $? != 0 ]]
+    then
+        ERROR=1
+        echo 'HTTP benchmark did NOT pass!' >&2
+    fi
+fi
+
 exit $ERROR
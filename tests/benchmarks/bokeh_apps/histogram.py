@@ -0,0 +1,45 @@
+import numpy as np
+
+from bokeh.io import curdoc
+from bokeh.models import ColumnDataSource
+from bokeh.models.widgets import Slider
+from bokeh.plotting import figure
+
+# ----------------------------------------------------------------------------------
+#
+# Example app for the Bokeh server load test (see tests/benchmarks/bokeh_sessions.py).
+#
+# ----------------------------------------------------------------------------------
+
+# number of random points from which the histogram is calculated
+NUM_POINTS = 200000
+
+# number of histogram bins
+NUM_BINS = 50
+
+standard_deviation_slider = Slider(title='standard deviation', value=1, start=0.1, end=4, step=0.1,
+                                   name='standard_deviation')
+
+source = ColumnDataSource(data=dict(left=[], right=[], count=[]), name='histogram')
+
+
+def update_histogram(attr, old, new):
+    """Update the histogram for the current standard deviation.
+
+    Calculating the histogram takes a few milliseconds of CPU time, so that the callback behaves like a plot which
+    queries and processes data.
+    """
+
+    points = np.random.normal(0, standard_deviation_slider.value, NUM_POINTS)
+    counts, edges = np.histogram(points, bins=NUM_BINS, range=(-10, 10))
+    source.data = dict(left=edges[:-1].tolist(), right=edges[1:].tolist(), count=counts.tolist())
+
+
+standard_deviation_slider.on_change('value', update_histogram)
+update_histogram('value', None, standard_deviation_slider.value)
+
+p = figure(title='Histogram', x_range=(-10, 10))
+p.quad(source=source, left='left', right='right', bottom=0, top='count')
+
+curdoc().add_root(standard_deviation_slider)
+curdoc().add_root(p)
@@ -0,0 +1,137 @@
+"""Benchmark delta updates of Bokeh column data sources.
+
+Typical callbacks of a Bokeh server app are run for a column data source, once by replacing whole columns with values
+computed in a Python loop (as in the original Gaussian example in docs/bokeh.md) and once with vectorised computations
+and the `update_source` function of `bokeh_server.helpers.deltas`, which streams or patches the source if possible.
+
+For every callback the number of bytes of the messages which the Bokeh server would send to the browser and the time
+taken by the callback (including the serialisation of these messages) are reported.
+
+Run the benchmark from the root folder of the site:
+
+    python -m tests.benchmarks.bokeh_deltas --points 10000
+"""
+
+import argparse
+import math
+import statistics
+import time
+
+import numpy as np
+
+from bokeh.document import Document
+from bokeh.models import ColumnDataSource
+from bokeh.protocol import Protocol
+
+from bokeh_server.helpers.deltas import update_source
+
+
+def message_size(protocol, event):
+    """Get the number of bytes of the message sent to the browser for a document change."""
+
+    message = protocol.create('PATCH-DOC', [event])
+    size = len(message.header_json) + len(message.metadata_json) + len(message.content_json)
+    for buffer in message.buffers:
+        # buffers are (header, payload) pairs in older Bokeh versions
+        size += len(buffer.to_bytes() if hasattr(buffer, 'to_bytes') else buffer[1])
+    return size
+
+
+def measure(name, data, callback, repeat):
+    """Run a callback for a new source with the given data and return its median time and message size."""
+
+    try:
+        protocol = Protocol()
+    except TypeError:
+        protocol = Protocol('1.0')
+
+    times = []
+    sizes = []
+    for i in range(repeat):
+        source = ColumnDataSource(data={key: np.array(values) for key, values in data.items()})
+        document = Document()
+        document.add_root(source)
+        events = []
+        document.on_change(events.append)
+
+        start = time.perf_counter()
+        callback(source, i)
+        size = sum(message_size(protocol, event) for event in events)
+        times.append(time.perf_counter() - start)
+        sizes.append(size)
+
+    return name, statistics.median(times), statistics.median(sizes)
+
+
+def cutoff_replace(source, i):
+    cutoff = 2 + 0.01 * (i + 1)
+    x = source.data['x']
+    y = source.data['y']
+    source.data['alpha'] = [1 if math.sqrt(x[j] ** 2 + y[j] ** 2) <= cutoff else 0.1 for j in range(len(x))]
+
+
+def cutoff_delta(source, i):
+    cutoff = 2 + 0.01 * (i + 1)
+    x = source.data['x']
+    y = source.data['y']
+    update_source(source, dict(x=x, y=y, alpha=np.where(np.hypot(x, y) <= cutoff, 1.0, 0.1)))
+
+
+def append_replace(source, i):
+    t = source.data['t']
+    new_t = np.arange(len(t), len(t) + 100, dtype=float)
+    source.data = dict(t=np.concatenate([t, new_t]), value=np.concatenate([source.data['value'], np.sin(new_t)]))
+
+
+def append_delta(source, i):
+    t = source.data['t']
+    new_t = np.arange(len(t), len(t) + 100, dtype=float)
+    update_source(source, dict(t=np.concatenate([t, new_t]), value=np.concatenate([source.data['value'],
+                                                                                   np.sin(new_t)])))
+
+
+def window_replace(source, i):
+    t = np.asarray(source.data['t'])
+    new_t = np.arange(t[-1] + 1, t[-1] + 101)
+    source.data = dict(t=np.concatenate([t[100:], new_t]),
+                       value=np.concatenate([np.asarray(source.data['value'])[100:], np.sin(new_t)]))
+
+
+def window_delta(source, i):
+    t = np.asarray(source.data['t'])
+    new_t = np.arange(t[-1] + 1, t[-1] + 101)
+    update_source(source,
+                  dict(t=np.concatenate([t[100:], new_t]),
+                       value=np.concatenate([np.asarray(source.data['value'])[100:], np.sin(new_t)])),
+                  rollover=len(t))
+
+
+def run(points, repeat):
+    np.random.seed(0)
+    x = np.random.normal(0, 2, points)
+    y = np.random.normal(0, 2, points)
+    gaussian = dict(x=x, y=y, alpha=np.where(np.hypot(x, y) <= 2, 1.0, 0.1))
+    t = np.arange(points, dtype=float)
+    series = dict(t=t, value=np.sin(t))
+
+    results = [
+        measure('cutoff change, replace', gaussian, cutoff_replace, repeat),
+        measure('cutoff change, delta', gaussian, cutoff_delta, repeat),
+        measure('100 points appended, replace', series, append_replace, repeat),
+        measure('100 points appended, delta', series, append_delta, repeat),
+        measure('window moved, replace', series, window_replace, repeat),
+        measure('window moved, delta', series, window_delta, repeat)
+    ]
+
+    print('{points} points'.format(points=points))
+    for name, seconds, size in results:
+        print('{name:<32} {time:>9.2f} ms {size:>12,} bytes'.format(name=name, time=1000 * seconds, size=int(size)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark delta updates of Bokeh column data sources.')
+    parser.add_argument('--points', type=int, default=10000, help='number of points in the column data source')
+    parser.add_argument('--repeat', type=int, default=20, help='number of repetitions (the median is reported)')
+    args = parser.parse_args()
+
+    run(args.points, args.repeat)
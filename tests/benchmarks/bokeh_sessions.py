@@ -0,0 +1,156 @@
+"""Load test for the Bokeh server.
+
+Many sessions of a Bokeh server app are opened concurrently, and each session changes the value of a slider a number
+of times. Two times are reported: the time it takes to create a session (i.e. until the client has pulled the
+session's document from the server), and the callback round trip time (i.e. the time from changing the slider value
+until the server has replied to a subsequent request, which it only does after running the slider's Python callback).
+
+By default, the example app `tests/benchmarks/bokeh_apps/histogram.py` is served by the given number of Bokeh server
+processes on consecutive local ports, and the sessions are distributed evenly over these processes, as nginx would do
+in the deployed site. So you can compare a single process with multiple processes:
+
+    python -m tests.benchmarks.bokeh_sessions --processes 1 --sessions 50
+    python -m tests.benchmarks.bokeh_sessions --processes 4 --sessions 50
+
+Alternatively you may pass the URL of a running app, such as the example app on a deployment server (which must then
+include the example app in its `bokeh_server` folder):
+
+    python -m tests.benchmarks.bokeh_sessions --url https://my-app.org.za:5100/histogram
+
+Run the load test from the root folder of the site.
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+
+APP_FILE = os.path.join(os.path.dirname(__file__), 'bokeh_apps', 'histogram.py')
+
+
+def start_servers(processes, port):
+    """Start Bokeh server processes for the example app and return the processes and the URLs of the app."""
+
+    servers = []
+    urls = []
+    for i in range(processes):
+        server_port = port + i
+        # by default, the Bokeh server only accepts requests for localhost
+        command = [sys.executable, '-m', 'bokeh', 'serve', APP_FILE, '--port', str(server_port)]
+        servers.append(subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        urls.append('http://localhost:{port}/{app}'.format(port=server_port,
+                                                           app=os.path.splitext(os.path.basename(APP_FILE))[0]))
+
+    # wait until all servers accept requests
+    deadline = time.monotonic() + 60
+    for url in urls:
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=5).read()
+                break
+            except (urllib.error.URLError, OSError):
+                if time.monotonic() > deadline:
+                    stop_servers(servers)
+                    raise RuntimeError('The Bokeh server at {url} has not started.'.format(url=url))
+                time.sleep(0.2)
+    return servers, urls
+
+
+def stop_servers(servers):
+    for server in servers:
+        server.terminate()
+    for server in servers:
+        server.wait()
+
+
+def open_session(url):
+    """Open a session of a Bokeh server app."""
+
+    from bokeh.client import pull_session
+
+    if 'app_path' in inspect.signature(pull_session).parameters:
+        # Bokeh versions before 0.12.7 expect the app path as a separate argument
+        base_url, _, app_path = url.rpartition('/')
+        return pull_session(url=base_url, app_path='/' + app_path)
+    return pull_session(url=url)
+
+
+def run_session(url, callbacks, start_barrier):
+    """Open a session, change the slider value repeatedly and return the session creation and round trip times."""
+
+    # the Bokeh client runs a Tornado event loop, which needs an asyncio event loop in the thread
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    start_barrier.wait()
+
+    start = time.perf_counter()
+    session = open_session(url)
+    creation_time = time.perf_counter() - start
+
+    round_trip_times = []
+    try:
+        slider = session.document.get_model_by_name('standard_deviation')
+        for _ in range(callbacks):
+            start = time.perf_counter()
+            slider.value = round(random.uniform(slider.start, slider.end), 1)
+            # the server handles the messages of a connection in order, so its reply to this request is only sent
+            # after the slider callback has run
+            session.force_roundtrip()
+            round_trip_times.append(time.perf_counter() - start)
+    finally:
+        session.close()
+    return creation_time, round_trip_times
+
+
+def report(name, times):
+    times = sorted(times)
+    if not times:
+        return
+    line = '{name:<25} median {median:>8.3f} s   95th percentile {p95:>8.3f} s   max {max:>8.3f} s'
+    print(line.format(name=name,
+                      median=statistics.median(times),
+                      p95=times[min(len(times) - 1, int(0.95 * len(times)))],
+                      max=times[-1]))
+
+
+def run(urls, sessions, callbacks):
+    start_barrier = threading.Barrier(sessions)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        futures = [executor.submit(run_session, urls[i % len(urls)], callbacks, start_barrier)
+                   for i in range(sessions)]
+        results = [future.result() for future in futures]
+    total_time = time.perf_counter() - start
+
+    print('{sessions} sessions with {callbacks} callbacks each on {processes} server process(es), {total:.2f} s'.format(
+        sessions=sessions, callbacks=callbacks, processes=len(urls), total=total_time))
+    report('Session creation', [creation_time for creation_time, _ in results])
+    report('Callback round trip', [t for _, round_trip_times in results for t in round_trip_times])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test for the Bokeh server.')
+    parser.add_argument('--url', help='URL of a running Bokeh server app (instead of starting the example app)')
+    parser.add_argument('--processes', type=int, default=2, help='number of Bokeh server processes to start')
+    parser.add_argument('--port', type=int, default=5300, help='port of the first Bokeh server process')
+    parser.add_argument('--sessions', type=int, default=50, help='number of concurrent sessions')
+    parser.add_argument('--callbacks', type=int, default=10, help='number of slider changes per session')
+    args = parser.parse_args()
+
+    if args.url:
+        run([args.url], args.sessions, args.callbacks)
+    else:
+        servers, urls = start_servers(args.processes, args.port)
+        try:
+            run(urls, args.sessions, args.callbacks)
+        finally:
+            stop_servers(servers)
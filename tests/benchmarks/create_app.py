@@ -0,0 +1,90 @@
+"""Microbenchmark for creating the app repeatedly in the same process.
+
+Tests, Flask commands and setups with several apps create the app more than once in a process. The wall time and the
+memory allocated by `create_app` are measured for repeated calls, once with the cached bundle definitions (see
+`app.bundles.load_bundles`) and once with the cache and the registered bundles cleared before every call, which is
+what happened before the bundle definitions were cached (the YAML file was parsed and all bundles were loaded for every
+app).
+
+For every variant the median wall time per call, the median peak of the memory allocated during a call and the median
+memory (and number of memory blocks) still allocated after a call are reported. The memory is traced with
+`tracemalloc`, which slows down the calls, so the wall time is measured in separate calls without tracing.
+
+Run the benchmark from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.create_app --repeat 20
+"""
+
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+
+import app.bundles
+from app import assets, create_app
+
+
+def clear_bundles():
+    """Clear the cached bundle definitions and the registered bundles."""
+
+    app.bundles._loaded_bundles.clear()
+    # there is no public method for unregistering bundles
+    assets._named_bundles.clear()
+
+
+def measure(repeat, before_call):
+    """Call create_app repeatedly and return the median wall time, allocation peak, retained memory and blocks."""
+
+    times = []
+    for _ in range(repeat):
+        before_call()
+        gc.collect()
+        start = time.perf_counter()
+        create_app('testing')
+        times.append(time.perf_counter() - start)
+
+    peaks = []
+    sizes = []
+    blocks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            before_call()
+            gc.collect()
+            tracemalloc.clear_traces()
+            flask_app = create_app('testing')
+            size, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            del flask_app
+            peaks.append(peak)
+            sizes.append(size)
+            blocks.append(sum(stat.count for stat in snapshot.statistics('filename')))
+    finally:
+        tracemalloc.stop()
+
+    return statistics.median(times), statistics.median(peaks), statistics.median(sizes), statistics.median(blocks)
+
+
+def run(repeat):
+    # the first app is created separately, as it includes importing the modules used by the app
+    start = time.perf_counter()
+    create_app('testing')
+    print('First call: {0:.1f} ms'.format(1000 * (time.perf_counter() - start)))
+    print()
+
+    row = '{0:<30} {1:>12} {2:>14} {3:>14} {4:>10}'
+    print(row.format('variant', 'time (ms)', 'peak (KiB)', 'retained (KiB)', 'blocks'))
+    for name, before_call in (('cached bundle definitions', lambda: None),
+                              ('bundles loaded for every app', clear_bundles)):
+        seconds, peak, size, block_count = measure(repeat, before_call)
+        print('{0:<30} {1:>12.2f} {2:>14.1f} {3:>14.1f} {4:>10.0f}'.format(
+            name, 1000 * seconds, peak / 1024, size / 1024, block_count))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Microbenchmark for creating the app repeatedly.')
+    parser.add_argument('--repeat', type=int, default=20, help='number of calls per variant (the median is reported)')
+    args = parser.parse_args()
+
+    run(args.repeat)
@@ -0,0 +1,68 @@
+"""Benchmark for downsampling time series before plotting them with Bokeh.
+
+A random walk with a given number of points is plotted as a line, once with all points and once downsampled for the
+given plot width with each of the available methods. For each variant the size of the script generated by Bokeh's
+`components` function (which is the payload sent to the browser) and the time taken for downsampling and generating
+the components are reported.
+
+The time the browser takes to render a plot grows with the number of points, so the number of points and the payload
+size are a proxy for the client-side rendering time, which can't be measured from Python.
+
+Run the benchmark from the root folder of the site:
+
+    python -m tests.benchmarks.downsampling --points 500000 --width 800
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from bokeh.embed import components
+from bokeh.models import ColumnDataSource
+from bokeh.plotting import figure
+
+from app.downsampling import downsample
+
+
+def plot_components(df):
+    """Create a line plot of a dataframe and return its Bokeh components."""
+
+    p = figure(title='Random walk', x_axis_type='datetime')
+    p.line(source=ColumnDataSource(df), x='time', y='value')
+    return components(p)
+
+
+def run(num_points, width, repeat):
+    df = pd.DataFrame(dict(time=pd.date_range('2016-01-01', periods=num_points, freq='s'),
+                           value=np.random.normal(size=num_points).cumsum()))
+
+    row = '{0:>10} {1:>10} {2:>16} {3:>16} {4:>16}'
+    print(row.format('method', 'points', 'payload (bytes)', 'downsample (ms)', 'components (ms)'))
+    for method in (None, 'lttb', 'minmax'):
+        downsample_times = []
+        components_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            plotted = df if method is None else downsample(df, 'time', 'value', width=width, method=method)
+            downsample_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            script, div = plot_components(plotted)
+            components_times.append(time.perf_counter() - start)
+
+        print(row.format(method or 'none',
+                         len(plotted),
+                         len(script.encode('utf-8')) + len(div),
+                         '{0:.1f}'.format(1000 * min(downsample_times)),
+                         '{0:.1f}'.format(1000 * min(components_times))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark downsampling for Bokeh plots.')
+    parser.add_argument('--points', type=int, default=200000, help='number of points in the time series')
+    parser.add_argument('--width', type=int, default=800, help='plot width in pixels')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions (the best time is reported)')
+    args = parser.parse_args()
+
+    run(args.points, args.width, args.repeat)
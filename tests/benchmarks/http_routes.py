@@ -0,0 +1,382 @@
+"""HTTP benchmark for the routes of the Flask app.
+
+Every route in `ROUTES` is requested a number of times by concurrent clients, and the throughput (requests per second)
+and the 50th, 95th and 99th percentile of the latency are reported. The routes include the home page, the login form
+and a login, a 404 and a 500 error page and a page with a static Bokeh plot generated with `components`. The
+benchmark app (see `create_benchmark_app`) adds the routes for the error pages and the plot.
+
+The app can be run in two modes:
+
+test-client
+    The requests are sent with Flask's test client within the benchmark process. This measures the time spent in the
+    app itself.
+uwsgi
+    The app is served by uWSGI, using the settings from `uwsgi.ini` (such as the number of processes and threads), but
+    with an HTTP socket on a local port, and the requests are sent over HTTP. This requires uWSGI to be installed.
+
+The results are saved as JSON if the `--output` option is given. They are compared against the thresholds in a JSON
+file (by default `tests/benchmarks/http_thresholds.json`), which may define absolute limits for every route as well as
+a maximum regression relative to the results of an earlier run passed with the `--baseline` option. The script exits
+with a non-zero status if any threshold is exceeded or if a route returns an unexpected status code.
+
+Run the benchmark from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.http_routes --mode test-client --output /tmp/results.json
+    python -m tests.benchmarks.http_routes --mode uwsgi --baseline /tmp/results.json
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from flask import abort, render_template_string
+
+from app import create_app, password_verifier
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(__file__), 'http_thresholds.json')
+
+# name, method, path, form data and expected status code of the benchmarked routes
+ROUTES = [
+    ('home', 'GET', '/', None, 200),
+    ('login_form', 'GET', '/login', None, 200),
+    ('login', 'POST', '/login', dict(username='test', password='test'), 302),
+    ('not_found', 'GET', '/benchmark/not-found', None, 404),
+    ('server_error', 'GET', '/benchmark/error', None, 500),
+    ('bokeh_plot', 'GET', '/benchmark/plot', None, 200)
+]
+
+PLOT_TEMPLATE = """{% extends 'base.html' %}
+
+{% block page_content %}
+<div>
+    {{ script | safe }}
+    {{ div | safe }}
+</div>
+{% endblock %}
+"""
+
+
+def not_found():
+    abort(404)
+
+
+def server_error():
+    raise ValueError('This error is raised by the HTTP benchmark.')
+
+
+def bokeh_plot():
+    import numpy as np
+    from bokeh.embed import components
+    from bokeh.plotting import figure
+
+    p = figure(title='Sine')
+    x = np.linspace(-10, 10, 200)
+    p.line(x=x, y=np.sin(x))
+    script, div = components(p)
+    return render_template_string(PLOT_TEMPLATE, script=script, div=div)
+
+
+def create_benchmark_app(config_name='testing'):
+    """Create the app with the additional routes needed by the benchmark.
+
+    CSRF protection is disabled, so that the login form can be posted, and the password verification limits are
+    lifted, as they are covered by the login load test (`tests.benchmarks.login`).
+    """
+
+    app = create_app(config_name)
+    # the login form causes a deprecation warning for every request (Flask-WTF enables these warnings when the app
+    # is created)
+    warnings.simplefilter('ignore')
+    # the benchmark's error page would be logged
+    app.logger.disabled = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_VERIFICATION_MAX_PENDING'] = 1000
+    password_verifier.init_app(app)
+
+    # the endpoint names make these routes part of the main blueprint, so that its error handlers are used
+    app.add_url_rule('/benchmark/not-found', 'main.benchmark_not_found', not_found)
+    app.add_url_rule('/benchmark/error', 'main.benchmark_error', server_error)
+    app.add_url_rule('/benchmark/plot', 'main.benchmark_plot', bokeh_plot)
+    return app
+
+
+class TestClient:
+    """Client sending requests with Flask's test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    """Client sending HTTP requests, with a new connection for every request (as nginx does for uWSGI)."""
+
+    def __init__(self, port):
+        self.port = port
+
+    def request(self, method, path, data):
+        body = urlencode(data) if data else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data else {}
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+
+def read_uwsgi_options(path):
+    """Read the options from a uWSGI ini file, including those from the ini files it loads.
+
+    Params:
+    -------
+    path: str
+        Path of the ini file.
+
+    Returns:
+    --------
+    list of tuple
+        The option names and values, in the order in which they are defined. The `%d` placeholder (the directory of
+        the ini file) is replaced.
+    """
+
+    directory = os.path.dirname(os.path.abspath(path)) + os.sep
+    options = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith((';', '#', '[')):
+                continue
+            option, _, value = line.partition('=')
+            option, value = option.strip(), value.strip().replace('%d', directory)
+            if option == 'ini':
+                options.extend(read_uwsgi_options(value))
+            else:
+                options.append((option, value))
+    return options
+
+
+def start_uwsgi(port, options=None, ini_file='uwsgi.ini'):
+    """Start uWSGI with the settings from an ini file and an HTTP socket, and return the process.
+
+    Params:
+    -------
+    port: int
+        Port for the HTTP socket.
+    options: dict
+        uWSGI options overriding those from the ini file. Options with the value None are removed.
+    ini_file: str
+        ini file, relative to the root folder of the site.
+
+    Returns:
+    --------
+    Popen
+        The uWSGI process.
+    """
+
+    overrides = {'http-socket': '127.0.0.1:{port}'.format(port=port),
+                 'chdir': ROOT_DIR,
+                 'module': 'tests.benchmarks.http_wsgi:app',
+                 'master': 'true',
+                 'disable-logging': 'true'}
+    overrides.update(options or {})
+    replaced = set(overrides) | {'socket', 'wsgi-file', 'callable', 'touch-chain-reload', 'touch-reload'}
+    settings = [(option, value) for option, value in read_uwsgi_options(os.path.join(ROOT_DIR, ini_file))
+                if option not in replaced]
+    settings.extend(sorted((option, value) for option, value in overrides.items() if value is not None))
+
+    # the file must exist as long as uWSGI is running, as it is read again when uWSGI reloads
+    with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+        f.write('[uwsgi]\n')
+        for option, value in settings:
+            f.write('{option} = {value}\n'.format(option=option, value=value))
+        ini_file = f.name
+
+    process = subprocess.Popen(['uwsgi', '--ini', ini_file], cwd=ROOT_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    process.ini_file = ini_file
+
+    # wait until uWSGI accepts requests
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            HttpClient(port).request('GET', '/', None)
+            return process
+        except (ConnectionError, socket.timeout, http.client.HTTPException):
+            if process.poll() is not None or time.monotonic() > deadline:
+                stop_uwsgi(process)
+                raise RuntimeError('uWSGI has not started.')
+            time.sleep(0.2)
+
+
+def stop_uwsgi(process):
+    # SIGINT stops uWSGI immediately, without waiting for the workers to finish their requests
+    process.send_signal(signal.SIGINT)
+    process.wait()
+    os.remove(process.ini_file)
+
+
+def percentile(sorted_values, fraction):
+    """Get a percentile of sorted values, using the nearest-rank method."""
+
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(make_client, method, path, data, requests, concurrency, warmup):
+    """Send requests to a route with concurrent clients and return the throughput, latencies and status codes."""
+
+    local = threading.local()
+
+    def timed_request(_):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = make_client()
+        start = time.perf_counter()
+        status = client.request(method, path, data)
+        return status, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_request, range(warmup)))
+        start = time.perf_counter()
+        results = list(executor.map(timed_request, range(requests)))
+        total_time = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return dict(method=method,
+                path=path,
+                requests=requests,
+                throughput=requests / total_time,
+                p50=percentile(latencies, 0.5),
+                p95=percentile(latencies, 0.95),
+                p99=percentile(latencies, 0.99),
+                statuses=statuses)
+
+
+def check(results, thresholds, baseline):
+    """Compare results against absolute thresholds and a baseline, and return the list of violations."""
+
+    violations = []
+    expected_statuses = {name: str(status) for name, _, _, _, status in ROUTES}
+    max_regression = thresholds.get('max_regression')
+    for name, result in sorted(results['routes'].items()):
+        unexpected = {status: n for status, n in result['statuses'].items() if status != expected_statuses[name]}
+        if unexpected:
+            violations.append('{name}: unexpected status codes {statuses}'.format(name=name, statuses=unexpected))
+
+        limits = thresholds.get('routes', {}).get(name, {})
+        for key in ('p50', 'p95', 'p99'):
+            if key in limits and result[key] > limits[key]:
+                violations.append('{name}: {key} of {value:.4f} s exceeds {limit:.4f} s'.format(
+                    name=name, key=key, value=result[key], limit=limits[key]))
+        if 'min_throughput' in limits and result['throughput'] < limits['min_throughput']:
+            violations.append('{name}: throughput of {value:.1f}/s is below {limit:.1f}/s'.format(
+                name=name, value=result['throughput'], limit=limits['min_throughput']))
+
+        previous = (baseline or {}).get('routes', {}).get(name)
+        if previous is None or max_regression is None:
+            continue
+        if result['p95'] > previous['p95'] * (1 + max_regression):
+            violations.append('{name}: p95 of {value:.4f} s is more than {regression:.0%} above the baseline '
+                              '({previous:.4f} s)'.format(name=name, value=result['p95'], regression=max_regression,
+                                                          previous=previous['p95']))
+        if result['throughput'] * (1 + max_regression) < previous['throughput']:
+            violations.append('{name}: throughput of {value:.1f}/s is more than {regression:.0%} below the baseline '
+                              '({previous:.1f}/s)'.format(name=name, value=result['throughput'],
+                                                          regression=max_regression, previous=previous['throughput']))
+    return violations
+
+
+def run(mode, requests, concurrency, warmup, port, output, thresholds_file, baseline_file):
+    if mode == 'uwsgi':
+        process = start_uwsgi(port)
+
+        def make_client():
+            return HttpClient(port)
+    else:
+        process = None
+        app = create_benchmark_app('testing')
+
+        def make_client():
+            return TestClient(app)
+
+    try:
+        routes = {}
+        for name, method, path, data, _ in ROUTES:
+            routes[name] = measure(make_client, method, path, data, requests, concurrency, warmup)
+    finally:
+        if process is not None:
+            stop_uwsgi(process)
+
+    results = dict(mode=mode,
+                   requests=requests,
+                   concurrency=concurrency,
+                   python=platform.python_version(),
+                   created=datetime.datetime.now().isoformat(),
+                   routes=routes)
+
+    print('{mode}: {requests} requests per route, {concurrency} concurrent clients'.format(
+        mode=mode, requests=requests, concurrency=concurrency))
+    print('{0:<14} {1:>12} {2:>10} {3:>10} {4:>10}   {5}'.format('route', 'requests/s', 'p50 (ms)', 'p95 (ms)',
+                                                                 'p99 (ms)', 'statuses'))
+    for name, _, _, _, _ in ROUTES:
+        result = routes[name]
+        print('{0:<14} {1:>12.1f} {2:>10.2f} {3:>10.2f} {4:>10.2f}   {5}'.format(
+            name, result['throughput'], 1000 * result['p50'], 1000 * result['p95'], 1000 * result['p99'],
+            ', '.join('{0}: {1}'.format(status, n) for status, n in sorted(result['statuses'].items()))))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    with open(thresholds_file) as f:
+        thresholds = json.load(f).get(mode, {})
+    baseline = None
+    if baseline_file:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+    violations = check(results, thresholds, baseline)
+    for violation in violations:
+        print('THRESHOLD EXCEEDED: ' + violation)
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HTTP benchmark for the routes of the Flask app.')
+    parser.add_argument('--mode', choices=['test-client', 'uwsgi'], default='test-client',
+                        help='whether to use the Flask test client or a local uWSGI server')
+    parser.add_argument('--requests', type=int, default=200, help='number of measured requests per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='number of concurrent clients')
+    parser.add_argument('--warmup', type=int, default=10, help='number of unmeasured requests per route')
+    parser.add_argument('--port', type=int, default=5400, help='port for uWSGI')
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS, help='JSON file with the thresholds')
+    parser.add_argument('--baseline', help='JSON file with the results of an earlier run')
+    args = parser.parse_args()
+
+    sys.exit(run(args.mode, args.requests, args.concurrency, args.warmup, args.port, args.output, args.thresholds,
+                 args.baseline))
@@ -0,0 +1,16 @@
+"""WSGI module serving the benchmark app for the HTTP benchmark (see `tests.benchmarks.http_routes`)."""
+
+from app import db
+from app.health import warm_up
+from app.preload import import_heavy_modules, in_uwsgi_master, prepare_for_fork
+from tests.benchmarks.http_routes import create_benchmark_app
+
+# as in wsgi.py, the app is only used once it is ready, and it is prepared for forking in preload mode
+import_heavy_modules()
+
+app = create_benchmark_app('testing')
+
+warm_up(app)
+
+if in_uwsgi_master():
+    prepare_for_fork(app, db)
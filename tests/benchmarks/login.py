@@ -0,0 +1,111 @@
+"""Load test for the login route.
+
+A burst of login requests is sent together with requests for the home page to a simulated server with a fixed number
+of threads (like a uWSGI process), and the time after which the requests have been completed and their status codes
+are reported for both kinds of request. The
+password verification of the dummy user is replaced with PBKDF2, so that it takes as long as with a real key
+derivation function.
+
+The test is run twice, once with the password verification limits of the testing configuration and once without any
+limits. Without limits the login requests occupy all server threads, so that home page requests have to wait. With
+limits, excess logins are rejected with a 503 response, and the home page remains responsive.
+
+Run the load test from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.login --logins 40 --pages 40 --threads 2
+"""
+
+import argparse
+import hashlib
+import statistics
+import time
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app, password_verifier
+from app.auth.views import DummyUser
+
+ITERATIONS = 100000
+
+
+def pbkdf2_verify_password(self, password):
+    """Verify a password like DummyUser does, but taking as long as a real key derivation function."""
+
+    hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), b'salt', ITERATIONS)
+    return self.username == 'test' and password == 'test'
+
+
+def request(app, kind):
+    """Send a request and return its kind, status code and the time at which it finished."""
+
+    client = app.test_client()
+    if kind == 'login':
+        response = client.post('/login', data=dict(username='test', password='test'))
+    else:
+        response = client.get('/')
+    return kind, response.status_code, time.perf_counter()
+
+
+def run_load(app, logins, pages, threads):
+    """Send interleaved login and home page requests and return the results by kind of request."""
+
+    order = []
+    for i in range(max(logins, pages)):
+        if i < logins:
+            order.append('login')
+        if i < pages:
+            order.append('page')
+
+    results = dict(login=[], page=[])
+    with ThreadPoolExecutor(max_workers=threads) as server:
+        start = time.perf_counter()
+        futures = [server.submit(request, app, kind) for kind in order]
+        for future in futures:
+            kind, status, finished = future.result()
+            results[kind].append((status, finished - start))
+    return results
+
+
+def report(name, results):
+    print(name)
+    for kind, values in sorted(results.items()):
+        if not values:
+            continue
+        completed = sorted(seconds for status, seconds in values)
+        statuses = {}
+        for status, seconds in values:
+            statuses[status] = statuses.get(status, 0) + 1
+        line = '    {kind:<6} completed after {median:>7.3f} s (median), {max:>7.3f} s (max)   statuses {statuses}'
+        print(line.format(
+            kind=kind,
+            median=statistics.median(completed),
+            max=completed[-1],
+            statuses=', '.join('{0}: {1}'.format(s, n) for s, n in sorted(statuses.items()))))
+
+
+def run(logins, pages, threads):
+    # the login form causes a deprecation warning for every request
+    warnings.simplefilter('ignore')
+    DummyUser.verify_password = pbkdf2_verify_password
+    app = create_app('testing')
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    report('With the configured limits (workers: {0}, max pending: {1})'.format(
+        app.config['PASSWORD_VERIFICATION_WORKERS'], app.config['PASSWORD_VERIFICATION_MAX_PENDING']),
+        run_load(app, logins, pages, threads))
+
+    app.config['PASSWORD_VERIFICATION_WORKERS'] = threads
+    app.config['PASSWORD_VERIFICATION_MAX_PENDING'] = logins + pages
+    password_verifier.init_app(app)
+    report('Without limits', run_load(app, logins, pages, threads))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test for the login route.')
+    parser.add_argument('--logins', type=int, default=40, help='number of login requests')
+    parser.add_argument('--pages', type=int, default=40, help='number of home page requests')
+    parser.add_argument('--threads', type=int, default=2, help='number of server threads')
+    args = parser.parse_args()
+
+    run(args.logins, args.pages, args.threads)
@@ -0,0 +1,74 @@
+"""Benchmark for the memory used by the uWSGI workers in the different ways of loading the app.
+
+uWSGI is started with the settings from `uwsgi.ini` (as for the HTTP benchmark in `tests.benchmarks.http_routes`) in
+three variants:
+
+lazy
+    Every worker imports all libraries and creates the app itself (`uwsgi.ini` without the `shared-import` options).
+shared-import
+    The master imports the heavy libraries before forking the workers, and every worker creates the app itself
+    (`uwsgi.ini`, the default).
+preload
+    The master imports the heavy libraries and creates the app before forking the workers (`uwsgi-preload.ini`).
+
+For each variant some requests are sent to every route of the HTTP benchmark, and then the resident set size (RSS),
+the proportional set size (PSS) and the shared and private memory of every worker are read from `/proc` (see
+`app.memory.memory_report`). The sum of the PSS of the workers and the master is the memory actually used by the
+server.
+
+Run the benchmark from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.memory --requests 20
+"""
+
+import argparse
+
+from app.memory import memory_report
+from tests.benchmarks.http_routes import HttpClient, ROOT_DIR, ROUTES, start_uwsgi, stop_uwsgi
+
+# name, uWSGI options and ini file of the variants
+VARIANTS = [
+    ('lazy', {'shared-import': None}, 'uwsgi.ini'),
+    ('shared-import', {}, 'uwsgi.ini'),
+    ('preload', {}, 'uwsgi-preload.ini')
+]
+
+MIB = 1024 * 1024
+
+
+def measure(port, options, ini_file, requests):
+    """Start uWSGI, send requests to all routes and return the memory report."""
+
+    # the limit would restart workers while they are measured
+    options = dict(options, **{'reload-on-rss': None})
+    process = start_uwsgi(port, options, ini_file=ini_file)
+    try:
+        client = HttpClient(port)
+        for _ in range(requests):
+            for _, method, path, data, _ in ROUTES:
+                client.request(method, path, data)
+        return memory_report(ROOT_DIR)
+    finally:
+        stop_uwsgi(process)
+
+
+def run(port, requests):
+    row = '{0:<15} {1:>8} {2:>10} {3:>10} {4:>12} {5:>13}'
+    print(row.format('variant', 'process', 'RSS (MiB)', 'PSS (MiB)', 'shared (MiB)', 'private (MiB)'))
+    for name, options, ini_file in VARIANTS:
+        report = measure(port, options, ini_file, requests)
+        for usage in report:
+            print('{0:<15} {1:>8} {2:>10.1f} {3:>10.1f} {4:>12.1f} {5:>13.1f}'.format(
+                name, usage['role'], usage['rss'] / MIB, usage['pss'] / MIB, usage['shared'] / MIB,
+                usage['private'] / MIB))
+        print('{0:<15} {1:>8} {2:>10} {3:>10.1f}'.format(name, 'total', '', sum(u['pss'] for u in report) / MIB))
+        print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark for the memory used by the uWSGI workers.')
+    parser.add_argument('--port', type=int, default=9092, help='port for uWSGI')
+    parser.add_argument('--requests', type=int, default=20, help='number of requests per route and variant')
+    args = parser.parse_args()
+
+    run(args.port, args.requests)
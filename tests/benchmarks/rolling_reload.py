@@ -0,0 +1,158 @@
+"""Load test for reloading the uWSGI workers while requests are being handled.
+
+uWSGI is started with the settings from `uwsgi.ini` (as for the HTTP benchmark in `tests.benchmarks.http_routes`), and
+a load generator requests the home page and the health check route (`/health`) with concurrent clients. While the
+load generator is running, the reload file is touched, so that uWSGI reloads its workers one after the other (see
+`touch-chain-reload` in `uwsgi.ini`), as it happens when the site is deployed. The test waits until the health check
+has been served by as many new workers as there are processes, and then lets the load generator run a little longer.
+With the `--preload` option the preload mode (`uwsgi-preload.ini`) is tested instead, in which touching the reload file
+reloads the master and all workers gracefully.
+
+The number of requests, the failed requests (any status other than 200, and any connection error) and the time taken
+by the reload are reported. The script exits with a non-zero status if any request has failed or if the workers
+haven't been reloaded within the timeout.
+
+Run the test from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.rolling_reload --clients 4
+"""
+
+import argparse
+import collections
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from config import Config
+from tests.benchmarks.http_routes import start_uwsgi, stop_uwsgi
+
+PATHS = ('/', '/health')
+
+
+class LoadGenerator:
+    """Concurrent clients requesting the paths in `PATHS` in turn, with a new connection for every request.
+
+    Params:
+    -------
+    port: int
+        Port of the server.
+    clients: int
+        Number of concurrent clients.
+    """
+
+    def __init__(self, port, clients):
+        self.port = port
+        self.clients = clients
+        self.statuses = collections.Counter()
+        self.errors = collections.Counter()
+        self.workers = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for _ in range(self.clients):
+            thread = threading.Thread(target=self._run)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def failures(self):
+        """Get the number of failed requests."""
+
+        with self._lock:
+            return sum(n for status, n in self.statuses.items() if status != 200) + sum(self.errors.values())
+
+    def workers_started_after(self, t):
+        """Get the process ids of the workers which have served the health check and were started after a time."""
+
+        with self._lock:
+            return set(pid for pid, started in self.workers.items() if started >= t)
+
+    def _run(self):
+        i = 0
+        while not self._stopped.is_set():
+            path = PATHS[i % len(PATHS)]
+            i += 1
+            connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                body = response.read()
+                with self._lock:
+                    self.statuses[response.status] += 1
+                    if path == '/health' and response.status == 200:
+                        status = json.loads(body.decode('utf-8'))
+                        self.workers[status['pid']] = status['started']
+            except (ConnectionError, socket.timeout, http.client.HTTPException) as e:
+                with self._lock:
+                    self.errors[type(e).__name__] += 1
+            finally:
+                connection.close()
+
+
+def run(port, clients, settle, timeout, preload):
+    processes = Config.uwsgi_layout()[0]
+    handle, reload_file = tempfile.mkstemp(suffix='.reload')
+    os.close(handle)
+
+    if preload:
+        process = start_uwsgi(port, {'touch-reload': reload_file}, ini_file='uwsgi-preload.ini')
+    else:
+        process = start_uwsgi(port, {'touch-chain-reload': reload_file})
+    load = LoadGenerator(port, clients)
+    try:
+        load.start()
+        time.sleep(settle)
+
+        # uWSGI checks the modification time of the reload file with a resolution of seconds
+        time.sleep(1)
+        touched = time.time()
+        os.utime(reload_file)
+
+        while len(load.workers_started_after(touched)) < processes and time.time() - touched < timeout:
+            time.sleep(0.1)
+        reload_duration = time.time() - touched
+        reloaded = len(load.workers_started_after(touched))
+
+        time.sleep(settle)
+    finally:
+        load.stop()
+        stop_uwsgi(process)
+        os.remove(reload_file)
+
+    print('{requests} requests by {clients} clients, {failures} failed'.format(
+        requests=sum(load.statuses.values()) + sum(load.errors.values()), clients=clients, failures=load.failures()))
+    print('statuses: {statuses}'.format(
+        statuses=', '.join('{0}: {1}'.format(status, n) for status, n in sorted(load.statuses.items()))))
+    if load.errors:
+        print('errors: {errors}'.format(
+            errors=', '.join('{0}: {1}'.format(error, n) for error, n in sorted(load.errors.items()))))
+    print('{reloaded} of {processes} workers reloaded in {seconds:.1f} s'.format(
+        reloaded=reloaded, processes=processes, seconds=reload_duration))
+
+    return load.failures() == 0 and reloaded == processes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test for reloading the uWSGI workers.')
+    parser.add_argument('--port', type=int, default=9091, help='port for uWSGI')
+    parser.add_argument('--clients', type=int, default=4, help='number of concurrent clients')
+    parser.add_argument('--settle', type=float, default=2,
+                        help='number of seconds the load generator runs before and after the reload')
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='maximum number of seconds to wait for all workers to be reloaded')
+    parser.add_argument('--preload', action='store_true',
+                        help='use the preload mode (uwsgi-preload.ini), which reloads the master gracefully')
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.port, args.clients, args.settle, args.timeout, args.preload) else 1)
@@ -0,0 +1,102 @@
+"""Benchmark for the per-request overhead of the session interfaces.
+
+A session with the typical content for a logged in user (the Flask-Login user id, freshness flag and session
+identifier, a CSRF token and a flashed message) is opened and saved as in a request, once without changing it and once
+with a change. The session interfaces compared are
+
+cookie
+    Flask's default signed cookie sessions.
+sqlite
+    Server-side sessions in a SQLite database, without a cache (see `app.sessions`).
+sqlite-cached
+    Server-side sessions in a SQLite database, with the per-process cache.
+
+The mean time per request and the size of the session cookie are reported.
+
+Run the benchmark from the root folder of the site:
+
+    python -m tests.benchmarks.sessions --requests 5000
+"""
+
+import argparse
+import hashlib
+import shutil
+import tempfile
+import time
+
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+from app.cache import LRUCache
+from app.sessions import ServerSideSessionInterface, SQLiteSessionStore
+
+SESSION = {
+    '_user_id': 'test',
+    '_fresh': True,
+    '_id': hashlib.sha512(b'127.0.0.1|Mozilla/5.0').hexdigest(),
+    'csrf_token': hashlib.sha1(b'csrf').hexdigest(),
+    '_flashes': [('message', 'You have been logged in.')]
+}
+
+
+def interfaces(directory):
+    """Get the benchmarked session interfaces, keyed by name."""
+
+    return [
+        ('cookie', SecureCookieSessionInterface()),
+        ('sqlite', ServerSideSessionInterface(SQLiteSessionStore(directory), gc_interval=0)),
+        ('sqlite-cached', ServerSideSessionInterface(SQLiteSessionStore(directory),
+                                                     cache=LRUCache(max_size=1024 * 1024,
+                                                                    sizeof=lambda entry: len(entry[0])),
+                                                     gc_interval=0))
+    ]
+
+
+def create_cookie(app, interface):
+    """Save the session with an interface and return the value of the session cookie."""
+
+    with app.test_request_context('/'):
+        session = interface.open_session(app, app.request_class({}))
+        session.update(SESSION)
+        response = app.response_class()
+        interface.save_session(app, session, response)
+        return response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+
+
+def measure(app, interface, cookie, requests, modify):
+    """Open and save the session as many times as there are requests, and return the mean time per request."""
+
+    environ = {'HTTP_COOKIE': '{0}={1}'.format(app.config['SESSION_COOKIE_NAME'], cookie)}
+    with app.test_request_context('/'):
+        start = time.perf_counter()
+        for i in range(requests):
+            request = app.request_class(environ)
+            session = interface.open_session(app, request)
+            if modify:
+                session['counter'] = i
+            interface.save_session(app, session, app.response_class())
+        return (time.perf_counter() - start) / requests
+
+
+def run(requests):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    directory = tempfile.mkdtemp()
+    try:
+        row = '{0:<15} {1:>15} {2:>20} {3:>20}'
+        print(row.format('interface', 'cookie (bytes)', 'unchanged (µs/req)', 'changed (µs/req)'))
+        for name, interface in interfaces(directory):
+            cookie = create_cookie(app, interface)
+            unchanged = measure(app, interface, cookie, requests, modify=False)
+            changed = measure(app, interface, cookie, requests, modify=True)
+            print('{0:<15} {1:>15} {2:>20.1f} {3:>20.1f}'.format(name, len(cookie), 1e6 * unchanged, 1e6 * changed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark for the per-request overhead of the session interfaces.')
+    parser.add_argument('--requests', type=int, default=5000, help='number of requests per interface and case')
+    args = parser.parse_args()
+
+    run(args.requests)
@@ -0,0 +1,95 @@
+"""Benchmark for the startup time of server processes and Flask commands.
+
+Three things are measured in fresh Python processes:
+
+* The time for importing the `app` package, with a breakdown of the slowest imports as reported by
+  `python -X importtime` (which requires Python 3.7 or higher).
+* The time for importing the package and creating the app, which is what a uWSGI worker does when it starts.
+* The time for running `flask --help`, which is the overhead of every Flask command.
+
+The wall times are compared against a budget, and the script exits with a non-zero status if any of them is exceeded,
+so that it can be used to keep track of regressions.
+
+Run the benchmark from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.startup --budget 1.5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+
+def wall_time(args, env=None, repeat=3):
+    """Run a command and return the best wall time in seconds."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call(args, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def slowest_imports(module, count):
+    """Return the slowest top-level imports of a module, as reported by `python -X importtime`.
+
+    Params:
+    -------
+    module: str
+        Module to import.
+    count: int
+        Number of imports to return.
+
+    Returns:
+    --------
+    list of tuple
+        Module name and cumulative import time in seconds, sorted by decreasing time.
+    """
+
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            cwd=ROOT_DIR, stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        # only include packages imported directly by the module (i.e. with an indentation level of 1)
+        if len(name) - len(name.lstrip()) <= 3:
+            imports.append((name.strip(), int(cumulative_time) / 1e6))
+    return sorted(imports, key=lambda i: i[1], reverse=True)[:count]
+
+
+def run(budget, count):
+    print('Slowest imports of the app package:')
+    for name, seconds in slowest_imports('app', count):
+        print('    {0:<40} {1:>8.3f} s'.format(name, seconds))
+    print()
+
+    flask_env = dict(os.environ, FLASK_APP='site_app.py', FLASK_CONFIG='testing')
+    measurements = [
+        ('import app', wall_time([sys.executable, '-c', 'import app'])),
+        ('create app', wall_time([sys.executable, '-c', 'from app import create_app; create_app("testing")'])),
+        ('flask --help', wall_time([sys.executable, '-m', 'flask', '--help'], env=flask_env))
+    ]
+
+    exceeded = False
+    for name, seconds in measurements:
+        status = 'ok' if seconds <= budget else 'OVER BUDGET'
+        exceeded = exceeded or seconds > budget
+        print('{0:<40} {1:>8.3f} s  {2}'.format(name, seconds, status))
+
+    return 1 if exceeded else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the app.')
+    parser.add_argument('--budget', type=float, default=1.5, help='maximum allowed wall time in seconds')
+    parser.add_argument('--imports', type=int, default=10, help='number of slowest imports to show')
+    args = parser.parse_args()
+
+    sys.exit(run(args.budget, args.imports))
@@ -0,0 +1,87 @@
+"""Benchmark for template compilation and rendering.
+
+Two things are measured for the site's templates:
+
+* The time taken to load (i.e. compile) the templates in a fresh Jinja environment, once without and once with a
+  (warm) bytecode cache. This is what every server process spends after a restart when a template is used for the
+  first time.
+* The time taken to render each template, once without and once with the fragment cache. This is spent on every
+  request.
+
+Run the benchmark from the root folder of the site, with the environment variables for the testing configuration set:
+
+    python -m tests.benchmarks.templates --repeat 1000
+"""
+
+import argparse
+import tempfile
+import time
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+from app import create_app
+from app.auth.forms import LoginForm
+
+TEMPLATES = ('index.html', 'auth/login.html', '404.html', '500.html')
+
+
+def load_time(app, bytecode_cache, repeat):
+    """Return the best time for loading all templates in a Jinja environment with an empty in-memory cache."""
+
+    app.jinja_env.bytecode_cache = bytecode_cache
+    times = []
+    for _ in range(repeat):
+        app.jinja_env.cache.clear()
+        start = time.perf_counter()
+        for template in TEMPLATES:
+            app.jinja_env.get_template(template)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def render_time(app, template, repeat):
+    """Return the mean time for rendering a template."""
+
+    with app.test_request_context('/'):
+        context = dict(form=LoginForm()) if template == 'auth/login.html' else {}
+        render_template(template, **context)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            render_template(template, **context)
+        return (time.perf_counter() - start) / repeat
+
+
+def run(repeat):
+    app = create_app('testing')
+
+    original_bytecode_cache = app.jinja_env.bytecode_cache
+    with app.app_context():
+        with tempfile.TemporaryDirectory() as directory:
+            bytecode_cache = FileSystemBytecodeCache(directory)
+            load_time(app, bytecode_cache, 1)
+            print('Loading all templates:')
+            print('    {0:<30} {1:>8.2f} ms'.format('without bytecode cache', 1000 * load_time(app, None, 10)))
+            print('    {0:<30} {1:>8.2f} ms'.format('with bytecode cache', 1000 * load_time(app, bytecode_cache, 10)))
+        app.jinja_env.bytecode_cache = original_bytecode_cache
+        app.jinja_env.cache.clear()
+        print()
+
+    fragment_cache = app.extensions['fragment_cache']
+    row = '    {0:<30} {1:>18} {2:>18}'
+    print('Rendering (mean time per render):')
+    print(row.format('template', 'no fragment cache', 'fragment cache'))
+    for template in TEMPLATES:
+        app.extensions['fragment_cache'] = None
+        uncached = render_time(app, template, repeat)
+        app.extensions['fragment_cache'] = fragment_cache
+        cached = render_time(app, template, repeat)
+        print(row.format(template, '{0:.1f} µs'.format(1e6 * uncached), '{0:.1f} µs'.format(1e6 * cached)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark template compilation and rendering.')
+    parser.add_argument('--repeat', type=int, default=1000, help='number of renders per template')
+    args = parser.parse_args()
+
+    run(args.repeat)
@@ -1,11 +1,11 @@
-from app import create_app
+from tests.fixtures import AppState, shared_app
 
 
 def before_scenario(context, scenario):
     """Set up the Flask environment.
 
-    The Flask app and its context are created, and stored in the context variable. In addition a test client using
-    cookies is created and stored in the context variable.
+    The Flask app (which is shared by all scenarios, see `tests.fixtures`) is stored in the context variable, and an
+    app context is pushed. In addition a test client using cookies is created and stored in the context variable.
 
     Params:
     -------
@@ -15,15 +15,17 @@ def before_scenario(context, scenario):
         Behave scenario.
 
     """
-    context.app = create_app('testing')
-    context.app_context = context.app.app_context()
-    context.app_context.push()
+    context.app = shared_app('testing')
+    context.app_state = AppState(context.app)
+    context.app_state.start()
     context.client = context.app.test_client(use_cookies=True)
 
 
 def after_scenario(context, scenario):
     """Tear down the Flask environment.
 
+    Changes to the app configuration and the app's extensions as well as all database changes are undone.
+
     Params:
     -------
     context: object
@@ -32,4 +34,4 @@ def after_scenario(context, scenario):
         Behave scenario.
     """
 
-    context.app_context.pop()
+    context.app_state.stop()
@@ -0,0 +1,101 @@
+"""Fixtures shared by the unit tests and the Behave tests.
+
+Creating the app is expensive (the environment variables file is read, the webassets bundles are loaded and the
+blueprints are registered), so the app is created only once per process by `shared_app`. Every test or scenario
+then works with an `AppState`, which pushes an app context, records the app configuration and extensions so that
+changes to them can be undone, and runs all database access within a transaction which is rolled back at the end.
+"""
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import create_app, db
+
+_apps = {}
+
+
+def shared_app(config_name='testing'):
+    """Get the app for a configuration, creating it if this hasn't been done in the current process yet.
+
+    Params:
+    -------
+    config_name: str
+        Configuration name.
+
+    Returns:
+    --------
+    Flask
+        The app.
+    """
+
+    if config_name not in _apps:
+        _apps[config_name] = create_app(config_name)
+    return _apps[config_name]
+
+
+class AppState:
+    """Isolate the state of a test from that of other tests using the same app.
+
+    The `start` method pushes an app context, takes a snapshot of the app configuration and the app's extensions
+    (so that a test may change the configuration or reinitialise an extension with `init_app`), and replaces the
+    database session with one which is bound to a connection with an open transaction. The connection is only opened
+    when the session is used first, so that tests which don't access the database don't need one. The `stop` method
+    rolls back the transaction, restores the snapshot and the database session and pops the app context.
+
+    Params:
+    -------
+    app: Flask
+        Flask app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._app_context = None
+        self._config = None
+        self._extensions = None
+        self._login_manager = None
+        self._connection = None
+        self._transaction = None
+        self._session = None
+
+    def start(self):
+        """Start isolating the state."""
+
+        self._config = dict(self.app.config)
+        self._extensions = dict(self.app.extensions)
+        self._login_manager = dict(vars(self.app.login_manager))
+        self._app_context = self.app.app_context()
+        self._app_context.push()
+
+        # the session is bound to a connection with an open transaction, so that commits within a test only end a
+        # nested transaction and are rolled back as well
+        self._session = db.session
+        db.session = scoped_session(self._create_session)
+
+    def stop(self):
+        """Undo all changes and stop isolating the state."""
+
+        try:
+            db.session.remove()
+            if self._connection is not None:
+                self._transaction.rollback()
+                self._connection.close()
+        finally:
+            db.session = self._session
+            self._connection = None
+            self._transaction = None
+
+        self._app_context.pop()
+        self.app.config.clear()
+        self.app.config.update(self._config)
+        self.app.extensions.clear()
+        self.app.extensions.update(self._extensions)
+        vars(self.app.login_manager).clear()
+        vars(self.app.login_manager).update(self._login_manager)
+
+    def _create_session(self):
+        """Open the connection and transaction for the test and create a database session bound to it."""
+
+        if self._connection is None:
+            self._connection = db.engine.connect()
+            self._transaction = self._connection.begin()
+        return sessionmaker(bind=self._connection)()
@@ -1,25 +1,26 @@
 import unittest
 
-from app import create_app
+from tests.fixtures import AppState, shared_app
 
 
 class BaseTestCase(unittest.TestCase):
     """Base class for Flask unit tests.
 
-    The class ensures that the Flask app and its context are created before the first unit test, and thatv the context
-    is removed again after the last test.
+    The Flask app is created only once per process and shared by all tests (see `tests.fixtures`). For every test an
+    app context is pushed, and it is removed again after the test. Changes to the app configuration and the app's
+    extensions as well as all database changes are undone after every test.
 
     It also creates a test client as `self.client`. This test client uses cookies.
     """
 
     def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
+        self.app = shared_app('testing')
+        self.app_state = AppState(self.app)
+        self.app_state.start()
         self.client = self.app.test_client(use_cookies=True)
 
     def tearDown(self):
-        self.app_context.pop()
+        self.app_state.stop()
 
 
 class NoAuthBaseTestCase(BaseTestCase):
@@ -32,4 +33,6 @@ class NoAuthBaseTestCase(BaseTestCase):
     def setUp(self):
         BaseTestCase.setUp(self)
         self.app.config['LOGIN_DISABLED'] = True
-        self.app.login_manager.init_app(self.app)
+        if '_login_disabled' in vars(self.app.login_manager):
+            # Flask-Login versions before 0.5 read the configuration only when the extension is initialised
+            self.app.login_manager._login_disabled = True
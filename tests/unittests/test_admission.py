@@ -0,0 +1,112 @@
+import threading
+import time
+import unittest
+
+from werkzeug.routing import Map, Rule
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from app.admission import AdmissionMiddleware, IN_FLIGHT, LATENCY, QUEUE_TIME
+from tests.unittests.base import BaseTestCase
+
+
+class AdmissionMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.rejections = []
+
+    def wsgi_app(self, environ, start_response):
+        path = environ['PATH_INFO']
+        if path == '/blocking':
+            self.started.set()
+            self.release.wait(5)
+        elif path == '/slow':
+            time.sleep(0.05)
+        return Response('OK')(environ, start_response)
+
+    def middleware(self, **kwargs):
+        url_map = Map([Rule('/fast', endpoint='fast'),
+                       Rule('/slow', endpoint='slow'),
+                       Rule('/blocking', endpoint='slow'),
+                       Rule('/static/<path:filename>', endpoint='static')])
+        return AdmissionMiddleware(self.wsgi_app, url_map=url_map,
+                                   on_reject=lambda endpoint, reason: self.rejections.append((endpoint, reason)),
+                                   **kwargs)
+
+    def block(self, client):
+        """Start a request for the blocking path, which is in progress until the release event is set."""
+
+        self.started = threading.Event()
+        thread = threading.Thread(target=client.get, args=('/blocking',))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.assertTrue(self.started.wait(5))
+
+    def test_requests_which_have_waited_too_long_are_rejected(self):
+        client = Client(self.middleware(max_queue_time=1, retry_after=7))
+        response = client.get('/fast', headers={'X-Request-Start': 't={0:.3f}'.format(time.time() - 2)})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '7')
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        self.assertEqual(self.rejections, [('fast', QUEUE_TIME)])
+
+        # milliseconds and microseconds are accepted as well
+        response = client.get('/fast', headers={'X-Request-Start': str(int(1000 * (time.time() - 2)))})
+        self.assertEqual(response.status_code, 503)
+        response = client.get('/fast', headers={'X-Request-Start': str(int(1000000 * time.time()))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/fast').status_code, 200)
+
+        # static files are exempt
+        response = client.get('/static/site.css', headers={'X-Request-Start': 't={0}'.format(time.time() - 2)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_requests_beyond_in_flight_limit_are_rejected(self):
+        client = Client(self.middleware(max_in_flight=1))
+        self.block(client)
+        self.assertEqual(client.get('/fast').status_code, 503)
+        self.assertEqual(self.rejections, [('fast', IN_FLIGHT)])
+
+        self.release.set()
+        self.doCleanups()
+        self.assertEqual(client.get('/fast').status_code, 200)
+
+    def test_concurrent_requests_for_slow_endpoint_are_rejected(self):
+        middleware = self.middleware(max_latency=0.01)
+        client = Client(middleware)
+        self.assertEqual(client.get('/slow').status_code, 200)
+        self.assertGreater(middleware.endpoints['slow'].latency, 0.01)
+
+        # a single request at a time is admitted for the slow endpoint, and other endpoints aren't affected
+        self.block(client)
+        self.assertEqual(client.get('/slow').status_code, 503)
+        self.assertEqual(client.get('/fast').status_code, 200)
+        self.assertEqual(self.rejections, [('slow', LATENCY)])
+
+        self.release.set()
+        self.doCleanups()
+        self.assertEqual(client.get('/slow').status_code, 200)
+        self.assertEqual(middleware.in_flight, 0)
+
+
+class AdmissionControlTestCase(BaseTestCase):
+    def test_overloaded_app_rejects_requests_without_rendering_templates(self):
+        middleware = self.app.extensions['admission']
+        original_max_queue_time = middleware.max_queue_time
+        middleware.max_queue_time = 1
+        self.addCleanup(setattr, middleware, 'max_queue_time', original_max_queue_time)
+        queued = {'X-Request-Start': 't={0:.3f}'.format(time.time() - 60)}
+
+        response = self.client.get('/', headers=queued)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertNotIn(b'<html', response.data)
+
+        self.assertEqual(self.client.get('/health', headers=queued).status_code, 200)
+
+        store = self.app.extensions.get('metrics')
+        if store is not None:
+            rejected = store.collect()[('app_admission_rejected_total', (('endpoint', 'main.index'),
+                                                                         ('reason', 'queue_time')))]
+            self.assertGreaterEqual(rejected, 1)
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from bokeh_server.helpers.deltas import changed_rows, source_delta
+
+
+class SourceDeltaTestCase(unittest.TestCase):
+    def test_nan_values_are_unchanged(self):
+        old = np.array([1.0, np.nan, 3.0])
+        new = np.array([1.0, np.nan, 4.0])
+        self.assertEqual(changed_rows(old, new).tolist(), [False, False, True])
+
+    def test_kinds_of_update(self):
+        current = dict(x=np.arange(10.0), y=np.zeros(10))
+
+        self.assertEqual(source_delta(current, dict(x=np.arange(10.0), y=np.zeros(10))), ('none', None))
+
+        y = np.zeros(10)
+        y[[2, 7]] = 1
+        kind, patches = source_delta(current, dict(x=np.arange(10.0), y=y))
+        self.assertEqual((kind, patches), ('patch', dict(y=[(2, 1.0), (7, 1.0)])))
+
+        kind, rows = source_delta(current, dict(x=np.arange(12.0), y=np.zeros(12)))
+        self.assertEqual((kind, rows['x'].tolist()), ('stream', [10.0, 11.0]))
+
+        kind, rows = source_delta(current, dict(x=np.arange(3.0, 13.0), y=np.zeros(10)), rollover=10)
+        self.assertEqual((kind, rows['x'].tolist()), ('stream', [10.0, 11.0, 12.0]))
+
+        kind, data = source_delta(current, dict(x=np.arange(3.0, 13.0), y=np.ones(10)))
+        self.assertEqual(kind, 'replace')
+
+        kind, data = source_delta(current, dict(x=np.arange(10.0)))
+        self.assertEqual(kind, 'replace')
+
+    def test_source_ends_up_with_new_data(self):
+        from bokeh.models import ColumnDataSource
+        from bokeh_server.helpers.deltas import update_source
+
+        source = ColumnDataSource(data=dict(x=np.arange(5.0), y=np.zeros(5)))
+        for new, rollover, kind in [(dict(x=np.arange(5.0), y=np.array([0, 1, 0, 0, 0.0])), None, 'patch'),
+                                    (dict(x=np.arange(7.0), y=np.array([0, 1, 0, 0, 0, 2, 3.0])), None, 'stream'),
+                                    (dict(x=np.arange(2.0, 9.0), y=np.array([0, 0, 0, 2, 3, 4, 5.0])), 7, 'stream')]:
+            self.assertEqual(update_source(source, new, rollover=rollover), kind)
+            for name in new:
+                self.assertEqual(list(source.data[name]), new[name].tolist())
@@ -0,0 +1,73 @@
+import http.server
+import threading
+import time
+
+from urllib.parse import parse_qs, urlsplit
+
+from app import bokeh_server
+from app.bokeh_util import SESSION_ID_PLACEHOLDER
+from tests.unittests.base import BaseTestCase
+
+
+class BokehServerTestCase(BaseTestCase):
+    def test_server_url_is_derived_from_the_request_host(self):
+        self.app.config['BOKEH_SERVER_URL'] = None
+        self.app.config['BOKEH_SERVER_PORT'] = 5100
+        with self.app.test_request_context('/', base_url='https://example.org:8443'):
+            self.assertEqual(bokeh_server.server_url(), 'https://example.org:5100')
+        with self.app.test_request_context('/', base_url='http://[::1]:5000'):
+            self.assertEqual(bokeh_server.server_url(), 'http://[::1]:5100')
+
+        self.app.config['BOKEH_SERVER_URL'] = 'https://plots.example.org/'
+        with self.app.test_request_context('/', base_url='http://example.org'):
+            self.assertEqual(bokeh_server.server_url(), 'https://plots.example.org')
+
+    def test_scripts_are_cached_per_app_path_and_url(self):
+        self.app.config['BOKEH_SERVER_URL'] = None
+        scripts = self.app.extensions['bokeh_server']['scripts']
+        with self.app.test_request_context('/', base_url='https://example.org'):
+            script = bokeh_server.autoload_script('/gaussian')
+            self.assertIn('https://example.org:5100/gaussian/autoload.js', script)
+            self.assertNotIn(SESSION_ID_PLACEHOLDER, script)
+            self.assertNotEqual(bokeh_server.autoload_script('/gaussian'), script)
+            self.assertEqual((len(scripts), scripts.hits), (1, 1))
+        with self.app.test_request_context('/', base_url='http://example.org'):
+            self.assertIn('http://example.org:5100/gaussian/autoload.js', bokeh_server.autoload_script('/gaussian'))
+        self.assertEqual(len(scripts), 2)
+
+    def test_prewarmed_sessions_are_used(self):
+        requests = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append((self.path, self.headers['Host']))
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b'')
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            self.app.config['BOKEH_SERVER_URL'] = 'https://example.org:5100'
+            self.app.config['BOKEH_SERVER_INTERNAL_URL'] = 'http://127.0.0.1:{0}'.format(server.server_port)
+            self.app.config['BOKEH_SESSION_POOL_SIZE'] = 2
+            bokeh_server.init_app(self.app)
+            bokeh_server.prewarm('/gaussian')
+
+            deadline = time.monotonic() + 5
+            while len(requests) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(all(path.startswith('/gaussian/autoload.js?') for path, _ in requests))
+            self.assertTrue(all(host == 'example.org:5100' for _, host in requests))
+
+            session_ids = [parse_qs(urlsplit(path).query)['bokeh-session-id'][0] for path, _ in requests]
+            with self.app.test_request_context('/'):
+                script = bokeh_server.autoload_script('/gaussian')
+            self.assertNotIn(SESSION_ID_PLACEHOLDER, script)
+            self.assertTrue(any(session_id in script for session_id in session_ids))
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from webassets import Bundle, Environment
+
+from app import create_app
+from app.bundles import build_bundles, BUNDLE_FOLDER, load_bundles, read_manifest
+from tests.unittests.base import BaseTestCase
+
+
+class BundleManifestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'js'))
+        with open(os.path.join(self.directory, 'js', 'a.js'), 'w') as f:
+            f.write('var a = 1;\n' * 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build_creates_compressed_variants_and_manifest(self):
+        env = Environment(self.directory, '/static')
+        env.manifest = 'bundles:cache/manifest.json'
+        env.register('js-all', Bundle('js/a.js', output='cache/all.%(version)s.js'))
+        env['js-all'].build()
+
+        with open(os.path.join(self.directory, 'cache', 'manifest.json')) as f:
+            entry = json.load(f)['cache/all.%(version)s.js']
+        path = os.path.join(self.directory, entry['path'])
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as g:
+            self.assertEqual(f.read(), g.read())
+        self.assertLess(entry['gz_size'], entry['size'])
+        self.assertIn(entry['version'], entry['path'])
+
+
+class LoadBundlesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'webassets.yaml')
+        self.write_definitions('js/a.js')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_definitions(self, content):
+        with open(self.path, 'w') as f:
+            f.write('js-all:\n    output: cache/all.%(version)s.js\n    contents:\n        - {0}\n'.format(content))
+
+    def test_bundles_are_reloaded_only_if_the_file_changes(self):
+        bundles = load_bundles(self.path)
+        self.assertIs(load_bundles(self.path), bundles)
+
+        env = Environment(self.directory, '/static')
+        env.register(bundles)
+        env.register(load_bundles(self.path))
+        self.assertIs(env['js-all'], bundles['js-all'])
+
+        self.write_definitions('js/b.js')
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertEqual(load_bundles(self.path)['js-all'].contents, ('js/b.js',))
+
+    def test_app_can_be_created_repeatedly(self):
+        bundle = create_app('testing').jinja_env.assets_environment['js-all']
+        self.assertIs(create_app('testing').jinja_env.assets_environment['js-all'], bundle)
+
+    def test_app_can_be_created_again_after_bundle_file_changes(self):
+        bundle = create_app('testing').jinja_env.assets_environment['js-all']
+
+        path = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'webassets.yaml')
+        stat = os.stat(path)
+        self.addCleanup(os.utime, path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        self.assertIs(create_app('testing').jinja_env.assets_environment['js-all'], bundle)
+
+
+class StaticBundlesTestCase(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.bundle_dir = os.path.join(self.app.static_folder, BUNDLE_FOLDER)
+        self.created_dir = not os.path.exists(self.bundle_dir)
+        os.makedirs(self.bundle_dir, exist_ok=True)
+        self.path = os.path.join(self.bundle_dir, 'test.12345678.js')
+        with open(self.path, 'w') as f:
+            f.write('var a = 1;')
+
+    def tearDown(self):
+        os.remove(self.path)
+        if self.created_dir:
+            shutil.rmtree(self.bundle_dir)
+        BaseTestCase.tearDown(self)
+
+    def test_bundles_are_immutable_and_conditional(self):
+        url = '/static/{folder}/test.12345678.js'.format(folder=BUNDLE_FOLDER)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', response.headers['Cache-Control'])
+        etag, weak = response.get_etag()
+        self.assertFalse(weak)
+        response.close()
+
+        response = self.client.get(url, headers={'If-None-Match': '"{0}"'.format(etag)})
+        self.assertEqual(response.status_code, 304)
+        response.close()
+
+
+class BuildBundlesTestCase(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.bundle_dir = os.path.join(self.app.static_folder, BUNDLE_FOLDER)
+        self.webassets_cache_dir = os.path.join(self.app.static_folder, '.webassets-cache')
+        self.created_dirs = [d for d in (self.bundle_dir, self.webassets_cache_dir) if not os.path.exists(d)]
+
+    def tearDown(self):
+        for directory in self.created_dirs:
+            shutil.rmtree(directory, ignore_errors=True)
+        BaseTestCase.tearDown(self)
+
+    def test_only_changed_bundles_are_built(self):
+        if self.created_dirs != [self.bundle_dir, self.webassets_cache_dir]:
+            self.skipTest('The bundles have been built already.')
+        env = self.app.jinja_env.assets_environment
+        entries = build_bundles('testing', env, names=['js-all'], workers=1)
+        self.assertTrue(entries['js-all']['built'])
+        self.assertIn('build_time', entries['js-all'])
+        entries = build_bundles('testing', env, names=['js-all'], workers=1)
+        self.assertFalse(entries['js-all']['built'])
+        self.assertEqual(read_manifest(env)['js-all']['path'], entries['js-all']['path'])
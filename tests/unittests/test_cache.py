@@ -0,0 +1,57 @@
+import time
+import unittest
+
+from app import plot_cache
+from app.cache import LRUCache
+from tests.unittests.base import BaseTestCase
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_size_is_bounded(self):
+        cache = LRUCache(max_size=10, sizeof=len)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'x' * 6)
+        cache.set('c', 'x' * 11)
+        self.assertEqual(cache.size, 6)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('c'))
+
+    def test_entries_expire(self):
+        cache = LRUCache(timeout=0.01)
+        cache.set('a', 1)
+        cache.set('b', 2, timeout=10)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+
+class PlotCacheTestCase(BaseTestCase):
+    def test_components_are_cached_per_query(self):
+        calls = []
+
+        @plot_cache.cached()
+        def components():
+            calls.append(1)
+            return '<script></script>', '<div></div>'
+
+        with self.app.test_request_context('/plot?x=1'):
+            components()
+            components()
+        with self.app.test_request_context('/plot?x=2'):
+            components()
+        self.assertEqual(len(calls), 2)
+
+        with self.app.test_request_context('/plot?x=1'):
+            self.assertEqual(components.invalidate(path='/plot'), 2)
+            components()
+        self.assertEqual(len(calls), 3)
@@ -0,0 +1,63 @@
+import gzip
+import unittest
+import zlib
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from app.compression import CompressionMiddleware
+from tests.unittests.base import BaseTestCase
+
+
+class CompressionMiddlewareTestCase(unittest.TestCase):
+    def test_encoding_is_negotiated(self):
+        middleware = CompressionMiddleware(None)
+        middleware._brotli = None
+        self.assertEqual(middleware.negotiate('gzip, deflate, br'), 'gzip')
+        self.assertIsNone(middleware.negotiate('gzip;q=0, deflate'))
+        self.assertIsNone(middleware.negotiate(''))
+        self.assertEqual(middleware.negotiate('*'), 'gzip')
+
+    def test_streamed_responses_are_compressed_incrementally(self):
+        consumed = []
+
+        def body():
+            for i in range(100):
+                consumed.append(i)
+                yield 'line {0}\n'.format(i).encode('utf-8') * 20
+
+        def wsgi_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/csv; charset=utf-8')])
+            return body()
+
+        middleware = CompressionMiddleware(wsgi_app, min_size=500)
+        middleware._brotli = None
+        started = []
+        result = middleware({'HTTP_ACCEPT_ENCODING': 'gzip', 'REQUEST_METHOD': 'GET'},
+                            lambda status, headers, exc_info=None: started.append(dict(headers)))
+        self.assertEqual(started[0]['Content-Encoding'], 'gzip')
+        self.assertEqual(started[0]['Vary'], 'Accept-Encoding')
+        # only the start of the body has been read
+        self.assertLess(len(consumed), 10)
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        content = b''.join(decompressor.decompress(chunk) for chunk in result)
+        result.close()
+        self.assertEqual(content, b''.join('line {0}\n'.format(i).encode('utf-8') * 20 for i in range(100)))
+
+
+class CompressionTestCase(BaseTestCase):
+    def test_pages_are_compressed_if_accepted(self):
+        page = self.client.get('/').data
+        response = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), page)
+        self.assertLess(len(response.data), len(page))
+
+    def test_small_responses_are_not_compressed(self):
+        # the app's WSGI app is wrapped in the middleware when the app is created
+        client = Client(CompressionMiddleware(self.app.wsgi_app.wsgi_app, min_size=1000000), Response)
+        response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
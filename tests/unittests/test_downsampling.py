@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.downsampling import downsample, lttb, min_max
+
+
+class DownsamplingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(dict(x=np.arange(10000), y=np.random.normal(size=10000).cumsum()))
+
+    def test_endpoints_are_kept(self):
+        x = self.df['x'].values.astype(float)
+        y = self.df['y'].values
+        for indices in (lttb(x, y, 100), min_max(x, y, 100)):
+            self.assertEqual(indices[0], 0)
+            self.assertEqual(indices[-1], 9999)
+            self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_number_of_points_depends_on_width(self):
+        self.assertEqual(len(downsample(self.df, 'x', 'y', width=500)), 1000)
+        self.assertEqual(len(downsample(self.df, 'x', 'y', width=500, points_per_pixel=1)), 500)
+
+    def test_extrema_are_kept(self):
+        self.df.loc[1234, 'y'] = 1e6
+        self.df.loc[5678, 'y'] = -1e6
+        for method in ('lttb', 'minmax'):
+            downsampled = downsample(self.df, 'x', 'y', num_points=50, method=method)
+            self.assertIn(1234, downsampled.index)
+            self.assertIn(5678, downsampled.index)
+
+    def test_small_dataframes_are_unchanged(self):
+        self.assertEqual(len(downsample(self.df.head(100), 'x', 'y', width=500)), 100)
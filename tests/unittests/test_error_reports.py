@@ -0,0 +1,73 @@
+import logging
+import time
+import unittest
+
+from app import error_reports
+from app.error_reports import DigestMailHandler, fingerprint
+from tests.unittests.base import BaseTestCase
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def exc_info(message):
+    try:
+        fail(message)
+    except ValueError as e:
+        return type(e), e, e.__traceback__
+
+
+class FingerprintTestCase(unittest.TestCase):
+    def test_fingerprint_ignores_message(self):
+        self.assertEqual(fingerprint(exc_info('id 1'))[0], fingerprint(exc_info('id 2'))[0])
+        try:
+            raise ValueError('id 1')
+        except ValueError as e:
+            other = fingerprint((type(e), e, e.__traceback__))
+        self.assertNotEqual(fingerprint(exc_info('id 1'))[0], other[0])
+        self.assertEqual(other[1], 'builtins.ValueError')
+
+
+class ErrorReportsTestCase(BaseTestCase):
+    def test_repeated_errors_are_logged_once_per_window(self):
+        reports = self.app.extensions['error_reports']
+        self.addCleanup(setattr, reports, 'window', reports.window)
+        with self.app.test_request_context('/'), self.assertLogs(self.app.logger, 'ERROR') as logs:
+            for i in range(4):
+                if i == 3:
+                    reports.window = 0
+                try:
+                    fail('id {0}'.format(i))
+                except ValueError as e:
+                    digest = error_reports.log(e)
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('2 further occurrence(s)', logs.records[1].getMessage())
+        if self.app.extensions['metrics'] is not None:
+            counts = {c['fingerprint']: c['count'] for c in error_reports.error_counts()}
+            self.assertGreaterEqual(counts[digest], 4)
+
+
+class DigestMailHandlerTestCase(unittest.TestCase):
+    def test_records_are_sent_as_rate_limited_digests(self):
+        emails = []
+        handler = DigestMailHandler('localhost', 'from@example.org', ('to@example.org',), 'Error', interval=0.2)
+        handler._send = lambda groups: emails.append({key: group['count'] for key, group in groups.items()})
+        logger = logging.getLogger('test_digest_mail_handler')
+        logger.propagate = False
+        logger.addHandler(handler)
+
+        for i in range(5):
+            logger.error('error', exc_info=exc_info('id {0}'.format(i)))
+        logger.warning('warning')
+        deadline = time.time() + 2
+        while not emails and time.time() < deadline:
+            time.sleep(0.01)
+        logger.error('error', exc_info=exc_info('id 5'))
+        time.sleep(0.05)
+
+        self.assertEqual(len(emails), 1)
+        self.assertEqual(sorted(emails[0].values()), [1, 5])
+        handler.close()
+        logger.removeHandler(handler)
+        self.assertEqual(len(emails), 2)
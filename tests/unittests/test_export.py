@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import tracemalloc
+
+from sqlalchemy import create_engine
+
+from app import exports
+from app.export import csv_chunks, ndjson_chunks, stream_query
+from tests.unittests.base import BaseTestCase, NoAuthBaseTestCase
+
+
+class StreamQueryTestCase(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.engine = create_engine('sqlite:///' + self.path)
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute('CREATE TABLE Measurement (id INTEGER, name TEXT, value REAL)')
+            cursor.executemany('INSERT INTO Measurement VALUES (?, ?, ?)',
+                               ((i, 'measurement {0}'.format(i), i / 7) for i in range(100000)))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+        BaseTestCase.tearDown(self)
+
+    def export_peak_memory(self, rows):
+        tracemalloc.start()
+        try:
+            columns, batches = stream_query(self.engine, 'SELECT * FROM Measurement WHERE id < ?', (rows,),
+                                            batch_size=500)
+            size = 0
+            for chunk in csv_chunks(columns, batches):
+                size += len(chunk)
+            return tracemalloc.get_traced_memory()[1], size
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_does_not_grow_with_rows(self):
+        # warm up, so that the peaks don't include the memory allocated when the modules are used for the first time
+        self.export_peak_memory(1000)
+
+        small_peak, small_size = self.export_peak_memory(10000)
+        large_peak, large_size = self.export_peak_memory(100000)
+        self.assertGreater(large_size, 10 * small_size)
+        self.assertLess(large_peak, 2 * small_peak)
+        self.assertLess(large_peak, large_size / 10)
+
+    def test_formats(self):
+        columns, batches = stream_query(self.engine, 'SELECT id, name FROM Measurement WHERE id < 3 ORDER BY id',
+                                        batch_size=2)
+        self.assertEqual(b''.join(csv_chunks(columns, batches)).decode('utf-8').splitlines(),
+                         ['id,name', '0,measurement 0', '1,measurement 1', '2,measurement 2'])
+
+        columns, batches = stream_query(self.engine, 'SELECT id, name FROM Measurement WHERE id < 2 ORDER BY id')
+        lines = b''.join(ndjson_chunks(columns, batches)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [dict(id=0, name='measurement 0'), dict(id=1, name='measurement 1')])
+
+    def test_connection_is_released_when_closed_early(self):
+        columns, batches = stream_query(self.engine, 'SELECT * FROM Measurement', batch_size=10)
+        self.assertEqual(len(next(batches)), 10)
+        batches.close()
+        self.assertEqual(list(batches), [])
+        self.assertEqual(self.engine.pool.checkedout(), 0)
+
+
+class ExportRouteTestCase(NoAuthBaseTestCase):
+    def setUp(self):
+        NoAuthBaseTestCase.setUp(self)
+
+        @exports.query('test_export')
+        def test_export():
+            return "SELECT 1 AS a, 'x' AS b", None
+
+    def tearDown(self):
+        del exports.queries['test_export']
+        NoAuthBaseTestCase.tearDown(self)
+
+    def test_csv_export(self):
+        response = self.client.get('/export/test_export.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment; filename="test_export.csv"', response.headers['Content-Disposition'])
+        self.assertEqual(response.get_data(as_text=True).splitlines(), ['a,b', '1,x'])
+
+    def test_ndjson_export(self):
+        response = self.client.get('/export/test_export.ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(json.loads(response.get_data(as_text=True)), dict(a=1, b='x'))
+
+    def test_unknown_export(self):
+        self.assertEqual(self.client.get('/export/missing.csv').status_code, 404)
+        self.assertEqual(self.client.get('/export/test_export.xml').status_code, 404)
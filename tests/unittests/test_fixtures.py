@@ -0,0 +1,23 @@
+import unittest
+
+from sqlalchemy import text
+
+from app import db
+from tests.fixtures import AppState, shared_app
+
+
+class AppStateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = shared_app('testing')
+
+    def test_database_connection_is_opened_on_first_use(self):
+        session = db.session
+        state = AppState(self.app)
+        state.start()
+        try:
+            self.assertIsNone(state._connection)
+            db.session.execute(text('SELECT 1'))
+            self.assertIsNotNone(state._connection)
+        finally:
+            state.stop()
+        self.assertIs(db.session, session)
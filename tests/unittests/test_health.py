@@ -0,0 +1,37 @@
+import os
+
+from unittest import mock
+
+from sqlalchemy import create_engine
+
+from app.health import check_health, warm_up
+from tests.unittests.base import BaseTestCase
+
+
+class UnreachableDatabase:
+    engine = create_engine('sqlite:////nonexistent-directory/database.db')
+
+
+class HealthTestCase(BaseTestCase):
+    def test_health_route(self):
+        response = self.client.get('/health')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['status'], 'ok')
+        self.assertEqual(response.json['pid'], os.getpid())
+
+    def test_failing_check(self):
+        status = check_health(UnreachableDatabase())
+        self.assertEqual(status['status'], 'failing')
+        self.assertIn('OperationalError', status['checks']['database'])
+
+    def test_warm_up(self):
+        self.assertEqual(warm_up(self.app)['status'], 'ok')
+
+        self.app.config['INTERNAL_ALLOWED_ADDRESSES'] = ()
+        self.assertRaises(RuntimeError, warm_up, self.app)
+
+    def test_warm_up_succeeds_if_database_is_unreachable(self):
+        with mock.patch('app.internal.views.db', UnreachableDatabase()):
+            status = warm_up(self.app)
+            self.assertEqual(status['status'], 'failing')
+            self.assertEqual(self.client.get('/health').status_code, 503)
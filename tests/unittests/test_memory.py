@@ -0,0 +1,22 @@
+import os
+import sys
+import unittest
+
+from app.memory import memory_usage, server_processes
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'memory usage is read from /proc')
+class MemoryTestCase(unittest.TestCase):
+    def test_memory_usage(self):
+        usage = memory_usage(os.getpid())
+        self.assertEqual(usage['pid'], os.getpid())
+        self.assertGreater(usage['rss'], 0)
+        self.assertEqual(usage['rss'], usage['shared'] + usage['private'])
+        self.assertLessEqual(usage['pss'], usage['rss'])
+
+    def test_server_processes(self):
+        with open('/proc/self/cmdline', 'rb') as f:
+            name = os.path.basename(f.read().split(b'\0')[0].decode('utf-8'))
+        processes = server_processes(os.getcwd(), name=name)
+        self.assertIn(dict(pid=os.getpid(), ppid=os.getppid()), processes)
+        self.assertEqual(server_processes(os.getcwd(), name='no-such-server'), [])
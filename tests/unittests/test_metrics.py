@@ -0,0 +1,65 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+
+from app.metrics import MetricsStore
+from tests.unittests.base import BaseTestCase
+
+
+class MetricsStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = MetricsStore(self.directory, dict(requests=('counter', 'Requests.'),
+                                                       in_progress=('gauge', 'Requests in progress.'),
+                                                       latency=('histogram', 'Latency.')))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_values_are_aggregated_across_processes(self):
+        def record():
+            self.store.increment('requests', dict(endpoint='a'))
+            self.store.increment('in_progress', {})
+
+        for _ in range(2):
+            process = multiprocessing.Process(target=record)
+            process.start()
+            process.join()
+        self.store.increment('requests', dict(endpoint='a'))
+        self.store.increment('in_progress', {})
+
+        values = self.store.collect()
+        self.assertEqual(values[('requests', (('endpoint', 'a'),))], 3)
+        self.assertEqual(values[('in_progress', ())], 1)
+
+        # the counter values of the stopped processes have been archived
+        self.assertEqual(self.store.collect()[('requests', (('endpoint', 'a'),))], 3)
+
+    def test_stores_in_the_same_process_share_the_values_file(self):
+        other_store = MetricsStore(self.directory, self.store.descriptions)
+        self.store.increment('requests', dict(endpoint='a'))
+        other_store.increment('requests', dict(endpoint='b'))
+        self.store.increment('requests', dict(endpoint='c'))
+
+        values = self.store.collect()
+        for endpoint in ('a', 'b', 'c'):
+            self.assertEqual(values[('requests', (('endpoint', endpoint),))], 1, endpoint)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for latency in (0.001, 0.2, 0.3, 20):
+            self.store.observe('latency', {}, latency)
+        rendered = self.store.render()
+        self.assertIn('latency_bucket{le="0.005"} 1.0', rendered)
+        self.assertIn('latency_bucket{le="0.5"} 3.0', rendered)
+        self.assertIn('latency_bucket{le="+Inf"} 4.0', rendered)
+        self.assertIn('latency_count 4.0', rendered)
+
+
+class MetricsRouteTestCase(BaseTestCase):
+    def test_requests_are_counted(self):
+        self.client.get('/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_requests_total{endpoint="main.index",method="GET",status="200"}',
+                      response.get_data(as_text=True))
@@ -0,0 +1,122 @@
+import concurrent.futures
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+from flask import request
+
+from app import offload
+from app.offload import BulkheadFull, DeadlineExceeded
+from config import Config
+from tests.unittests.base import BaseTestCase
+
+
+class OffloadTestCase(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.app.config['OFFLOAD_CONCURRENCY'] = 2
+        self.app.config['OFFLOAD_LIMITS'] = dict(main=1)
+        self.app.config['OFFLOAD_TIMEOUT'] = 5
+        self.app.config['OFFLOAD_TOTAL_CONCURRENCY'] = 3
+        offload.init_app(self.app)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def block(self, path):
+        """Occupy a slot of the bulkhead for the blueprint of a path until the release event is set."""
+
+        started = threading.Event()
+
+        def wait():
+            started.set()
+            self.release.wait(5)
+
+        def run():
+            with self.app.test_request_context(path):
+                offload.run(wait)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.assertTrue(started.wait(5))
+
+    def test_function_runs_in_request_context(self):
+        with self.app.test_request_context('/?value=42'):
+            self.assertEqual(offload.run(lambda: request.args['value']), '42')
+
+    def test_full_bulkhead_only_rejects_its_blueprint(self):
+        self.block('/')
+        with self.app.test_request_context('/'):
+            self.assertRaises(BulkheadFull, offload.run, lambda: None)
+        with self.app.test_request_context('/login'):
+            self.assertEqual(offload.run(lambda: 'done'), 'done')
+
+        self.release.set()
+        time.sleep(0.1)
+        with self.app.test_request_context('/'):
+            self.assertEqual(offload.run(lambda: 'done'), 'done')
+
+    def test_cheap_requests_are_handled_while_heavy_work_is_waiting(self):
+        # the default limits, with a server process simulated by a thread pool with as many threads as uWSGI uses
+        settings = Config.settings('testing')
+        self.app.config['OFFLOAD_CONCURRENCY'] = settings['offload_concurrency']
+        self.app.config['OFFLOAD_LIMITS'] = dict(settings['offload_limits'])
+        self.app.config['OFFLOAD_TOTAL_CONCURRENCY'] = settings['offload_total_concurrency']
+        offload.init_app(self.app)
+        threads = Config.uwsgi_layout()[1]
+
+        def heavy_request(path):
+            with self.app.test_request_context(path):
+                try:
+                    return offload.run(self.release.wait, 5)
+                except BulkheadFull:
+                    return None
+
+        def cheap_request():
+            return self.app.test_client().get('/').status_code
+
+        with ThreadPoolExecutor(max_workers=threads) as server:
+            # heavy requests for both blueprints saturate their bulkheads
+            for path in ('/', '/login') * threads:
+                server.submit(heavy_request, path)
+            self.assertEqual(server.submit(cheap_request).result(timeout=2), 200)
+            self.release.set()
+
+    def test_deadline(self):
+        self.app.config['OFFLOAD_TIMEOUT'] = 0.1
+        with self.app.test_request_context('/'):
+            start = time.monotonic()
+            self.assertRaises(DeadlineExceeded, offload.run, self.release.wait, 5)
+            self.assertLess(time.monotonic() - start, 1)
+
+            # the deadline is shared by all the work of the request
+            self.assertRaises(DeadlineExceeded, offload.check_deadline)
+
+    def test_result_is_returned_if_function_finishes_after_timeout(self):
+        def finish_late(f, *args, **kwargs):
+            future = Future()
+            future.set_result(f(*args, **kwargs))
+            real_result = future.result
+
+            def result(timeout=None):
+                if timeout is not None:
+                    raise concurrent.futures.TimeoutError()
+                return real_result()
+
+            future.result = result
+            return future
+
+        with self.app.test_request_context('/login'):
+            bulkhead = self.app.extensions['offload'].get('auth')
+            with mock.patch.object(bulkhead, 'submit', finish_late):
+                self.assertEqual(offload.run(lambda: 'done'), 'done')
+
+    def test_error_pages(self):
+        with self.app.test_request_context('/login'):
+            response = self.app.make_response(self.app.handle_user_exception(BulkheadFull()))
+            self.assertEqual(response.status_code, 503)
+            response = self.app.make_response(self.app.handle_user_exception(DeadlineExceeded()))
+            self.assertEqual(response.status_code, 504)
+            self.assertIn('took too long', response.get_data(as_text=True))
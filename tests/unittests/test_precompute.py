@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+import threading
+
+import pandas as pd
+
+from app.precompute import Precomputer
+from tests.unittests.base import BaseTestCase
+
+
+class PrecomputerTestCase(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.app.config['PRECOMPUTE_DIR'] = self.directory
+        self.precompute = Precomputer(self.app)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        BaseTestCase.tearDown(self)
+
+    def test_missing_dataset_is_computed_once(self):
+        calls = []
+
+        @self.precompute.dataset(name='totals')
+        def totals():
+            calls.append(1)
+            return pd.DataFrame(dict(value=[1.0, 2.0]))
+
+        self.assertEqual(totals.get()['value'].tolist(), [1.0, 2.0])
+        self.assertEqual(totals.get()['value'].tolist(), [1.0, 2.0])
+        self.assertEqual(len(calls), 1)
+
+    def test_worker_refreshes_datasets_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        # each dataset waits for the other one, so the refreshes only finish if they run at the same time
+        @self.precompute.dataset(name='first', interval=3600)
+        def first():
+            barrier.wait()
+            return pd.DataFrame(dict(value=[1]))
+
+        @self.precompute.dataset(name='second', interval=3600)
+        def second():
+            barrier.wait()
+            return pd.DataFrame(dict(value=[2]))
+
+        self.precompute.run(self.app, workers=2, once=True)
+
+        self.assertEqual(first.get()['value'].tolist(), [1])
+        self.assertEqual(second.get()['value'].tolist(), [2])
+        statuses = self.precompute.status()
+        self.assertEqual([status['name'] for status in statuses], ['first', 'second'])
+        for status in statuses:
+            self.assertIsNone(status['error'])
+            self.assertIsNotNone(status['last_refresh'])
+            self.assertGreaterEqual(status['duration'], 0)
+
+    def test_failed_refresh_keeps_previous_version(self):
+        values = [pd.DataFrame(dict(value=[1])), ValueError('database unavailable')]
+
+        @self.precompute.dataset(name='flaky')
+        def flaky():
+            value = values.pop(0)
+            if isinstance(value, Exception):
+                raise value
+            return value
+
+        flaky.refresh()
+        self.precompute.run(self.app, once=True)
+
+        self.assertEqual(flaky.get()['value'].tolist(), [1])
+        status = self.precompute.status()[0]
+        self.assertEqual(status['error'], 'database unavailable')
+        self.assertLess(status['last_success'], status['last_refresh'])
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.query_cache import QueryResultCache
+from tests.unittests.base import BaseTestCase
+
+
+def memory_mapped(values):
+    """Check whether an array is a view of a memory-mapped file."""
+
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+class QueryResultCacheTestCase(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        BaseTestCase.tearDown(self)
+
+    def test_results_are_memory_mapped_and_shared(self):
+        cache = QueryResultCache(self.directory)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return pd.DataFrame(dict(t=pd.date_range('2016-01-01', periods=3), value=[1.5, np.nan, 3.0],
+                                     name=['a', 'b', 'c'], note=['x', None, 'z'])).set_index('t')
+
+        df = cache.cached('weather', compute)
+        other_cache = QueryResultCache(self.directory)
+        other_df = other_cache.cached('weather', compute)
+        self.assertEqual(len(calls), 1)
+        pd.testing.assert_frame_equal(df, other_df, check_dtype=False)
+        self.assertEqual(other_df.index.name, 't')
+        self.assertEqual(other_df['note'].isnull().tolist(), [False, True, False])
+        self.assertTrue(memory_mapped(other_df['value'].values))
+
+    def test_columns_of_the_same_type_are_not_copied(self):
+        cache = QueryResultCache(self.directory)
+        numbers = pd.DataFrame(dict(i=[1, 2, 3], a=[1.0, 2.0, 3.0], b=[4.0, 5.0, 6.0], c=[7, 8, 9])).set_index('i')
+        df = cache.cached('numbers', lambda: numbers)
+        self.assertEqual(df.index.tolist(), [1, 2, 3])
+        self.assertEqual(df['b'].tolist(), [4.0, 5.0, 6.0])
+        for column in df.columns:
+            self.assertTrue(memory_mapped(df[column].values), column)
+
+    def test_expired_entries_are_recomputed_once(self):
+        cache = QueryResultCache(self.directory, timeout=0.1)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return pd.DataFrame(dict(value=[len(calls)]))
+
+        threads = [threading.Thread(target=cache.cached, args=('key', compute)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+        time.sleep(0.2)
+        self.assertEqual(cache.cached('key', compute)['value'].tolist(), [2])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = QueryResultCache(self.directory)
+        for key in ['a', 'b', 'c']:
+            cache.cached(key, lambda: pd.DataFrame(dict(value=np.zeros(1000))))
+            time.sleep(0.01)
+        cache.cached('a', lambda: None)
+        cache.max_size = 2 * 8500
+        cache.cached('d', lambda: pd.DataFrame(dict(value=np.zeros(1000))))
+        self.assertEqual(sorted(digest for digest, _, _ in cache._entries()),
+                         sorted(cache.digest(key) for key in ['a', 'd']))
@@ -0,0 +1,151 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+from flask import Flask, session
+
+from app.sessions import ServerSideSessions, SQLiteSessionStore
+
+
+class CountingStore(SQLiteSessionStore):
+    """SQLite session store counting the sessions loaded and saved."""
+
+    def __init__(self, directory):
+        SQLiteSessionStore.__init__(self, directory)
+        self.loads = 0
+        self.saves = 0
+
+    def load(self, sid):
+        self.loads += 1
+        return SQLiteSessionStore.load(self, sid)
+
+    def save(self, sid, text, expires):
+        self.saves += 1
+        return SQLiteSessionStore.save(self, sid, text, expires)
+
+
+def create_session_app(directory):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='secret', SESSION_STORE='sqlite', SESSION_DIR=directory,
+                      SESSION_CACHE_MAX_SIZE=1024 * 1024, SESSION_GC_INTERVAL=0)
+    ServerSideSessions(app)
+    app.session_interface.store = CountingStore(directory)
+
+    @app.route('/set/<key>/<value>')
+    def set_value(key, value):
+        session[key] = value
+        return 'OK'
+
+    @app.route('/get/<key>')
+    def get_value(key):
+        return session.get(key, '')
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return 'OK'
+
+    return app
+
+
+def session_id(response):
+    """Get the session id from the Set-Cookie header of a response, or None if the session cookie isn't set."""
+
+    cookie = response.headers.get('Set-Cookie')
+    if cookie is None or not cookie.startswith('session='):
+        return None
+    return cookie.split(';')[0][len('session='):]
+
+
+class ServerSideSessionsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.app = create_session_app(self.directory)
+        self.store = self.app.session_interface.store
+        self.client = self.app.test_client()
+
+    def test_cookie_contains_only_the_session_id(self):
+        response = self.client.get('/set/message/{0}'.format('x' * 5000))
+        sid = session_id(response)
+        self.assertEqual(len(sid), 43)
+        self.assertEqual(self.client.get('/get/message').data, b'x' * 5000)
+        self.assertEqual(self.store.load(sid)[0].count('x'), 5000)
+
+    def test_unchanged_sessions_are_neither_saved_nor_reloaded(self):
+        self.client.get('/set/a/1')
+        for _ in range(5):
+            response = self.client.get('/get/a')
+            self.assertEqual(response.data, b'1')
+            self.assertIsNone(session_id(response))
+        self.assertEqual(self.store.saves, 1)
+        # a saved session is only cached once it has been loaded
+        self.assertEqual(self.store.loads, 1)
+
+    def test_cached_sessions_are_reloaded_after_changes_by_other_processes(self):
+        other_app = create_session_app(self.directory)
+        other_client = other_app.test_client()
+        sid = session_id(self.client.get('/set/a/1'))
+        self.assertEqual(self.client.get('/get/a').data, b'1')
+        other_client.set_cookie('localhost', 'session', sid)
+        self.assertEqual(other_client.get('/get/a').data, b'1')
+
+        other_client.get('/set/a/2')
+        self.assertEqual(self.client.get('/get/a').data, b'2')
+        self.assertEqual(self.client.get('/get/a').data, b'2')
+        self.assertEqual(self.store.loads, 2)
+
+    def test_session_id_changes_when_user_logs_in(self):
+        sid = session_id(self.client.get('/set/csrf_token/abc'))
+        new_sid = session_id(self.client.get('/set/_user_id/42'))
+        self.assertNotEqual(new_sid, sid)
+        self.assertIsNone(self.store.load(sid))
+        self.assertEqual(self.client.get('/get/csrf_token').data, b'abc')
+
+    def test_empty_sessions_are_deleted(self):
+        sid = session_id(self.client.get('/set/a/1'))
+        response = self.client.get('/clear')
+        self.assertIn('session=;', response.headers['Set-Cookie'])
+        self.assertIsNone(self.store.load(sid))
+        self.assertIsNone(session_id(self.client.get('/get/a')))
+
+    def test_expired_sessions_are_collected(self):
+        self.store.save('expired', '{}', time.time() - 1)
+        self.store.save('current', '{}', time.time() + 60)
+        self.assertIsNone(self.store.load('expired'))
+        self.assertEqual(self.store.collect_garbage(), 1)
+        self.assertIsNotNone(self.store.load('current'))
+
+    def test_session_files_are_only_accessible_by_the_current_user(self):
+        directory = os.path.join(self.directory, 'private')
+        store = SQLiteSessionStore(directory)
+        store.save('sid', '{}', time.time() + 60)
+        self.assertEqual(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
+        for filename in ('sessions.sqlite', 'sessions.versions'):
+            self.assertEqual(stat.S_IMODE(os.stat(os.path.join(directory, filename)).st_mode), 0o600, filename)
+
+    def test_directories_which_might_be_controlled_by_other_users_are_refused(self):
+        link = os.path.join(self.directory, 'link')
+        os.symlink(tempfile.gettempdir(), link)
+        self.assertRaises(PermissionError, SQLiteSessionStore(link).load, 'sid')
+
+    def test_concurrent_saves_leave_all_processes_with_the_same_session(self):
+        interface = self.app.session_interface
+        other_interface = create_session_app(self.directory).session_interface
+        expires = time.time() + 60
+        bump = interface.store.versions.bump
+
+        def interleaved_bump(sid):
+            # the other process writes the session and bumps its version between this process's write and bump
+            other_interface._save(sid, 'B', expires)
+            return bump(sid)
+
+        with mock.patch.object(interface.store.versions, 'bump', side_effect=interleaved_bump):
+            interface._save('sid', 'A', expires)
+        self.assertEqual(interface._load('sid')[0], 'B')
+        self.assertEqual(other_interface._load('sid')[0], 'B')
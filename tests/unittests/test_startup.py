@@ -0,0 +1,22 @@
+import sys
+import unittest
+
+from app.lazy import LazyModule
+from config import Config
+
+
+class SettingsTestCase(unittest.TestCase):
+    def test_settings_are_memoised_and_read_only(self):
+        settings = Config.settings('testing')
+        self.assertIs(Config.settings('testing'), settings)
+        with self.assertRaises(TypeError):
+            settings['secret_key'] = 'other'
+
+
+class LazyModuleTestCase(unittest.TestCase):
+    def test_module_is_imported_on_first_attribute_access(self):
+        sys.modules.pop('colorsys', None)
+        colorsys = LazyModule('colorsys')
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertIn('colorsys', sys.modules)
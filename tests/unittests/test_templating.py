@@ -0,0 +1,28 @@
+import os
+
+from flask import render_template_string
+
+from tests.unittests.base import BaseTestCase
+
+
+class TemplateCacheTestCase(BaseTestCase):
+    def test_fragments_are_cached_by_key(self):
+        calls = []
+        template = "{% cache 'greeting', name, timeout=60 %}{{ count() }} {{ name }}{% endcache %}"
+
+        def count():
+            calls.append(1)
+            return len(calls)
+
+        with self.app.test_request_context('/'):
+            self.assertEqual(render_template_string(template, name='Anna', count=count), '1 Anna')
+            self.assertEqual(render_template_string(template, name='Anna', count=count), '1 Anna')
+            self.assertEqual(render_template_string(template, name='Bob', count=count), '2 Bob')
+
+    def test_compiled_templates_are_stored_in_directory(self):
+        directory = self.app.config['TEMPLATE_BYTECODE_CACHE_DIR']
+        self.app.jinja_env.cache.clear()
+        for filename in os.listdir(directory):
+            os.remove(os.path.join(directory, filename))
+        self.client.get('/')
+        self.assertTrue(os.listdir(directory))
@@ -0,0 +1,67 @@
+import threading
+
+from app import password_verifier, user_cache
+from app.auth.views import load__user
+from app.users import VerificationBusyError
+from tests.unittests.base import BaseTestCase
+
+
+class UserCacheTestCase(BaseTestCase):
+    def test_users_are_cached_until_invalidated(self):
+        calls = []
+
+        @user_cache.cached
+        def load_user(user_id):
+            calls.append(user_id)
+            return dict(id=user_id)
+
+        load_user('anna')
+        load_user('anna')
+        self.assertEqual(calls, ['anna'])
+        user_cache.invalidate('anna')
+        load_user('anna')
+        self.assertEqual(calls, ['anna', 'anna'])
+
+    def test_invalidated_users_are_loaded_again_by_the_user_loader(self):
+        user = load__user('test')
+        self.assertIs(load__user('test'), user)
+        user_cache.invalidate(user.get_id())
+        self.assertIsNot(load__user('test'), user)
+
+    def test_login_uses_user_loader(self):
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        response = self.client.post('/login', data=dict(username='test', password='test'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('test', self.app.extensions['user_cache'])
+
+
+class PasswordVerifierTestCase(BaseTestCase):
+    def test_verifications_beyond_the_limit_are_rejected(self):
+        self.app.config['PASSWORD_VERIFICATION_MAX_PENDING'] = 1
+        password_verifier.init_app(self.app)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_verification():
+            started.set()
+            release.wait(5)
+            return True
+
+        results = []
+        app = self.app
+
+        def verify():
+            with app.app_context():
+                results.append(password_verifier.verify(slow_verification))
+
+        thread = threading.Thread(target=verify)
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(VerificationBusyError):
+                password_verifier.verify(lambda: True)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(results, [True])
+        self.assertTrue(password_verifier.verify(lambda: True))
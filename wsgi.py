@@ -1,3 +1,16 @@
-from app import create_app
+from app import create_app, db
+from app.health import warm_up
+from app.preload import import_heavy_modules, in_uwsgi_master, prepare_for_fork
 
-app = create_app('production')
\ No newline at end of file
+# the libraries are imported before the app is created, so that no request has to wait for them
+import_heavy_modules()
+
+app = create_app('production')
+
+# requests are only accepted once the app has been checked (with lazy-apps, see uwsgi.ini, every worker does this
+# itself); a failing database doesn't stop the app from loading, but is reported by the /health route
+warm_up(app)
+
+if in_uwsgi_master():
+    # preload mode (see uwsgi-preload.ini): the workers are forked from this process
+    prepare_for_fork(app, db)